@@ -4,15 +4,12 @@ import uuid
 import json
 import asyncio
 # import telnetlib
-import requests
-import jwt
 import datetime
 import time
 import random
-import string
+import hashlib
 import signal
 import sys
-import redis
 # import rag  # REMOVE THIS
 
 from datetime import datetime
@@ -35,11 +32,15 @@ from livekit.agents.llm import ChatMessage, ChatRole
 from livekit.plugins import silero, openai, elevenlabs
 from livekit.agents.llm.chat_context import ChatContext
 
-from agent2 import Agent2
-import agentCaller
+from agent2 import Agent2, clean_user_text
+import sip_client
 import agent3
+import llm_usage
+import turn_classifier
 from async_transcript_logger import TranscriptLogger
-from rules import evaluate_rules
+from rules import StreamingMatcher, get_engine
+from search_rag import asearch_collection, NO_CONTEXT
+from redis_pool import get_redis
 
 # Get the absolute path to the directory containing this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -52,14 +53,9 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Main Agent (instructions & context preservation)
 # -------------------------------------------------------------------
 class Agent1(Agent):
-    LIVEKIT_API_KEY    = os.getenv("LIVEKIT_API_KEY")
-    LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
-    LIVEKIT_REST_URL   = os.getenv("LIVEKIT_REST_URL", "http://15.204.51.230:7880")
-    SIP_EXTENSION      = "3000"
-    SIP_TRUNK_ADDRESS  = os.getenv("SIP_TRUNK_ADDRESS",  "15.204.51.230:5070")
-    SIP_TRUNK_USER     = os.getenv("SIP_TRUNK_USER",     "livekitgw")
-    SIP_TRUNK_PASS     = os.getenv("SIP_TRUNK_PASS",     "passgw")
-    _TRUNK_ID_CACHE    = None  # Class-level cache for trunk ID
+    MEMBER_WAIT_TIMEOUT   = 30.0  # seconds to wait for the executive to answer after dialing
+    HOLD_MESSAGE_INTERVAL = 8.0   # seconds between hold messages while waiting
+    SIP_MESSAGE_DEADLINE  = 15.0  # seconds for every SIP MESSAGE attempt together, before the process exits
 
     def __init__(self):
         instructions, initial_history = self._load_initial_context()
@@ -70,29 +66,42 @@ class Agent1(Agent):
         self.chat_history: list[ChatMessage] = initial_history
         self.agent2 = Agent2(openai.LLM(model="gpt-4o-mini"), self.conversation_id)
         self.transfer_initiated = False
-        self.trunk_id = None
         self.silent_mode = False
         self.is_call_transferred = False  # New flag for post-transfer STT filtering
         self.block_llm = False  # Block LLM after transfer
         agent_name = os.getenv("AI_AGENT_NAME", "nathan").lower()
         self.ai_names = [agent_name, "hey reception"]  # Add wake word
         self._safe_say = None  # Will be set by main.py
+        self._state_listener = None  # Notified when transfer readiness changes (set by main.py)
+        self.redis = None  # Shared redis.asyncio client (set by main.py)
         self.call_to_3000_initiated = False  # Track if 3000 was dialed
         self.executive_connected = False    # Track if executive joined
         self._last_service_seen = None  # Track last service for RAG info
         self.last_speech_time = time.time()
         self.waiting_for_field = None  # Track which field the agent is waiting for
-        # Pre-create trunk if not already cached
-        if Agent1._TRUNK_ID_CACHE is None:
-            Agent1._TRUNK_ID_CACHE = self._create_or_get_trunk()
-        self.trunk_id = Agent1._TRUNK_ID_CACHE
-
-    async def setup(self):
-        """Async setup for things that need await."""
-        self.logger = await TranscriptLogger.create()
+        # Keyword scanning over the caller's words only, consuming each new message once
+        self._scanned_upto = 0  # index into chat_history already fed to the matchers
+        self._spam_matcher = StreamingMatcher("spam_check")
+        self._emergency_matcher = StreamingMatcher("emergency_check")
+        self._pending_emergency_hits = []  # keyword hits not yet verified by the LLM
+        self._spam_detected = False
+        self._routing_memo: dict[tuple[str, str], str] = {}  # (service, summary sha1) -> LLM routing action
+
+    async def setup(self, transcript_logger: TranscriptLogger | None = None):
+        """Async setup for things that need await. `transcript_logger` is an already connected one (prewarm)."""
+        self.logger = transcript_logger or await TranscriptLogger.create()
         self.agent2.set_logger(self.logger)
         logger.info("TranscriptLogger initialized and set in Agent2.")
 
+    async def flush_log(self):
+        """Final summary, then write any buffered transcript updates now (before the process exits)."""
+        await self.agent2.finalize(self.chat_history)
+        if self.logger:
+            try:
+                await self.logger.aclose()
+            except Exception as e:
+                logger.error(f"[Agent1] Final transcript flush failed: {e}")
+
     def _load_initial_context(self) -> tuple[str | None, list[ChatMessage]]:
         prompt_path = os.path.join(BASE_DIR, "prompts", "system.json")
         try:
@@ -138,81 +147,23 @@ class Agent1(Agent):
 
         return instructions, initial_history
 
-    def _generate_jwt(self) -> str:
-        payload = {
-            "iss": self.LIVEKIT_API_KEY,
-            "sub": "sip-service",
-            "exp": int(time.time()) + 3600,
-            "sip": {
-                "admin": True,
-                "trunk_management": True,
-                "participant_management": True
-            }
-        }
-        return jwt.encode(payload, self.LIVEKIT_API_SECRET, algorithm="HS256")
-
-    def _headers(self) -> dict:
-        return {
-            "Authorization": f"Bearer {self._generate_jwt()}",
-            "Content-Type": "application/json",
-        }
-
-    def _create_or_get_trunk(self):
-        # List existing trunks and reuse if possible
-        url_list = f"{self.LIVEKIT_REST_URL}/twirp/livekit.SIP/ListSIPOutboundTrunk"
-        r = requests.post(url_list, headers=self._headers(), json={})
-        if r.status_code == 200:
-            trunks = r.json().get("sip_trunks", [])
-            for trunk in trunks:
-                if trunk.get("address") == self.SIP_TRUNK_ADDRESS:
-                    logger.info(f"[Agent1] Found existing trunk: {trunk['sip_trunk_id']}")
-                    return trunk["sip_trunk_id"]
-        else:
-            logger.error(f"[Agent1] Failed to list trunks: {r.status_code} {r.text}")
-        # Create trunk if not found
-        name = "AsteriskTrunk-" + "".join(random.choices(string.ascii_lowercase+string.digits, k=6))
-        body = {
-            "trunk": {
-                "name":         name,
-                "address":      self.SIP_TRUNK_ADDRESS,
-                "auth_username":self.SIP_TRUNK_USER,
-                "auth_password":self.SIP_TRUNK_PASS,
-                "numbers":      [ self.SIP_EXTENSION ],
-            }
-        }
-        url_create = f"{self.LIVEKIT_REST_URL}/twirp/livekit.SIP/CreateSIPOutboundTrunk"
-        r = requests.post(url_create, headers=self._headers(), json=body)
-        logger.info(f"[Agent1] CreateSIPOutboundTrunk response: {r.status_code} {r.text}")
-        r.raise_for_status()
-        return r.json()["sip_trunk_id"]
-
-    def _maybe_create_trunk(self):
-        # Use cached trunk ID if available
-        if self.trunk_id:
-            return
-        if Agent1._TRUNK_ID_CACHE is None:
-            Agent1._TRUNK_ID_CACHE = self._create_or_get_trunk()
-        self.trunk_id = Agent1._TRUNK_ID_CACHE
-
-    def join_sip_participant(self, extension, identity=None):
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
         """
-        Join a SIP extension (e.g., 1001, 3000) to the current LiveKit room.
+        Append RAG results to the user's message before the LLM replies.
+        The lookup is awaited (not blocking the event loop), so VAD/STT/TTS keep running;
+        on timeout or error the message is enriched with a "no context" marker instead.
         """
-        self._maybe_create_trunk()
-        payload = {
-            "sip_trunk_id": self.trunk_id,
-            "sip_call_to": extension,
-            "room_name": self.room_name,
-            "participant_identity": identity or f"sip-{extension}",
-        }
-        url = f"{self.LIVEKIT_REST_URL}/twirp/livekit.SIP/CreateSIPParticipant"
-        try:
-            r = requests.post(url, headers=self._headers(), json=payload)
-            logger.info(f"[Agent1] SIP participant {extension} join response: {r.status_code} {r.text}")
-            r.raise_for_status()
-        except Exception as e:
-            logger.error(f"[Agent1] Failed to join SIP participant {extension}: {e}")
-            raise
+        text = new_message.content[0] if isinstance(new_message.content, list) and new_message.content else new_message.content
+        if not isinstance(text, str) or not text.strip():
+            return
+        # search rag for the user query (collection name: towing_services, query: user query)
+        rag_result = await asearch_collection("towing_services", text) or NO_CONTEXT
+        varContextAppend = f"""
+                \nRAG SEARCH RESULTS:\n**When answering the user's question, draw on the retrieved RAG results only if they directly address the query. Prioritize the highest-scoring, most applicable passages. If none of the retrieved results are relevant, explicitly state that and provide a concise, standalone answer.**:\n
+                QUERY: {text}\n\n
+                ```{rag_result}```"""
+        text = text + " " + varContextAppend
+        new_message.content = [text] if isinstance(new_message.content, list) else text
 
     def set_session_context(self, ctx):
         """Store the session context for later use (e.g., to disconnect)."""
@@ -222,6 +173,18 @@ class Agent1(Agent):
         """Set the safe_say function from main.py"""
         self._safe_say = safe_say_func
 
+    def set_redis(self, redis_client):
+        """Set the shared redis.asyncio client from main.py"""
+        self.redis = redis_client
+
+    def set_state_listener(self, listener):
+        """Set a callback invoked when call state relevant to routing/transfer changes"""
+        self._state_listener = listener
+
+    def _notify_state_changed(self):
+        if self._state_listener is not None:
+            self._state_listener()
+
     async def safe_say(self, text: str, mark_ready_for_transfer=False):
         """Wrapper for the safe_say function from main.py. Optionally mark ready for transfer after this speech."""
         if self._safe_say is None:
@@ -230,21 +193,44 @@ class Agent1(Agent):
         await self._safe_say(text)
         if mark_ready_for_transfer:
             self.ready_for_transfer = True
+            self._notify_state_changed()
+
+    async def decide_routing(self, collected_data: dict) -> str:
+        """
+        Tiered routing: the compiled 'routing' rules on the extracted service decide first; only when
+        none matches is the LLM asked, and its answer is memoized per (service, summary) for this call.
+        Rules on free text (full_transcript, summary) are left to the LLM: a keyword hit there ("person"
+        in "personal", "transfer" said by the agent) is not a decision.
+        """
+        t0 = time.perf_counter()
+        rule = get_engine().match_rule(collected_data, "routing", fields=("service",))
+        if rule is not None:
+            action, source = rule.get("action"), "rule"
+        else:
+            memo_key = self._routing_memo_key(collected_data)
+            action = self._routing_memo.get(memo_key)
+            if action is not None:
+                source = "memo"
+            else:
+                action = await self.get_routing_action_from_llm(collected_data)
+                self._routing_memo[memo_key] = action
+                source = "llm"
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        logger.info(f"[Agent1] Routing decision '{action}' via {source} in {elapsed_ms:.3f} ms")
+        return action
+
+    @staticmethod
+    def _routing_memo_key(collected_data: dict) -> tuple[str, str]:
+        summary = collected_data.get("summary") or ""
+        return collected_data.get("service") or "", hashlib.sha1(summary.encode()).hexdigest()
 
     async def get_routing_action_from_llm(self, collected_data: dict) -> str:
         """
         Uses the LLM to decide on the routing action based on rules.json.
         """
-        rules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
-        try:
-            with open(rules_path) as f:
-                rules_config = json.load(f)
-        except (IOError, json.JSONDecodeError) as e:
-            logger.error(f"Failed to load or parse rules.json: {e}")
-            return "transfer"  # Default to transfer on error
-
-        routing_rules = [rule for rule in rules_config.get("rules", []) if rule.get("stage") == "routing"]
-        default_action = rules_config.get("default_action", "transfer")
+        engine = get_engine()
+        routing_rules = engine.stage_rules("routing")
+        default_action = engine.default_action
 
         conversation_summary = collected_data.get("summary", "")
         service_needed = collected_data.get("service", "")
@@ -271,11 +257,8 @@ class Agent1(Agent):
         try:
             llm = self.agent2.llm
             chat_ctx = ChatContext(items=prompt)
-            resp_content = ""
-            async for chunk in llm.chat(chat_ctx=chat_ctx):
-                if hasattr(chunk.delta, "content") and chunk.delta.content:
-                    resp_content += chunk.delta.content
-            
+            resp_content = await llm_usage.text(llm.chat(chat_ctx=chat_ctx), "routing")
+
             action = resp_content.strip().lower().replace("'", "").replace('"', '')
             logger.info(f"[Agent1] LLM routing decision: '{action}'")
 
@@ -300,9 +283,9 @@ class Agent1(Agent):
                 del self._all_info_ready_time
             return False
 
-        # All required info is present. Now let the LLM decide the action.
+        # All required info is present. Rules decide, the LLM only for cases they don't cover.
         collected_data = self.agent2.get_collected_data()
-        action = await self.get_routing_action_from_llm(collected_data)
+        action = await self.decide_routing(collected_data)
 
         if action == "end_call":
             logger.info("[Agent1] Rule action: end_call. Terminating session.")
@@ -319,6 +302,7 @@ class Agent1(Agent):
                 if self.ctx and hasattr(self.ctx.room, 'disconnect'):
                     await self.ctx.room.disconnect()
                 else:
+                    await self.flush_log()
                     sys.exit(0) # Fallback
             return False # Signal not to transfer.
 
@@ -361,6 +345,7 @@ class Agent1(Agent):
                 if self.ctx and hasattr(self.ctx.room, 'disconnect'):
                     await self.ctx.room.disconnect()
                 else:
+                    await self.flush_log()
                     sys.exit(0)
             return True
 
@@ -388,15 +373,19 @@ class Agent1(Agent):
         self.silent_mode = True  # Go silent as soon as transfer is triggered
         self.is_call_transferred = True  # Set flag for STT filtering
         self.block_llm = True  # Block LLM after transfer
-        logger.info(f"[Agent1] Transferring: joining SIP 3000 to room {self.room_name} via agentCaller.")
+        logger.info(f"[Agent1] Transferring: joining SIP 3000 to room {self.room_name} via sip_client.")
 
         # Only announce and dial once
         if not self.call_to_3000_initiated:
             await self.safe_say("Connecting to our executive.")
             await asyncio.sleep(2)
-            trunk_id = agentCaller.get_or_create_trunk()
+            try:
+                trunk_id = await sip_client.get_or_create_trunk(self.redis)
+            except sip_client.SipApiError as e:
+                logger.error(f"[Agent1] Could not resolve SIP trunk: {e}")
+                trunk_id = None
             logger.info(f"[Agent1] Using trunk_id: {trunk_id}")
-            success = agentCaller.join_sip_participant(trunk_id, "4000", self.room_name)
+            success = trunk_id is not None and await sip_client.join_sip_participant(trunk_id, "4000", self.room_name, redis_client=self.redis)
             if success:
                 self.call_to_3000_initiated = True
                 logger.info("[Agent1] SIP 3000 call initiated.")
@@ -405,48 +394,20 @@ class Agent1(Agent):
 
         if self.call_to_3000_initiated:
             logger.info(f"[Agent1] Successfully initiated transfer to SIP 3000 in room {self.room_name}")
-            # Wait for the human agent to answer (room_member:<room_name> key in Redis)
-            import redis
-            import random
-            r = redis.Redis(host='15.204.51.230', port=6379, db=0, password='2123tt')
-            key = f'room_member:{self.room_name}'
-            max_retries = 15 # ~30 seconds
-            interval = 2  # seconds
-            member_value = None
-
-            hold_messages = [
-                "We are connecting you now, please hold.",
-                "Trying to reach an executive for you.",
-                "Thank you for your patience, we're connecting your call.",
-                "Please stay on the line, we're finding someone for you.",
-            ]
-            last_hold_message_index = -1
-
-            logger.info(f"[Agent1] Checking for room_member key: {key} (up to {max_retries} times)")
-            for attempt in range(max_retries):
-                val = r.get(key)
-                logger.info(f"[Agent1] Attempt {attempt+1}: {key} = {val}")
-                if val:
-                    member_value = val.decode()
-                    logger.info(f"[Agent1] Found room_member: {member_value} for room {self.room_name}")
-                    break
-
-                # Speak a hold message every 4 attempts (8 seconds)
-                if attempt > 0 and attempt % 4 == 0:
-                    next_message_index = random.randint(0, len(hold_messages) - 1)
-                    if next_message_index == last_hold_message_index:
-                        next_message_index = (next_message_index + 1) % len(hold_messages)
-                    last_hold_message_index = next_message_index
-                    await self.safe_say(hold_messages[next_message_index])
-
-                await asyncio.sleep(interval)
-            
+            # Wait for the human agent to answer (room_member:<room_name> key in Redis), with hold messages meanwhile
+            hold_task = asyncio.create_task(self._speak_hold_messages())
+            try:
+                member_value = await self._wait_for_room_member()
+            finally:
+                hold_task.cancel()
+
             if member_value:
                 # Parse ip, port, extension
                 try:
                     ip, port, extension = member_value.split(":")
                 except Exception as e:
                     logger.error(f"[Agent1] Failed to parse room_member value '{member_value}': {e}")
+                    await self.flush_log()
                     sys.exit(1)
                 # Log the SIP info for the transfer
                 if self.logger:
@@ -465,28 +426,24 @@ class Agent1(Agent):
                 # Send SIP MESSAGE to the agent with the collected info
                 sip_message_content = self.agent2.sip_message
                 if sip_message_content:
-                    a3 = agent3.Agent3()
                     logger.info(f"[Agent1] About to send SIP MESSAGE to {extension} at {ip}:{port} for room {self.room_name}")
                     await asyncio.sleep(3)  # Wait to ensure agent is ready
-                    max_send_retries = 3
-                    for send_attempt in range(max_send_retries):
-                        success = a3.send_transcription_to_room_member(self.room_name, sip_message_content, redis_host="15.204.51.230", redis_port=6379, redis_password="2123tt", override_ip=ip, override_port=port, override_extension=extension)
-                        if success:
-                            logger.info(f"[Agent1] Sent transcription to room member {extension} at {ip}:{port} for room {self.room_name} via Agent3 (attempt {send_attempt+1})")
-                            break
-                        logger.warning(f"[Agent1] Retry {send_attempt+1} failed to send SIP MESSAGE. Retrying...")
-                        await asyncio.sleep(2)
-                    else:
-                        logger.error(f"[Agent1] Failed to send SIP MESSAGE after {max_send_retries} attempts.")
+                    try:
+                        # Each attempt may wait up to Timer F (32s); bound them together so the exit isn't held up
+                        await asyncio.wait_for(self._send_sip_message(sip_message_content, ip, port, extension), self.SIP_MESSAGE_DEADLINE)
+                    except asyncio.TimeoutError:
+                        logger.error(f"[Agent1] Gave up sending SIP MESSAGE after {self.SIP_MESSAGE_DEADLINE:.0f}s.")
                 else:
                     logger.warning(f"[Agent1] No transcript content found in agent2 to send to agent for room {self.room_name}")
                 logger.info("[Agent1] Exiting after successful transfer and executive connection.")
+                await self.flush_log()
                 sys.exit(0)
                 return
             else:
-                logger.error(f"[Agent1] room_member key not found after {max_retries} attempts. Exiting anyway.")
+                logger.error(f"[Agent1] room_member key not found after {self.MEMBER_WAIT_TIMEOUT:.0f}s. Exiting anyway.")
                 await self.safe_say("Could not confirm executive connection, exiting.")
                 await asyncio.sleep(4)
+                await self.flush_log()
                 sys.exit(0)
                 return
         else:
@@ -494,12 +451,68 @@ class Agent1(Agent):
             await self.safe_say("I apologize, but I'm unable to connect you to our executive at this time. Please try calling back in a few minutes.")
             return
 
-    def set_room_name(self, room: str):
+    async def _send_sip_message(self, content, ip, port, extension, max_send_retries=3):
+        a3 = agent3.Agent3()
+        for send_attempt in range(max_send_retries):
+            success = await a3.send_transcription_to_room_member(self.room_name, content, override_ip=ip, override_port=port, override_extension=extension)
+            if success:
+                logger.info(f"[Agent1] Sent transcription to room member {extension} at {ip}:{port} for room {self.room_name} via Agent3 (attempt {send_attempt+1})")
+                return True
+            logger.warning(f"[Agent1] Retry {send_attempt+1} failed to send SIP MESSAGE. Retrying...")
+            await asyncio.sleep(2)
+        logger.error(f"[Agent1] Failed to send SIP MESSAGE after {max_send_retries} attempts.")
+        return False
+
+    async def _wait_for_room_member(self) -> str | None:
+        """Wait for the dialplan's PUBLISH on room_member_ready:<room> (see extensions.conf), up to MEMBER_WAIT_TIMEOUT."""
+        r = self.redis or get_redis()
+        key = f'room_member:{self.room_name}'
+        pubsub = r.pubsub()
+        await pubsub.subscribe(f'room_member_ready:{self.room_name}')
+        try:
+            # The key may have been written before we subscribed
+            val = await r.get(key)
+            if val:
+                logger.info(f"[Agent1] Found room_member: {val.decode()} for room {self.room_name}")
+                return val.decode()
+            logger.info(f"[Agent1] Waiting for room_member_ready:{self.room_name} (up to {self.MEMBER_WAIT_TIMEOUT:.0f}s)")
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.MEMBER_WAIT_TIMEOUT
+            while (remaining := deadline - loop.time()) > 0:
+                msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if msg and msg["type"] == "message":
+                    member_value = msg["data"].decode()
+                    logger.info(f"[Agent1] room_member published: {member_value} for room {self.room_name}")
+                    return member_value
+            # Dialplans without the PUBLISH still SETEX the key
+            val = await r.get(key)
+            return val.decode() if val else None
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def _speak_hold_messages(self):
+        """Speak a hold message every HOLD_MESSAGE_INTERVAL seconds until cancelled."""
+        hold_messages = [
+            "We are connecting you now, please hold.",
+            "Trying to reach an executive for you.",
+            "Thank you for your patience, we're connecting your call.",
+            "Please stay on the line, we're finding someone for you.",
+        ]
+        last_index = -1
+        while True:
+            await asyncio.sleep(self.HOLD_MESSAGE_INTERVAL)
+            index = random.randint(0, len(hold_messages) - 1)
+            if index == last_index:
+                index = (index + 1) % len(hold_messages)
+            last_index = index
+            await self.safe_say(hold_messages[index])
+
+    async def set_room_name(self, room: str):
         self.room_name = room
         logger.info(f"[Agent1] Room name set to {room}")
         try:
-            r = redis.Redis(host='15.204.51.230', port=6379, db=0, password='2123tt')
-            r.set('current_room_name', room)
+            await (self.redis or get_redis()).set('current_room_name', room)
             logger.info(f"[Agent1] Wrote room name {room} to Redis under 'current_room_name'")
         except Exception as e:
             logger.error(f"[Agent1] Failed to write room name to Redis: {e}")
@@ -531,62 +544,128 @@ class Agent1(Agent):
         await self.safe_say("Thank you for confirming. I'll now connect you to our team to complete your request. Please hold on a moment.", mark_ready_for_transfer=True)
         await asyncio.sleep(4)
 
+    def _scan_new_user_text(self):
+        """Feed user messages added since the last scan to the spam/emergency matchers."""
+        new_items = self.chat_history[self._scanned_upto:]
+        self._scanned_upto = len(self.chat_history)
+        for item in new_items:
+            if getattr(item.role, "name", str(item.role)).lower() != "user":
+                continue
+            text = item.content[0] if isinstance(item.content, list) else item.content
+            text = clean_user_text(text or "")
+            if not text:
+                continue
+            chunk = text + "\n"
+            if any(hit.action == "spam" for hit in self._spam_matcher.feed(chunk)):
+                self._spam_detected = True
+            self._pending_emergency_hits.extend(
+                hit for hit in self._emergency_matcher.feed(chunk) if hit.action == "transfer"
+            )
+
+    @property
+    def spam_detected(self) -> bool:
+        """True once a spam keyword has been seen in the caller's words (see _scan_new_user_text)."""
+        return self._spam_detected
+
     async def check_for_emergency_and_transfer(self):
         """
         Checks for emergencies using rules and LLM, and triggers an immediate transfer if detected.
         Returns True if an emergency was handled, False otherwise.
         """
-        if self.transfer_initiated:
+        verdict = await self.classify_emergency()
+        if verdict is None:
             return False
+        await self.transfer_for_emergency(verdict)
+        return True
 
-        collected_data = self.agent2.get_collected_data()
-        if not collected_data.get("full_transcript"):
-            return False
+    async def classify_emergency(self) -> str | None:
+        """
+        Verifies new emergency keyword hits with the LLM, without acting on them.
+        Every keyword occurrence is verified at most once.
+        Returns "emergency", "check_failed" (transfer as a precaution) or None.
+        """
+        if self.transfer_initiated:
+            return None
 
-        action = evaluate_rules(collected_data, stage="emergency_check")
+        self._scan_new_user_text()
+        if not self._pending_emergency_hits:
+            return None
 
-        if action == "transfer":
-            logger.info("[Agent1] Potential emergency detected by keyword. Verifying with LLM.")
-            
-            last_message = self.chat_history[-1].content[0] if self.chat_history and isinstance(self.chat_history[-1].content, list) else (self.chat_history[-1].content if self.chat_history else "")
-
-            prompt = [
-                ChatMessage(
-                    role="system",
-                    content=[(
-                        "You are an emergency detection system for a towing company. "
-                        "Analyze the user's message. An emergency is a situation requiring immediate human intervention for safety. "
-                        "Examples: car accidents, injuries, fire, being in a dangerous location. "
-                        "A simple breakdown is NOT an emergency. "
-                        "Respond with 'EMERGENCY' for a critical emergency, or 'ROUTINE' otherwise. Only use these exact words."
-                    )]
-                ),
-                ChatMessage(role="user", content=[last_message])
-            ]
+        hits, self._pending_emergency_hits = self._pending_emergency_hits, []
+        logger.info(f"[Agent1] Potential emergency detected by keyword {[h.keyword for h in hits]}. Verifying with LLM.")
+        # The user messages that contained the new keyword occurrences
+        flagged_text = "\n".join(dict.fromkeys(h.context.strip() for h in hits))
 
-            try:
-                llm = self.agent2.llm
-                chat_ctx = ChatContext(items=prompt)
-                resp_content = ""
-                async for chunk in llm.chat(chat_ctx=chat_ctx):
-                    if hasattr(chunk.delta, "content") and chunk.delta.content:
-                        resp_content += chunk.delta.content
-                
-                logger.info(f"[Agent1] LLM Emergency Check Response: '{resp_content.strip()}'")
-                if "emergency" in resp_content.strip().lower():
-                    logger.warning("[Agent1] LLM confirmed EMERGENCY. Transferring immediately.")
-                    await self.safe_say("I've detected an emergency. Connecting you to an operator right away.")
-                    await self.transfer()
-                    return True
-                else:
-                    logger.info("[Agent1] LLM classified as ROUTINE. Proceeding normally.")
-            except Exception as e:
-                logger.error(f"[Agent1] LLM emergency check failed: {e}. Transferring as a precaution.")
-                await self.safe_say("Connecting you to an operator for assistance.")
-                await self.transfer()
-                return True
-        
-        return False
+        prompt = [
+            ChatMessage(
+                role="system",
+                content=[(
+                    "You are an emergency detection system for a towing company. "
+                    "Analyze the user's message. An emergency is a situation requiring immediate human intervention for safety. "
+                    "Examples: car accidents, injuries, fire, being in a dangerous location. "
+                    "A simple breakdown is NOT an emergency. "
+                    "Respond with 'EMERGENCY' for a critical emergency, or 'ROUTINE' otherwise. Only use these exact words."
+                )]
+            ),
+            ChatMessage(role="user", content=[flagged_text])
+        ]
+
+        try:
+            llm = self.agent2.llm
+            chat_ctx = ChatContext(items=prompt)
+            resp_content = await llm_usage.text(llm.chat(chat_ctx=chat_ctx), "emergency")
+
+            logger.info(f"[Agent1] LLM Emergency Check Response: '{resp_content.strip()}'")
+            if "emergency" in resp_content.strip().lower():
+                logger.warning("[Agent1] LLM confirmed EMERGENCY. Transferring immediately.")
+                return "emergency"
+            logger.info("[Agent1] LLM classified as ROUTINE. Proceeding normally.")
+            return None
+        except Exception as e:
+            logger.error(f"[Agent1] LLM emergency check failed: {e}. Transferring as a precaution.")
+            return "check_failed"
+
+    async def classify_turn(self) -> str | None:
+        """
+        Combined-mode counterpart of the per-stage turn checks (see turn_classifier): one LLM call
+        extracts the fields, verifies new emergency keyword hits, verifies a spam keyword hit and
+        gives the routing action, which is memoized for decide_routing.
+        Returns "emergency", "check_failed", "spam" or None, like classify_emergency plus spam.
+        """
+        if self.transfer_initiated:
+            await self.agent2.process_history(self.chat_history)
+            return None
+
+        self._scan_new_user_text()
+        hits, self._pending_emergency_hits = self._pending_emergency_hits, []
+        flagged_text = "\n".join(dict.fromkeys(h.context.strip() for h in hits))
+        upto = len(self.chat_history)  # what `delta` covers; later messages are extracted on the next turn
+        delta = self.agent2.pending_delta(self.chat_history)
+        if not delta and not hits:
+            return None
+        result = await turn_classifier.classify(self.agent2.llm, self.agent2.known_fields(), delta, flagged_text)
+        # Falls back to the separate extraction call if the combined one failed
+        await self.agent2.process_history(self.chat_history, fields=result["fields"] if result else None, upto=upto)
+        if result is None:
+            if hits:
+                logger.error("[Agent1] Combined classification failed with emergency keywords pending. Transferring as a precaution.")
+                return "check_failed"
+            return None
+        if hits and result["emergency"]:
+            logger.warning("[Agent1] Classifier confirmed EMERGENCY. Transferring immediately.")
+            return "emergency"
+        if self._spam_detected and result["spam"]:
+            return "spam"
+        if self.agent2.has_all_required_info():
+            self._routing_memo[self._routing_memo_key(self.agent2.get_collected_data())] = result["routing"]
+        return None
+
+    async def transfer_for_emergency(self, verdict: str):
+        if verdict == "emergency":
+            await self.safe_say("I've detected an emergency. Connecting you to an operator right away.")
+        else:
+            await self.safe_say("Connecting you to an operator for assistance.")
+        await self.transfer()
 
     async def is_spam_with_llm(self, history: list[ChatMessage]) -> bool:
         """
@@ -617,17 +696,8 @@ class Agent1(Agent):
             # This assumes agent2's llm is accessible. A better design might pass the llm to agent1.
             llm = self.agent2.llm
             chat_ctx = ChatContext(items=prompt)
-            llm_stream = llm.chat(chat_ctx=chat_ctx)
-            
-            resp_content = ""
-            async for chunk in llm_stream:
-                if (
-                    hasattr(chunk, "delta") and
-                    hasattr(chunk.delta, "content") and
-                    chunk.delta.content is not None
-                ):
-                    resp_content += chunk.delta.content
-            
+            resp_content = await llm_usage.text(llm.chat(chat_ctx=chat_ctx), "spam")
+
             logger.info(f"[Agent1] LLM Spam Check Response: '{resp_content.strip()}'")
             return "spam" in resp_content.strip().lower()
         except Exception as e:
@@ -639,14 +709,8 @@ class Agent1(Agent):
         Checks for spam and hangs up the call if detected.
         Returns True if the call was spam and hung up, False otherwise.
         """
-        collected_data = self.agent2.get_collected_data()
-        # Don't check for spam on an empty transcript
-        if not collected_data.get("full_transcript"):
-            return False
-
-        action = evaluate_rules(collected_data, stage="spam_check")
-
-        if action == "spam":
+        self._scan_new_user_text()
+        if self._spam_detected:
             if not self.transfer_initiated:
                 self.transfer_initiated = True
                 # Log to MongoDB: transfered: false, call_action: spam
@@ -660,6 +724,7 @@ class Agent1(Agent):
                 if self.ctx and hasattr(self.ctx.room, 'disconnect'):
                     await self.ctx.room.disconnect()
                 else:
+                    await self.flush_log()
                     sys.exit(0)
             return True
 
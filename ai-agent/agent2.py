@@ -1,6 +1,6 @@
 # Agent2
 import os
-
+import time
 import json
 import re
 
@@ -20,16 +20,61 @@ from livekit.agents.llm import ChatMessage, ChatRole
 from livekit.plugins import silero, openai, elevenlabs
 from livekit.agents.llm.chat_context import ChatContext
 
+import fast_extract
+import llm_usage
+from json_stream import JsonFieldStream
+
 if TYPE_CHECKING:
     from async_transcript_logger import TranscriptLogger
 
 # Get the absolute path to the directory containing this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Fields the extraction call returns, in the order the schema asks for them
+CALLER_FIELDS = ("name", "phone", "location", "service", "make", "model", "color", "year")
+
+# OpenAI structured output: every field present, every value a string ("" when unknown)
+EXTRACTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "caller_info",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {field: {"type": "string"} for field in CALLER_FIELDS},
+            "required": list(CALLER_FIELDS),
+            "additionalProperties": False,
+        },
+    },
+}
+
+_RAG_SPLIT_RE = re.compile(r"\s*RAG SEARCH RESULTS:", re.IGNORECASE)
+
+
+def clean_user_text(text: str) -> str:
+    """The caller's own words, without the RAG context appended to user messages."""
+    return _RAG_SPLIT_RE.split(text, 1)[0].strip()
+
+
+def extraction_instructions() -> str:
+    """The field rules of the extraction prompt, shared with the combined classifier (turn_classifier.py)."""
+    agent_name = os.getenv("AI_AGENT_NAME", "nathan")
+    return (
+        f"Extract the caller's information from the conversation: their name, phone number, address or location, and the specific service they need. "
+        f"Also extract vehicle make, model, color, and year if mentioned. The AI agent introduces itself as {agent_name.capitalize()}; do not extract this as the caller's name. "
+        "The 'name' field must be the caller's name. Phone must be 10 digits or empty string. Location and service must not be empty. "
+        "For the 'service' field, extract the core service type (e.g., 'lockout', 'jump', 'tire', 'fuel'), not full phrases like 'lockout service' or 'jump start service'. "
+        "You are given the fields already KNOWN from earlier in the call and only the NEW part of the conversation. "
+        "If a field is not mentioned in the new messages, return its known value; otherwise, return an empty string. Never return null."
+    )
+
 # -------------------------------------------------------------------
 # Agent2 for name/phone extraction
 # -------------------------------------------------------------------
 class Agent2:
+    SUMMARY_MIN_INTERVAL = float(os.getenv("SUMMARY_MIN_INTERVAL", "20"))  # seconds between summary regenerations
+    SUMMARY_EVERY_TURNS  = int(os.getenv("SUMMARY_EVERY_TURNS", "6"))       # ...unless this many new turns arrived
+
     def __init__(self, llm: openai.LLM, conversation_id: str):
         self.llm = llm
         self._done = False
@@ -49,9 +94,13 @@ class Agent2:
         self.summary = None
         # self.filename = None
         # self.out_path = None
-        self.sip_message: Optional[str] = None
         self.logger: Optional["TranscriptLogger"] = None
         self.full_transcript: Optional[str] = None
+        self._processed_upto = 0  # high-water mark: history[:_processed_upto] has been extracted
+        self._transcript_upto = 0  # history[:_transcript_upto] is already in full_transcript
+        self._turns_since_summary = 0
+        self._summary_at = 0.0  # monotonic time of the last summary
+        self._finalized = False
 
     def set_logger(self, logger: "TranscriptLogger"):
         self.logger = logger
@@ -91,217 +140,91 @@ class Agent2:
             logging.getLogger("Agent1").info(f"[Agent2] Missing required fields for transfer: {missing}")
         return all(required) and has_make_or_model
 
-    def extract_json_from_response(self, resp_content):
-        # Remove triple backticks and language tags
-        cleaned = re.sub(r"^```[a-zA-Z]*\n?|```$", "", resp_content.strip(), flags=re.MULTILINE)
-        cleaned = cleaned.replace('```', '').strip()
-        return cleaned
-
-    async def process_history(self, history: list[ChatMessage]):
-        # Use the full conversation history for extraction
-        convo = "\n".join(
-            (m.content[0] if isinstance(m.content, list) else m.content)
-            for m in history
-        )
-        agent_name = os.getenv("AI_AGENT_NAME", "nathan")
-        prompt = [
-            ChatMessage(
-                role="system",
-                content=[
-                    (f"Extract the caller's information from the conversation: their name, phone number, address or location, and the specific service they need. "
-                     f"Also extract vehicle make, model, color, and year if mentioned. The AI agent introduces itself as {agent_name.capitalize()}; do not extract this as the caller's name. "
-                     "Return JSON: {name: string, phone: string, location: string, service: string, make: string, model: string, color: string, year: string}. "
-                     "The 'name' field must be the caller's name. Phone must be 10 digits or empty string. Location and service must not be empty. "
-                     "For the 'service' field, extract the core service type (e.g., 'lockout', 'jump', 'tire', 'fuel'), not full phrases like 'lockout service' or 'jump start service'. "
-                     "If any field is missing or not mentioned, use the value from earlier in the conversation if available; otherwise, return an empty string. Never return null."
-                     )
-                ]
-            ),
-            ChatMessage(role="user", content=[convo[-32000:]])
-        ]
+    @staticmethod
+    def _role(m: ChatMessage) -> str:
+        return getattr(m.role, "name", str(m.role)).lower()
+
+    @staticmethod
+    def _text(m: ChatMessage) -> str:
+        return m.content[0] if isinstance(m.content, list) else m.content
+
+    def _format_delta(self, messages: list[ChatMessage]) -> str:
+        """User/AI lines for the new messages only, without the appended RAG context."""
+        lines = []
+        for m in messages:
+            role = self._role(m)
+            text = self._text(m)
+            if role == "user":
+                clean_text = clean_user_text(text)
+                if clean_text:
+                    lines.append(f"User: {clean_text}")
+            elif role in ("assistant", "ai"):
+                clean_text = text.strip()
+                if clean_text:
+                    lines.append(f"AI: {clean_text}")
+        return "\n".join(lines)
+
+    def known_fields(self) -> dict:
+        return {
+            "name": self.name or "",
+            "phone": self.phone or "",
+            "location": self.location or "",
+            "service": self.service or "",
+            "make": self.make or "",
+            "model": self.model or "",
+            "color": self.color or "",
+            "year": self.year or "",
+        }
+
+    async def process_history(self, history: list[ChatMessage], fields: Optional[dict] = None, upto: Optional[int] = None):
+        # Only the messages after the high-water mark are sent, together with the fields known so far.
+        # `fields` are values already extracted from those messages (the combined classifier): no LLM call then.
+        # `upto` is len(history) when they were read, so messages that arrived since are left for the next call.
+        if upto is None:
+            upto = len(history)
+        new_messages = history[self._processed_upto:upto]
+        if not any(self._role(m) == "user" for m in new_messages):
+            logger.debug("Agent2: No new user turn since last extraction, skipping LLM call")
+            return self.name, self.phone, self.location, self.service, self.make, self.model, self.color
         try:
-            chat_ctx = ChatContext(items=prompt)
-            llm_stream = self.llm.chat(chat_ctx=chat_ctx)
-            resp_content = ""
-            async for chunk in llm_stream:
-                if (
-                    hasattr(chunk, "delta") and 
-                    hasattr(chunk.delta, "content") and 
-                    chunk.delta.content is not None
-                ):
-                    resp_content += chunk.delta.content
-            logger.debug(f"Agent2 LLM extraction response: {resp_content}")
-            json_str = self.extract_json_from_response(resp_content)
-            # Fix: Ensure valid JSON by replacing single quotes with double quotes if needed
-            if json_str.startswith("{") and "'" in json_str and '"' not in json_str:
-                json_str = json_str.replace("'", '"')
-            # Only attempt to parse if it looks like JSON
-            if not (json_str.strip().startswith("{") and json_str.strip().endswith("}")):
-                logger.warning(f"Agent2: Skipping non-JSON response: {json_str}")
-                return self.name, self.phone, self.location, self.service, self.make, self.model, self.color
-            try:
-                data = json.loads(json_str)
-            except Exception as e:
-                logger.warning(f"Agent2: Failed to parse JSON: {json_str} ({e})")
-                return self.name, self.phone, self.location, self.service, self.make, self.model, self.color
-
-            def clean_value(value):
-                if value is None or (isinstance(value, str) and value.strip().lower() == 'null'):
-                    return ""
-                return str(value).strip()
-
-            extracted_fields = [
-                clean_value(data.get("name")),
-                clean_value(data.get("phone")),
-                clean_value(data.get("service")),
-                clean_value(data.get("location")),
-                clean_value(data.get("make")),
-                clean_value(data.get("model")),
-                clean_value(data.get("year")),
-                clean_value(data.get("color")),
-            ]
-            # Enforce order: name, phone, service, location, make, model, year
-            # Only update if not already set, unless user provided out of order
-            field_names = ["name", "phone", "service", "location", "make", "model", "year", "color"]
-            for idx, field in enumerate(field_names):
-                val = extracted_fields[idx]
-                if val and not getattr(self, field):
-                    setattr(self, field, val)
-                    # Update transcript and summary before logging
-                    lines = []
-                    for m in history:
-                        role = getattr(m.role, "name", str(m.role)).lower()
-                        text = m.content[0] if isinstance(m.content, list) else m.content
-                        if role == "user":
-                            clean_text = re.split(r"\s*RAG SEARCH RESULTS:", text, flags=re.IGNORECASE)[0].strip()
-                            if clean_text:
-                                lines.append(f"User: {clean_text}")
-                        elif role in ("assistant", "ai"):
-                            clean_text = text.strip()
-                            if clean_text:
-                                lines.append(f"AI: {clean_text}")
-                    self.full_transcript = "\n".join(lines)
-                    # Generate summary (short, even if not all info present)
-                    summary_prompt = [
-                        ChatMessage(
-                            role="system",
-                            content=["Summarize the following call in 2-3 sentences."]
-                        ),
-                        ChatMessage(role="user", content=[convo[-2000:]])
-                    ]
-                    summary_ctx = ChatContext(items=summary_prompt)
-                    summary_stream = self.llm.chat(chat_ctx=summary_ctx)
-                    summary_content = ""
-                    async for chunk in summary_stream:
-                        if (
-                            hasattr(chunk, "delta") and 
-                            hasattr(chunk.delta, "content") and 
-                            chunk.delta.content is not None
-                        ):
-                            summary_content += chunk.delta.content
-                    self.summary = summary_content.strip()
-                    # Determine if basic_info is present
-                    service_list = [
-                        "lockout", "jump", "jump start", "tire", "fuel", "battery", "key", "ignition", "roadside",
-                        "tow", "towing", "accident", "recovery", "winch", "heavy duty", "commercial", "big rig", "semi", "bus", "truck", "trailer", "container", "flatbed", "motorhome", "rv"
-                    ]
-                    basic_info = bool(self.name and self.phone and self.service and any(s in (self.service or '').lower() for s in service_list))
-                    # Log to MongoDB after each field update, with latest transcript/summary and basic_info
-                    if self.logger:
-                        log_data = {
-                            "conversation_id": self.conversation_id,
-                            "ai_agent_name": agent_name,
-                            "caller_name": self.name or '',
-                            "caller_phone": self.phone or '',
-                            "location": self.location or '',
-                            "service": self.service or '',
-                            "vehicle_make": self.make or '',
-                            "vehicle_model": self.model or '',
-                            "vehicle_color": self.color or '',
-                            "vehicle_year": self.year or '',
-                            "summary": self.summary,
-                            "full_transcript": self.full_transcript,
-                            "basic_info": basic_info,
-                            "call_action": "no_action"
-                        }
-                        await self.logger.upsert_log(self.conversation_id, log_data)
-
-            # Only generate summary and transcript ONCE, when all required info is present
-            if self.name and self.phone and self.location and self.service and self.year and (self.make or self.model) and not self._done:
-                self._done = True
-                logger.info(f"Agent2 locked: name={self.name}, phone={self.phone}, location={self.location}, service={self.service}, make={self.make}, model={self.model}, color={self.color}, year={self.year}")
+            # Phone, year, color and make straight off the caller's words, before any LLM round-trip
+            changed = self._fast_extract(new_messages)
+            if fields is not None:
+                for field in CALLER_FIELDS:
+                    changed = self._commit_field(field, fields.get(field)) or changed
+                self._processed_upto = upto
+            elif self._llm_needed():
+                changed = await self._llm_extract(new_messages, upto) or changed
+            else:
+                logger.info("Agent2: fast path filled the remaining fields, skipping LLM call")
+                self._processed_upto = upto
 
-                # Generate summary
-                summary_prompt = [
-                    ChatMessage(
-                        role="system",
-                        content=["Summarize the following call in 2-3 sentences."]
-                    ),
-                    ChatMessage(role="user", content=[convo[-2000:]])
-                ]
-                summary_ctx = ChatContext(items=summary_prompt)
-                summary_stream = self.llm.chat(chat_ctx=summary_ctx)
-                summary_content = ""
-                async for chunk in summary_stream:
-                    if (
-                        hasattr(chunk, "delta") and 
-                        hasattr(chunk.delta, "content") and 
-                        chunk.delta.content is not None
-                    ):
-                        summary_content += chunk.delta.content
-                self.summary = summary_content.strip()
-
-                # Prepare transcript with both roles, cleaning up noise
-                lines = []
-                for m in history:
-                    role = getattr(m.role, "name", str(m.role)).lower()
-                    text = m.content[0] if isinstance(m.content, list) else m.content
-                    if role == "user":
-                        clean_text = re.split(r"\s*RAG SEARCH RESULTS:", text, flags=re.IGNORECASE)[0].strip()
-                        if clean_text:
-                            lines.append(f"User: {clean_text}")
-                    elif role in ("assistant", "ai"):
-                        clean_text = text.strip()
-                        if clean_text:
-                            lines.append(f"AI: {clean_text}")
-                full_transcript = "\n".join(lines)
-                self.full_transcript = full_transcript
-
-                # Prepare data for MongoDB and SIP message
-                sip_lines = [
-                    f"Caller: {self.name or ''}",
-                    f"Phone: {self.phone or ''}",
-                    f"Location: {self.location or ''}",
-                    f"Service: {self.service or ''}",
-                    f"Make: {self.make or ''}",
-                    f"Model: {self.model or ''}",
-                    f"Color: {self.color or ''}",
-                    f"Year: {self.year or ''}",
-                    "",
-                    "Summary:",
-                    self.summary,
-                    "",
-                    "Transcript:",
-                    full_transcript
+            self._update_transcript(history)
+            if changed:
+                # One summary (when due) and one log update per tick, however many fields changed
+                if self._summary_due():
+                    await self._summarize()
+                # Determine if basic_info is present
+                service_list = [
+                    "lockout", "jump", "jump start", "tire", "fuel", "battery", "key", "ignition", "roadside",
+                    "tow", "towing", "accident", "recovery", "winch", "heavy duty", "commercial", "big rig", "semi", "bus", "truck", "trailer", "container", "flatbed", "motorhome", "rv"
                 ]
-                self.sip_message = "\n".join(sip_lines)
-
-                log_data = {
-                    "conversation_id": self.conversation_id,
-                    "ai_agent_name": agent_name,
-                    "caller_name": self.name or '',
-                    "caller_phone": self.phone or '',
-                    "location": self.location or '',
-                    "service": self.service or '',
-                    "vehicle_make": self.make or '',
-                    "vehicle_model": self.model or '',
-                    "vehicle_color": self.color or '',
-                    "vehicle_year": self.year or '',
-                    "summary": self.summary,
-                    "full_transcript": full_transcript
-                }
+                basic_info = bool(self.name and self.phone and self.service and any(s in (self.service or '').lower() for s in service_list))
+                # Log to MongoDB after field updates, with latest transcript/summary and basic_info
                 if self.logger:
+                    log_data = self._log_data()
+                    log_data["basic_info"] = basic_info
+                    log_data["call_action"] = "no_action"
                     await self.logger.upsert_log(self.conversation_id, log_data)
+
+            # Lock the fields ONCE, when all required info is present
+            if self.name and self.phone and self.location and self.service and self.year and (self.make or self.model) and not self._done:
+                self._done = True
+                logger.info(f"Agent2 locked: name={self.name}, phone={self.phone}, location={self.location}, service={self.service}, make={self.make}, model={self.model}, color={self.color}, year={self.year}")
+                if self.summary is None:
+                    await self._summarize()  # the SIP message needs one; later ones are debounced / at hangup
+                if self.logger:
+                    await self.logger.upsert_log(self.conversation_id, self._log_data())
                     logger.info(f"Agent2 upserted log for conversation: {self.conversation_id}")
                 else:
                     logger.warning("Agent2 logger not set, skipping database log.")
@@ -310,6 +233,179 @@ class Agent2:
             logger.error(f"Agent2 error: {e}", exc_info=True)
         return self.name, self.phone, self.location, self.service, self.make, self.model, self.color
 
+    def _update_transcript(self, history: list[ChatMessage]):
+        """Append the messages not yet in full_transcript; each message is formatted exactly once."""
+        new_lines = self._format_delta(history[self._transcript_upto:])
+        self._turns_since_summary += len(history) - self._transcript_upto
+        self._transcript_upto = len(history)
+        if new_lines:
+            self.full_transcript = f"{self.full_transcript}\n{new_lines}" if self.full_transcript else new_lines
+
+    def _summary_due(self) -> bool:
+        """Regenerate at most once per SUMMARY_MIN_INTERVAL seconds, or sooner after SUMMARY_EVERY_TURNS new turns."""
+        if self._turns_since_summary == 0:
+            return False
+        if self.summary is None:
+            return True
+        return (time.monotonic() - self._summary_at >= self.SUMMARY_MIN_INTERVAL
+                or self._turns_since_summary >= self.SUMMARY_EVERY_TURNS)
+
+    async def _summarize(self):
+        summary_prompt = [
+            ChatMessage(
+                role="system",
+                content=["Summarize the following call in 2-3 sentences."]
+            ),
+            ChatMessage(role="user", content=[(self.full_transcript or "")[-2000:]])
+        ]
+        summary_ctx = ChatContext(items=summary_prompt)
+        summary_stream = self.llm.chat(chat_ctx=summary_ctx)
+        summary_content = ""
+        async for chunk in summary_stream:
+            if (
+                hasattr(chunk, "delta") and 
+                hasattr(chunk.delta, "content") and 
+                chunk.delta.content is not None
+            ):
+                summary_content += chunk.delta.content
+        self.summary = summary_content.strip()
+        self._summary_at = time.monotonic()
+        self._turns_since_summary = 0
+
+    async def finalize(self, history: list[ChatMessage]):
+        """At hangup: bring the transcript up to date, produce the final summary once and log both."""
+        if self._finalized:
+            return
+        self._finalized = True
+        self._update_transcript(history)
+        try:
+            if self._turns_since_summary or self.summary is None:
+                await self._summarize()
+        except Exception as e:
+            logger.error(f"Agent2 final summary failed: {e}")
+        if self.logger:
+            await self.logger.upsert_log(self.conversation_id, self._log_data())
+
+    def _log_data(self) -> dict:
+        return {
+            "conversation_id": self.conversation_id,
+            "ai_agent_name": os.getenv("AI_AGENT_NAME", "nathan"),
+            "caller_name": self.name or '',
+            "caller_phone": self.phone or '',
+            "location": self.location or '',
+            "service": self.service or '',
+            "vehicle_make": self.make or '',
+            "vehicle_model": self.model or '',
+            "vehicle_color": self.color or '',
+            "vehicle_year": self.year or '',
+            "summary": self.summary,
+            "full_transcript": self.full_transcript or ''
+        }
+
+    @property
+    def sip_message(self) -> Optional[str]:
+        """Fields, summary and transcript for the executive; None until all required info is locked."""
+        if not self._done:
+            return None
+        sip_lines = [
+            f"Caller: {self.name or ''}",
+            f"Phone: {self.phone or ''}",
+            f"Location: {self.location or ''}",
+            f"Service: {self.service or ''}",
+            f"Make: {self.make or ''}",
+            f"Model: {self.model or ''}",
+            f"Color: {self.color or ''}",
+            f"Year: {self.year or ''}",
+            "",
+            "Summary:",
+            self.summary or '',
+            "",
+            "Transcript:",
+            self.full_transcript or ''
+        ]
+        return "\n".join(sip_lines)
+
+    def pending_delta(self, history: list[ChatMessage]) -> str:
+        """The User/AI lines not yet extracted from (as the extraction prompt sees them), or "" without a new caller turn."""
+        new_messages = history[self._processed_upto:]
+        if not any(self._role(m) == "user" for m in new_messages):
+            return ""
+        return self._format_delta(new_messages)
+
+    def _fast_extract(self, messages: list[ChatMessage]) -> bool:
+        """Deterministic fields from the new caller messages (see fast_extract). True if any was set."""
+        changed = False
+        asked = ""
+        for m in messages:
+            role = self._role(m)
+            if role in ("assistant", "ai"):
+                asked = self._text(m)
+            elif role == "user":
+                for field, value in fast_extract.extract(clean_user_text(self._text(m)), asked).items():
+                    changed = self._commit_field(field, value) or changed
+        return changed
+
+    def _llm_needed(self) -> bool:
+        """False once every required field is known (the fast path can finish the job on its own)."""
+        return not (self.name and self.phone and self.location and self.service and self.year and (self.make or self.model))
+
+    async def _llm_extract(self, new_messages: list[ChatMessage], upto: int) -> bool:
+        """Stream the extraction for the new messages; True if any field was set."""
+        delta = self._format_delta(new_messages)
+        prompt = [
+            ChatMessage(
+                role="system",
+                content=[
+                    ("Return JSON with the keys name, phone, location, service, make, model, color, year (all strings). "
+                     + extraction_instructions())
+                ]
+            ),
+            ChatMessage(role="user", content=[f"KNOWN: {json.dumps(self.known_fields())}\n\nNEW:\n{delta[-32000:]}"])
+        ]
+        t0 = time.perf_counter()
+        parser = JsonFieldStream()
+        changed = False
+        try:
+            async for text in self._stream_extraction(ChatContext(items=prompt)):
+                # Commit each field the moment its value has streamed, not after the whole response
+                for field, value in parser.feed(text):
+                    if field in CALLER_FIELDS and self._commit_field(field, value):
+                        changed = True
+                        if self.has_all_required_info() and not parser.done:
+                            logger.info(f"Agent2: all required fields present {(time.perf_counter() - t0) * 1000:.0f} ms into the extraction stream")
+        except ValueError as e:
+            logger.warning(f"Agent2: Malformed extraction output ({e}); keeping {len(parser.fields)} field(s) parsed before it")
+            # feed() raised before returning the fields completed earlier in the same chunk
+            for field, value in parser.fields.items():
+                if field in CALLER_FIELDS and self._commit_field(field, value):
+                    changed = True
+        if parser.done:
+            # Fully parsed: these messages won't be sent again (an incomplete response retries them)
+            self._processed_upto = upto
+        else:
+            logger.warning(f"Agent2: Extraction response ended early, will retry these messages next tick (got {sorted(parser.fields)})")
+        return changed
+
+    async def _stream_extraction(self, chat_ctx: ChatContext):
+        """Text deltas of the extraction call, constrained to EXTRACTION_RESPONSE_FORMAT when the LLM plugin supports it."""
+        try:
+            llm_stream = self.llm.chat(chat_ctx=chat_ctx, response_format=EXTRACTION_RESPONSE_FORMAT)
+        except TypeError:
+            # Older livekit-plugins-openai without structured output: the prompt still asks for this JSON
+            llm_stream = self.llm.chat(chat_ctx=chat_ctx)
+        async for text in llm_usage.deltas(llm_stream, "extraction"):
+            yield text
+
+    def _commit_field(self, field: str, value) -> bool:
+        """Set `field` from an extracted value unless it is already known. True if it changed."""
+        if value is None or (isinstance(value, str) and value.strip().lower() == 'null'):
+            return False
+        value = str(value).strip()
+        if not value or getattr(self, field):
+            return False
+        setattr(self, field, value)
+        return True
+
     def missing_name_or_phone(self):
         missing = []
         if not self.name:
@@ -1,21 +1,15 @@
 import os
-import subprocess
 import logging
 import re
-import redis
+
+from redis_pool import get_redis
+from sip_message import get_sender, split_body
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger("Agent3")
 
 class Agent3:
-    def __init__(self, send_script_path=None):
-        # Path to sendSipMsg.py
-        if send_script_path is None:
-            # Default to same directory as this file
-            send_script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sendSipMsg.py')
-        self.send_script_path = send_script_path
-
-    def send_transcription(self, extension, transcription_path, max_length=400, sip_server="65.19.173.80", sip_port=5080):
+    async def send_transcription(self, extension, transcription_path, max_length=400, sip_server="65.19.173.80", sip_port=5080):
         """
         Send only the required fields (Caller, Phone, Location, Service, Make, Model, Color) as SIP MESSAGE(s) to the given extension.
         Extract these fields from the transcription file and format them as a concise message.
@@ -37,23 +31,24 @@ class Agent3:
                 extracted[field] = ""
         # Format message
         msg_lines = [f"{field}: {extracted[field]}" for field in fields if extracted[field]]
-        message = "; ".join(msg_lines)  # Use '; ' as separator for single-argument passing
+        message = "; ".join(msg_lines)
         # Split into chunks if too long
         messages = [message[i:i+max_length] for i in range(0, len(message), max_length)]
-        for idx, msg in enumerate(messages):
-            try:
-                logger.info(f"Sending SIP MESSAGE to {extension} (part {idx+1}/{len(messages)})")
-                cmd = ['python3', self.send_script_path, str(extension), msg]
-                if sip_server and sip_port:
-                    cmd.extend([str(sip_server), str(sip_port)])
-                subprocess.run(cmd, check=True)
-            except Exception as e:
-                logger.error(f"Failed to send SIP MESSAGE to {extension}: {e}")
-                return False
+        if len(messages) > 1:
+            # Chunks go out concurrently and may arrive out of order; number them for the reader
+            messages = [f"[{idx+1}/{len(messages)}] {msg}" for idx, msg in enumerate(messages)]
+        logger.info(f"Sending SIP MESSAGE to {extension} ({len(messages)} part(s))")
+        sender = await get_sender()
+        results = await sender.send_many(extension, messages, sip_server, sip_port)
+        failed = [r for r in results if isinstance(r, Exception)]
+        for e in failed:
+            logger.error(f"Failed to send SIP MESSAGE to {extension}: {e}")
+        if failed:
+            return False
         logger.info(f"Successfully sent transcription to {extension}")
         return True
 
-    def send_transcription_to_room_member(self, room_name, message, redis_host="15.204.51.230", redis_port=6379, redis_password="2123tt", override_ip=None, override_port=None, override_extension=None):
+    async def send_transcription_to_room_member(self, room_name, message, override_ip=None, override_port=None, override_extension=None):
         """
         Look up the SIP endpoint for the given room in Redis and send the transcript to that endpoint.
         The Redis value should be in the format ip:port:extension.
@@ -67,9 +62,8 @@ class Agent3:
             extension = override_extension
             logger.info(f"Using override SIP endpoint: {ip}:{port}:{extension}")
         else:
-            r = redis.Redis(host=redis_host, port=redis_port, db=0, password=redis_password)
             key = f"room_member:{room_name}"
-            value = r.get(key)
+            value = await get_redis().get(key)
             if not value:
                 logger.error(f"No room member found in Redis for key {key}")
                 return False
@@ -83,17 +77,18 @@ class Agent3:
             logger.error("No message content provided to send.")
             return False
 
-        # Call sendSipMsg.py
-        cmd = ["python3", "ai-agent/sendSipMsg.py", extension, message, ip, port]
-        logger.info(f"Sending SIP MESSAGE to {extension} at {ip}:{port}")
+        parts = split_body(message)  # one UDP request each; numbered, since they go out concurrently
+        logger.info(f"Sending SIP MESSAGE to {extension} at {ip}:{port} ({len(parts)} part(s))")
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                logger.info(f"Successfully sent SIP MESSAGE to {extension} at {ip}:{port}")
-                return True
-            else:
-                logger.error(f"Failed to send SIP MESSAGE: {result.stderr}")
-                return False
-        except Exception as e:
-            logger.error(f"Exception while sending SIP MESSAGE: {e}")
-            return False 
\ No newline at end of file
+            sender = await get_sender()
+        except OSError as e:
+            logger.error(f"Failed to send SIP MESSAGE: {e}")
+            return False
+        results = await sender.send_many(extension, parts, ip, port)
+        failed = [r for r in results if isinstance(r, Exception)]
+        for e in failed:
+            logger.error(f"Failed to send SIP MESSAGE to {extension} at {ip}:{port}: {e}")
+        if failed:
+            return False
+        logger.info(f"Successfully sent SIP MESSAGE to {extension} at {ip}:{port}")
+        return True
@@ -2,6 +2,7 @@ import os
 import sys
 import time
 import uuid
+import json
 import requests
 import jwt
 import logging
@@ -30,22 +31,39 @@ if len(sys.argv) > 1:
     ROOM_NAME = sys.argv[1]
 
 
-def generate_jwt():
+TOKEN_TTL            = 3600  # seconds a signed Twirp token is valid
+TOKEN_REFRESH_MARGIN = 60    # re-sign this long before expiry
+SIP_CALL_GRANTS      = {"call": True, "admin": True}
+
+_token_cache = {}  # canonical grants JSON -> (token, exp)
+
+# One keep-alive session for every Twirp call in this process (also used by Agent1)
+http = requests.Session()
+
+
+def generate_jwt(sip_grants=None):
+    """Signed token for `sip_grants`, reused until TOKEN_REFRESH_MARGIN before it expires."""
+    grants = sip_grants or SIP_CALL_GRANTS
+    key = json.dumps(grants, sort_keys=True)
+    now = time.time()
+    cached = _token_cache.get(key)
+    if cached and now < cached[1] - TOKEN_REFRESH_MARGIN:
+        return cached[0]
+    exp = int(now) + TOKEN_TTL
     payload = {
         "iss": LIVEKIT_API_KEY,
         "sub": "sip-service",
-        "exp": int(time.time()) + 3600,
-        "sip": {
-            "call": True,
-            "admin": True
-        }
+        "exp": exp,
+        "sip": grants,
     }
-    return jwt.encode(payload, LIVEKIT_API_SECRET, algorithm="HS256")
+    token = jwt.encode(payload, LIVEKIT_API_SECRET, algorithm="HS256")
+    _token_cache[key] = (token, exp)
+    return token
 
 
-def headers():
+def headers(sip_grants=None):
     return {
-        "Authorization": f"Bearer {generate_jwt()}",
+        "Authorization": f"Bearer {generate_jwt(sip_grants)}",
         "Content-Type": "application/json",
     }
 
@@ -53,7 +71,7 @@ def headers():
 def list_trunks():
     """List all SIP outbound trunks and return them as a list."""
     url_list = f"{LIVEKIT_REST_URL}/twirp/livekit.SIP/ListSIPOutboundTrunk"
-    r = requests.post(url_list, headers=headers(), json={})
+    r = http.post(url_list, headers=headers(), json={})
     if r.status_code == 200:
         return r.json().get("items") or r.json().get("sip_trunks", [])
     else:
@@ -79,7 +97,7 @@ def get_or_create_trunk():
         }
     }
     url_create = f"{LIVEKIT_REST_URL}/twirp/livekit.SIP/CreateSIPOutboundTrunk"
-    r = requests.post(url_create, headers=headers(), json=body)
+    r = http.post(url_create, headers=headers(), json=body)
     logger.info(f"CreateSIPOutboundTrunk response: {r.status_code} {r.text}")
     r.raise_for_status()
     return r.json()["sip_trunk_id"]
@@ -98,7 +116,7 @@ def join_sip_participant(trunk_id, extension, room_name, identity=None):
     }
     url = f"{LIVEKIT_REST_URL}/twirp/livekit.SIP/CreateSIPParticipant"
     try:
-        r = requests.post(url, headers=headers(), json=payload)
+        r = http.post(url, headers=headers(), json=payload)
         logger.info(f"[Join] SIP participant {extension} join response: {r.status_code} {r.text}")
         r.raise_for_status()
         return True
@@ -126,7 +144,7 @@ def remove_sip_participant(room_name, participant_identity):
         "participant_identity": participant_identity,
     }
     try:
-        r = requests.post(url, headers=headers(), json=payload)
+        r = http.post(url, headers=headers(), json=payload)
         if r.status_code != 200:
             logger.error(f"Failed to remove SIP participant: {r.status_code} {r.text}")
         else:
@@ -1,6 +1,8 @@
 import os
+import time
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 from pymongo.errors import CollectionInvalid
 from dotenv import load_dotenv
 from datetime import datetime
@@ -14,14 +16,23 @@ class TranscriptLogger:
     """
     Async logger for `towing_services_transcripts_logs`.
     Ensures the collection exists and upserts with a fixed ISO-8601 timestamp string.
+    Writes are write-behind: updates are buffered per log_id and flushed together with bulk_write.
     """
     COLLECTION_NAME = "towing_services_transcripts_logs"
     TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"  # e.g., "2025-06-21T08:30:00Z"
+    FLUSH_WINDOW = float(os.getenv("TRANSCRIPT_FLUSH_WINDOW", "2.0"))  # seconds updates are coalesced before a write
+    FLUSH_MAX_BACKOFF = float(os.getenv("TRANSCRIPT_FLUSH_MAX_BACKOFF", "30.0"))  # longest wait between failed flushes
 
     def __init__(self, client: AsyncIOMotorClient, db):
         self.client = client
         self.db = db
         self.collection = db[self.COLLECTION_NAME]
+        self._pending: dict[str, dict] = {}  # log_id -> merged $set payload not yet written
+        self._flusher: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self.updates_queued = 0
+        self.docs_written = 0
+        self.flush_latencies: list[float] = []  # seconds per bulk_write
 
     @classmethod
     async def create(cls):
@@ -55,42 +66,94 @@ class TranscriptLogger:
 
     async def upsert_log(self, log_id: str, data: dict):
         """
-        Upsert a document by log_id, merging `data` and setting `timestamp`
-        to the current UTC time in ISO-8601 format.
+        Queue `data` to be merged into the document for log_id, with `timestamp`
+        set to the current UTC time in ISO-8601 format.
+        Updates to the same log_id within FLUSH_WINDOW are coalesced into one write;
+        call flush() (or aclose()) to make sure they have reached MongoDB.
         """
         ts_str = datetime.utcnow().strftime(self.TIMESTAMP_FORMAT)
-        payload = {**data, "timestamp": ts_str}
-        try:
-            result = await self.collection.update_one(
-                {"log_id": log_id},
-                {"$set": payload},
-                upsert=True
-            )
-            print(f"[TranscriptLogger] Upserted log for {log_id}: upserted_id={getattr(result, 'upserted_id', None)}, modified_count={getattr(result, 'modified_count', None)}")
+        self._pending.setdefault(log_id, {}).update({**data, "timestamp": ts_str})
+        self.updates_queued += 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        # Keeps running while updates are queued: upserts made during a write, or a batch put back after a failure
+        delay = self.FLUSH_WINDOW
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.flush()
+                delay = self.FLUSH_WINDOW
+            except Exception:
+                # already logged; the batch is queued again, retry with backoff
+                delay = min(delay * 2, self.FLUSH_MAX_BACKOFF)
+                print(f"[TranscriptLogger] Retrying flush in {delay:.1f}s")
+            if not self._pending:
+                return
+
+    @property
+    def queue_depth(self) -> int:
+        """Documents with updates not yet written."""
+        return len(self._pending)
+
+    async def flush(self):
+        """Write every queued update now, one bulk_write for all pending log_ids."""
+        async with self._flush_lock:
+            if not self._pending:
+                return None
+            batch, self._pending = self._pending, {}
+            ops = [UpdateOne({"log_id": log_id}, {"$set": payload}, upsert=True) for log_id, payload in batch.items()]
+            t0 = time.perf_counter()
+            try:
+                result = await self.collection.bulk_write(ops, ordered=False)
+            except BaseException as e:  # cancellation too, so aclose() never drops a batch in flight
+                # Put the batch back under anything queued since, so nothing newer is overwritten
+                for log_id, payload in batch.items():
+                    self._pending[log_id] = {**payload, **self._pending.get(log_id, {})}
+                print(f"[TranscriptLogger] ERROR during flush of {len(ops)} log(s): {e}")
+                raise
+            self.flush_latencies.append(time.perf_counter() - t0)
+            self.docs_written += len(ops)
+            print(f"[TranscriptLogger] Flushed {len(ops)} log(s) in {self.flush_latencies[-1] * 1000:.0f} ms: upserted={result.upserted_count}, modified={result.modified_count}")
             return result
-        except Exception as e:
-            print(f"[TranscriptLogger] ERROR during upsert_log for {log_id}: {e}")
-            raise
+
+    async def aclose(self):
+        """Final flush (call on disconnect); later upserts start a new window."""
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+        self._flusher = None
+        await self.flush()
+        print(f"[TranscriptLogger] Stats: {self.stats()}")
+
+    def stats(self) -> dict:
+        lat = sorted(self.flush_latencies)
+        return {
+            "queue_depth": self.queue_depth,
+            "updates_queued": self.updates_queued,
+            "docs_written": self.docs_written,
+            "flushes": len(lat),
+            "flush_p50_ms": round(lat[len(lat) // 2] * 1000, 1) if lat else None,
+            "flush_max_ms": round(lat[-1] * 1000, 1) if lat else None,
+        }
 
 async def main():
     # Initialize the logger
     logger = await TranscriptLogger.create()
 
-    # Example upsert
-    result = await logger.upsert_log(
+    # Example upserts: coalesced into a single write
+    await logger.upsert_log(
         log_id="abc1234",
         data={
             "caller": "John Doe",
             "transcript": "Hi, I need a tow to 123 Maple St.",
-            "status": "pending"
         }
     )
-
-    print("Upserted ID:", result.upserted_id)
-    print("Modified count:", result.modified_count)
+    await logger.upsert_log(log_id="abc1234", data={"status": "pending"})
+    await logger.aclose()
 
     # Close client
     logger.client.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark: per-stage LLM calls vs the combined turn classifier, replayed over recorded calls.
+
+Each call's full_transcript ("User: ..." / "AI: ..." lines, as stored in the transcript logs) is fed
+turn by turn through CallDispatcher's user-turn stages, once per mode, with real LLM calls and with
+speech, transfer and hangup stubbed out. Prints tokens, call counts and latency per stage
+(llm_usage), the mean critical path per turn, and how often the two modes agree.
+
+Export the transcripts first, e.g.:
+  mongoexport --collection towing_services_transcripts_logs --fields full_transcript --out calls.jsonl ...
+
+Usage: python3 bench_classifier.py calls.jsonl [max_calls]
+"""
+import asyncio
+import json
+import logging
+import statistics
+import sys
+
+from livekit.agents.llm import ChatMessage
+
+import llm_usage
+import turn_classifier
+from agent1 import Agent1
+from call_dispatcher import CallDispatcher
+
+logging.disable(logging.CRITICAL)
+
+PATH = sys.argv[1] if len(sys.argv) > 1 else "calls.jsonl"
+MAX_CALLS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+MODES = ("per_stage", "combined")
+
+
+def load_transcripts(path):
+    transcripts = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                text = json.loads(line).get("full_transcript")
+                if text:
+                    transcripts.append(text)
+    return transcripts[:MAX_CALLS]
+
+
+def messages(transcript):
+    for line in transcript.splitlines():
+        role, _, text = line.partition(": ")
+        if role == "User":
+            yield ChatMessage(role="user", content=[text])
+        elif role == "AI":
+            yield ChatMessage(role="assistant", content=[text])
+
+
+async def noop(*args, **kwargs):
+    return None
+
+
+async def replay(transcript):
+    """(verdict, fields, routing, turn critical paths) for one recorded call in the current mode."""
+    agent = Agent1()
+    agent.set_safe_say(noop)
+    outcome = {"verdict": None}
+
+    async def on_emergency(verdict):
+        outcome["verdict"] = verdict
+
+    async def on_spam():
+        outcome["verdict"] = "spam"
+        return True
+
+    agent.transfer_for_emergency = on_emergency
+    agent.hangup_if_spam = on_spam
+    dispatcher = CallDispatcher(agent, noop)
+    for message in messages(transcript):
+        agent.chat_history.append(message)
+        role = getattr(message.role, "name", str(message.role)).lower()
+        if role == "user" and await dispatcher._run_turn_stages():
+            break
+    routing = None
+    if outcome["verdict"] is None and agent.agent2.has_all_required_info():
+        routing = await agent.decide_routing(agent.agent2.get_collected_data())
+    fields = {k: v for k, v in agent.agent2.get_collected_data().items() if k not in ("summary", "full_transcript")}
+    return outcome["verdict"], fields, routing, [t["critical_path"] for t in dispatcher.turn_latencies]
+
+
+async def main():
+    transcripts = load_transcripts(PATH)
+    print(f"{len(transcripts)} recorded calls from {PATH}")
+    results = {}
+    for mode in MODES:
+        turn_classifier.CLASSIFIER_MODE = mode
+        llm_usage.reset()
+        results[mode] = [await replay(t) for t in transcripts]
+        paths = [p for r in results[mode] for p in r[3]]
+        print(f"\n[{mode}] {len(paths)} turns, critical path mean {statistics.mean(paths or [0]) * 1000:.0f} ms")
+        for stage, c in sorted(llm_usage.usage.items()):
+            print(
+                f"  {stage:>10}: calls {c['calls']:>4}  prompt {c['prompt_tokens']:>8} (cached {c['cached_tokens']:>7})"
+                f"  completion {c['completion_tokens']:>6}  mean {c['seconds'] / c['calls'] * 1000:>6.0f} ms"
+            )
+    pairs = list(zip(*(results[m] for m in MODES)))
+    print("\nagreement between modes:")
+    for label, i in (("verdict", 0), ("fields", 1), ("routing", 2)):
+        same = sum(a[i] == b[i] for a, b in pairs)
+        print(f"  {label:>8}: {same}/{len(pairs)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark: accuracy and latency of the fast_extract fast path over synthetic caller utterances.
+
+Each utterance is generated together with the fields it really contains, including traps the
+extractors must not fire on (house numbers, durations, street and surname look-alikes).
+Reports precision/recall per field and the per-utterance extract() time.
+
+Usage: python3 bench_fast_extract.py [utterances]
+"""
+import random
+import statistics
+import sys
+import time
+
+import fast_extract
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+TEENS = ["ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+MAKES = {"Honda": "honda", "Toyota": "toyota", "Ford": "ford", "Chevrolet": "chevy", "Nissan": "nissan",
+         "BMW": "BMW", "Mercedes-Benz": "mercedes", "Volkswagen": "VW", "Land Rover": "land rover", "Lincoln": "Lincoln"}
+MODELS = ["Civic", "Camry", "F-150", "Malibu", "Altima", "X5", "C-Class", "Jetta", "Range Rover", "Navigator"]
+COLORS = ["black", "white", "silver", "gray", "red", "dark blue", "green", "gold"]
+AGENT_VEHICLE_QUESTIONS = ["What is the year of your vehicle?", "What's the make and model?", "And what color is the car?"]
+AGENT_OTHER_QUESTIONS = ["Where is your vehicle located?", "May I have your name, please?", "What service do you need today?"]
+
+
+def spoken_two_digits(n):
+    if n < 10:
+        return f"oh {ONES[n]}"
+    if n < 20:
+        return TEENS[n - 10]
+    return TENS[n // 10] + (f" {ONES[n % 10]}" if n % 10 else "")
+
+
+def spoken_year(year, rng):
+    if year >= 2000 and (year < 2010 or rng.random() < 0.3):
+        rest = year - 2000
+        if not rest:
+            return "two thousand"
+        return "two thousand " + rng.choice(["", "and "]) + (ONES[rest] if rest < 10 else spoken_two_digits(rest))
+    return ("nineteen " if year < 2000 else "twenty ") + spoken_two_digits(year % 100)
+
+
+def phone_number(rng):
+    return str(rng.randint(2, 9)) + "".join(str(rng.randint(0, 9)) for _ in range(9))
+
+
+def say_phone(digits, rng):
+    style = rng.randrange(4)
+    if style == 0:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    if style == 1:
+        return f"{digits[:3]} {digits[3:6]} {digits[6:]}"
+    if style == 2:
+        return "1-" + f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+    words = [ONES[int(d)] for d in digits]
+    return " ".join(words[:3]) + ", " + " ".join(words[3:6]) + ", " + " ".join(words[6:])
+
+
+def utterance(rng):
+    """(agent question, caller text, expected fields)"""
+    kind = rng.randrange(6)
+    if kind == 0:
+        digits = phone_number(rng)
+        return "Could I get a callback number?", f"Sure, it's {say_phone(digits, rng)}.", {"phone": digits}
+    if kind in (1, 2):
+        year = rng.randint(1985, 2025)
+        make = rng.choice(list(MAKES))
+        color = rng.choice(COLORS)
+        year_text = str(year) if kind == 1 else spoken_year(year, rng)
+        i = list(MAKES).index(make)
+        text = f"It's a {year_text} {MAKES[make]} {MODELS[i]}, {color}."
+        return rng.choice(AGENT_VEHICLE_QUESTIONS), text, {"year": str(year), "make": make, "color": color}
+    if kind == 3:
+        year = rng.randint(1985, 2025)
+        return rng.choice(AGENT_VEHICLE_QUESTIONS[:1]), f"Uh, {spoken_year(year, rng)} I think.", {"year": str(year)}
+    if kind == 4:
+        # traps: an address with a year-like house number, a street named like a make, a color surname,
+        # lot and suite numbers, a year-like duration, a color naming a place, a vehicle type spelled like a make
+        if rng.random() < 0.3:
+            text = f"It's {rng.choice(['John', 'Mary'])} {rng.choice(['White', 'Brown', 'Green'])}."
+            return AGENT_OTHER_QUESTIONS[1], text, {}
+        text = rng.choice([
+            f"My car is at {rng.randint(1950, 2025)} {rng.choice(['Main Street', 'Oak Ave', 'Lincoln Road'])}.",
+            f"I'm on {rng.choice(['Lincoln', 'Jackson'])} Avenue near the gas station.",
+            f"I live at {rng.randint(1950, 2025)} {rng.choice(['Oak', 'Elm', 'Broadway'])}.",
+            f"My car is located at {rng.randint(1950, 2025)} Broadway.",
+            f"My truck is in lot {rng.randint(1950, 2025)}, suite {rng.randint(1950, 2025)}.",
+            f"It'll take {spoken_year(rng.randint(2010, 2025), rng)} minutes to get to my car?",
+            f"I'm on the {rng.choice(['gold', 'silver'])} coast, my car won't start.",
+            "Its a mini van.",
+        ])
+        # asked about the vehicle or not, none of these hold a year, color or make
+        return rng.choice(AGENT_OTHER_QUESTIONS + AGENT_VEHICLE_QUESTIONS), text, {}
+    text = rng.choice([
+        f"How long, like {rng.choice(['twenty five', 'thirty', 'forty five'])} minutes?",
+        "Oh, okay, thank you so much.",
+        f"I need a jump, I've been here since {rng.randint(1, 12)} o'clock.",
+    ])
+    return rng.choice(AGENT_OTHER_QUESTIONS), text, {}
+
+
+def main():
+    rng = random.Random(7)
+    cases = [utterance(rng) for _ in range(N)]
+    fields = ("phone", "year", "color", "make")
+    tp = dict.fromkeys(fields, 0)
+    fp = dict.fromkeys(fields, 0)
+    fn = dict.fromkeys(fields, 0)
+    times = []
+    misses = []
+    for asked, text, expected in cases:
+        t0 = time.perf_counter()
+        got = fast_extract.extract(text, asked)
+        times.append((time.perf_counter() - t0) * 1e6)
+        for field in fields:
+            want, have = expected.get(field), got.get(field)
+            if have == want:
+                tp[field] += have is not None
+            else:
+                if have is not None:
+                    fp[field] += 1
+                if want is not None:
+                    fn[field] += 1
+                if len(misses) < 5:
+                    misses.append((field, text, want, have))
+    print(f"{N} utterances")
+    print(f"{'field':>6} {'precision':>10} {'recall':>8}")
+    for field in fields:
+        precision = tp[field] / ((tp[field] + fp[field]) or 1)
+        recall = tp[field] / ((tp[field] + fn[field]) or 1)
+        print(f"{field:>6} {precision:>10.3f} {recall:>8.3f}")
+    times.sort()
+    print(f"extract(): mean {statistics.mean(times):.1f} us, p50 {times[len(times) // 2]:.1f} us, p99 {times[int(len(times) * 0.99)]:.1f} us")
+    for field, text, want, have in misses:
+        print(f"  miss [{field}] {text!r}: expected {want!r}, got {have!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: legacy rules evaluation (re-read rules.json, lowercase, nested substring scan)
+vs the compiled RuleEngine, over synthetic transcripts of growing length.
+
+Usage: python3 bench_rules.py [iterations]
+"""
+import json
+import logging
+import random
+import sys
+import time
+
+import rules
+
+logging.disable(logging.CRITICAL)
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+FILLER = [
+    "User: Hi, my car won't start this morning.",
+    "AI: I'm sorry to hear that. May I have your name, please?",
+    "User: It's Maria, I'm parked outside the grocery store on Main Street.",
+    "AI: Thanks Maria. Could I get a 10-digit callback number?",
+    "User: Sure, it's five five five, one two three, four five six seven.",
+    "AI: What is the year of your vehicle?",
+    "User: It's a 2016 Honda Civic, silver.",
+]
+
+
+def legacy_evaluate(collected_data, stage):
+    with open(rules.RULES_PATH) as f:
+        cfg = json.load(f)
+    for rule in cfg.get("rules", []):
+        if rule.get("stage") != stage:
+            continue
+        data = str(collected_data.get(rule["field"], "") or "").lower()
+        if not data:
+            continue
+        if rule["operator"] == "contains_any" and any(str(v).lower() in data for v in rule["value"]):
+            return rule["action"]
+    return cfg.get("default_action", "transfer") if stage == "routing" else None
+
+
+def make_transcript(n_lines, rng):
+    return "\n".join(rng.choice(FILLER) for _ in range(n_lines))
+
+
+def timeit(fn, snapshots, stage):
+    t0 = time.perf_counter()
+    for data in snapshots:
+        result = fn(data, stage)
+    return (time.perf_counter() - t0) / len(snapshots) * 1e6, result
+
+
+def main():
+    rng = random.Random(7)
+    print("'repeat': same transcript on every tick (no new speech); 'append': one new line per tick")
+    print(f"{'lines':>6} {'chars':>8} {'mode':>7} {'stage':>16} {'legacy us':>10} {'compiled us':>12} {'speedup':>8}")
+    for n_lines in (10, 100, 1000, 5000):
+        base = make_transcript(n_lines, rng)
+        repeat = [{"full_transcript": base, "service": "jump start"}] * ITERATIONS
+        append, text = [], base
+        for _ in range(ITERATIONS):
+            text = text + "\n" + rng.choice(FILLER)
+            append.append({"full_transcript": text, "service": "jump start"})
+        for mode, snapshots in (("repeat", repeat), ("append", append)):
+            for stage in ("spam_check", "emergency_check", "routing"):
+                rules._ENGINE = rules.RuleEngine()  # cold engine for every run
+                legacy_us, legacy_result = timeit(legacy_evaluate, snapshots, stage)
+                compiled_us, compiled_result = timeit(rules.evaluate_rules, snapshots, stage)
+                assert legacy_result == compiled_result, (stage, legacy_result, compiled_result)
+                print(f"{n_lines:>6} {len(base):>8} {mode:>7} {stage:>16} {legacy_us:>10.1f} {compiled_us:>12.1f} {legacy_us / compiled_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
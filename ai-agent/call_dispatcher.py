@@ -0,0 +1,275 @@
+# call_dispatcher.py
+import asyncio
+import logging
+import time
+
+import turn_classifier
+
+logger = logging.getLogger("CallDispatcher")
+
+# Ordered: the first missing field is prompted for
+REQUIRED_FIELDS = [
+    ("name", "May I have your name, please?"),
+    ("phone", "Could I get a 10-digit callback number?"),
+    ("service", "What service do you need? (e.g., lockout, jump, tow, tire, fuel)"),
+    ("location", "Where is your vehicle located?"),
+    ("year", "What is the year of your vehicle? (e.g., 2018)")
+]
+SILENCE_INTERVALS = [20, 30, 45, 60]  # Escalating intervals
+SILENCE_PROMPTS = [
+    "Just checking, are you still there?",
+    "If you need more time, just let me know.",
+    "I'll stay on the line a bit longer if you need more time.",
+    "It seems we've lost connection. I'll end the call now, but please call back if you need further assistance."
+]
+TRANSFER_FALLBACK_DELAY = 10  # matches Agent1.should_call's "all info present for 10s" fallback
+
+# Event names
+USER_TURN = "user_turn"
+STATE_CHANGED = "state_changed"
+SILENCE = "silence"
+
+
+class CallDispatcher:
+    """
+    Runs the per-call stages when their inputs change instead of on a fixed poll:
+      - a user turn runs extraction and the emergency/spam checks concurrently (see
+        _run_turn_stages), then field prompting and the transfer evaluation on the
+        freshly extracted fields
+      - a state change (e.g. ready_for_transfer) re-runs the transfer evaluation
+      - silence deadlines are timers (loop.call_later) re-armed on every message
+    Events arriving while stages are running are coalesced into the next pass, so stages
+    never run concurrently with themselves.
+    """
+
+    def __init__(self, agent, say_goodbye_and_disconnect):
+        self.agent = agent
+        self._say_goodbye = say_goodbye_and_disconnect
+        self._loop = asyncio.get_event_loop()
+        self._wakeup = asyncio.Event()
+        self._pending: dict[str, float] = {}  # event -> first trigger time (monotonic)
+        self._silence_handle: asyncio.TimerHandle | None = None
+        self._transfer_handle: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task | None = None
+        self.silence_count = 0
+        self.reaction_latencies: dict[str, list[float]] = {}  # event -> seconds from trigger to handled
+        self.turn_latencies: list[dict[str, float]] = []  # per user turn: stage -> seconds, plus "critical_path"
+
+    # ─── lifecycle ──────────────────────────────────────────────────
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._arm_silence_timer()
+
+    def stop(self):
+        for handle in (self._silence_handle, self._transfer_handle):
+            if handle:
+                handle.cancel()
+        if self._task and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # ─── event sources ──────────────────────────────────────────────
+    def on_user_turn(self):
+        self.silence_count = 0
+        self._arm_silence_timer()
+        self._trigger(USER_TURN)
+
+    def on_agent_turn(self):
+        self._arm_silence_timer()
+
+    def on_state_changed(self):
+        self._trigger(STATE_CHANGED)
+
+    def _trigger(self, event: str):
+        self._pending.setdefault(event, time.monotonic())
+        self._wakeup.set()
+
+    def _arm_silence_timer(self):
+        if self._silence_handle:
+            self._silence_handle.cancel()
+        interval = SILENCE_INTERVALS[min(self.silence_count, len(SILENCE_INTERVALS) - 1)]
+        self._silence_handle = self._loop.call_later(interval, self._trigger, SILENCE)
+
+    def _arm_transfer_fallback(self):
+        """All info is present but not yet confirmed: re-evaluate once the fallback window has passed."""
+        if self._transfer_handle:
+            self._transfer_handle.cancel()
+        ready_since = getattr(self.agent, '_all_info_ready_time', time.time())
+        delay = max(0.5, TRANSFER_FALLBACK_DELAY - (time.time() - ready_since) + 0.5)
+        self._transfer_handle = self._loop.call_later(delay, self._trigger, STATE_CHANGED)
+
+    # ─── dispatch loop ──────────────────────────────────────────────
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            events, self._pending = self._pending, {}
+            try:
+                finished = await self._dispatch(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Dispatcher] Stage error: {e}")
+                finished = self.agent.transfer_initiated
+            now = time.monotonic()
+            for event, t0 in events.items():
+                latency = now - t0
+                self.reaction_latencies.setdefault(event, []).append(latency)
+                logger.info(f"[Dispatcher] {event} handled in {latency * 1000:.1f} ms")
+            if finished:
+                logger.info("[Dispatcher] Call reached a terminal state, stopping.")
+                self.stop()
+                return
+
+    async def _dispatch(self, events: dict[str, float]) -> bool:
+        """Run the stages affected by `events`. Returns True once the call is over for the dispatcher."""
+        if USER_TURN in events:
+            if self._llm_allowed():
+                if await self._run_turn_stages():
+                    return True
+                await self._prompt_missing_field()
+        if SILENCE in events:
+            if await self._handle_silence():
+                return True
+        if USER_TURN in events or STATE_CHANGED in events:
+            return await self._evaluate_transfer()
+        return False
+
+    async def _run_turn_stages(self) -> bool:
+        """
+        Run one user turn's classifiers concurrently instead of back to back (in the combined
+        classifier mode, the single Agent1.classify_turn call takes their place):
+          - extraction (Agent2.process_history)
+          - the emergency verification of new keyword hits (the spam keywords are scanned with it)
+          - when every field was already known, a speculative routing decision; it lands in
+            Agent1's routing memo and is reused by the transfer evaluation if the turn didn't
+            change the service or summary
+        A terminal verdict (emergency before spam, as before) cancels the stages still running
+        and then acts on it. Returns True if the call was handed off or hung up.
+        """
+        agent = self.agent
+        t0 = time.monotonic()
+        if turn_classifier.combined_enabled():
+            # One call for fields and every verdict; spam is decided inside it
+            tasks = {"classifier": asyncio.create_task(agent.classify_turn())}
+            verdict_stage = "classifier"
+        else:
+            tasks = {
+                "extraction": asyncio.create_task(agent.agent2.process_history(agent.chat_history)),
+                "emergency": asyncio.create_task(agent.classify_emergency()),
+            }
+            if not agent.transfer_initiated and agent.agent2.has_all_required_info():
+                tasks["routing"] = asyncio.create_task(agent.decide_routing(agent.agent2.get_collected_data()))
+            verdict_stage = "emergency"
+        names = {task: name for name, task in tasks.items()}
+        timings: dict[str, float] = {}  # stage -> seconds from turn start to its result
+        for name, task in tasks.items():
+            task.add_done_callback(lambda t, name=name: t.cancelled() or timings.setdefault(name, time.monotonic() - t0))
+        verdict = None
+        pending = set(tasks.values())
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if tasks[verdict_stage] in done:
+                    verdict = tasks[verdict_stage].result()
+                    if verdict is None and verdict_stage == "emergency" and agent.spam_detected:
+                        verdict = "spam"
+                    if verdict is not None:
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        for name, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                logger.error(f"[Dispatcher] {name} stage failed: {task.exception()!r}")
+        self._record_turn(timings, time.monotonic() - t0, [names[task] for task in pending])
+
+        if verdict == "spam":
+            logger.info("[Dispatcher] Spam detected.")
+            return await agent.hangup_if_spam()
+        if verdict is not None:
+            await agent.transfer_for_emergency(verdict)
+            logger.info("[Dispatcher] Emergency detected and handled.")
+            return True
+        return False
+
+    def _record_turn(self, timings: dict[str, float], critical_path: float, cancelled: list[str]):
+        stages = ", ".join(f"{name} {t * 1000:.0f} ms" for name, t in timings.items())
+        if cancelled:
+            stages += f"; cancelled {', '.join(sorted(cancelled))}"
+        else:
+            stages += f" (back to back: {sum(timings.values()) * 1000:.0f} ms)"
+        logger.info(f"[Dispatcher] Turn stages: {stages}; critical path {critical_path * 1000:.0f} ms")
+        timings["critical_path"] = critical_path
+        self.turn_latencies.append(timings)
+
+    def _llm_allowed(self) -> bool:
+        # Only process LLM if not blocked, or if last user message contains 'hey reception'
+        agent = self.agent
+        if not getattr(agent, 'block_llm', False):
+            return True
+        last_user = next((item for item in reversed(agent.chat_history) if getattr(item.role, 'name', str(item.role)).lower() == 'user'), None)
+        if last_user and 'hey reception' in (last_user.content[0] if isinstance(last_user.content, list) else last_user.content).lower():
+            return True
+        logger.info("[Dispatcher] Blocked LLM after transfer (block_llm, no wake word).")
+        return False
+
+    async def _prompt_missing_field(self):
+        # --- Prompt for the first missing field in required order ---
+        agent = self.agent
+        a2 = agent.agent2
+        for field, prompt in REQUIRED_FIELDS:
+            if not getattr(a2, field):
+                if getattr(agent, 'waiting_for_field', None) != field:
+                    await agent.safe_say(prompt)
+                    agent.waiting_for_field = field
+                return
+        # Special handling for make/model: require at least one
+        if not a2.make and not a2.model:
+            if getattr(agent, 'waiting_for_field', None) != 'make':
+                await agent.safe_say("What is the make of your vehicle? (e.g., Toyota, Ford, BMW)")
+                agent.waiting_for_field = 'make'
+        # Only prompt for color if all else is present and color is missing
+        elif not a2.color:
+            if getattr(agent, 'waiting_for_field', None) != 'color':
+                await agent.safe_say("What is the color of your vehicle?")
+                agent.waiting_for_field = 'color'
+        else:
+            agent.waiting_for_field = None
+
+    async def _handle_silence(self) -> bool:
+        agent = self.agent
+        if getattr(agent, 'waiting_for_field', None) or agent.silent_mode or agent.transfer_initiated:
+            self._arm_silence_timer()
+            return False
+        prompt = SILENCE_PROMPTS[min(self.silence_count, len(SILENCE_PROMPTS) - 1)]
+        self.silence_count += 1
+        await agent.safe_say(prompt)
+        agent.last_speech_time = time.time()  # Reset after speaking
+        # After 3+ silences, end the call politely
+        if self.silence_count >= len(SILENCE_PROMPTS):
+            await self._say_goodbye(agent)
+            return True
+        self._arm_silence_timer()
+        return False
+
+    async def _evaluate_transfer(self) -> bool:
+        agent = self.agent
+        if agent.transfer_initiated:
+            return True
+        try:
+            await agent.trigger_transfer_if_ready()
+        except Exception as e:
+            logger.error(f"[Dispatcher] Transfer sequence failed: {e}")
+        if agent.transfer_initiated:
+            return True  # Stop dispatching after transfer / end_call
+        if agent.agent2.has_all_required_info():
+            self._arm_transfer_fallback()
+        return False
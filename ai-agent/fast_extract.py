@@ -0,0 +1,276 @@
+"""
+Deterministic extractors for the caller fields that don't need an LLM: phone, vehicle year, color and make.
+
+Agent2 runs extract() on every new caller message before its LLM call, so these fields are set the
+moment they are spoken. Each extractor returns None unless it is confident; whatever it misses is
+still picked up by the LLM extraction. Years, colors and makes that are also ordinary words
+("Lincoln", "red", "2010") are only taken in a vehicle context: an agent question about the
+vehicle's year/make/model/color just before the message, or a vehicle word or unambiguous make within
+VEHICLE_WINDOW tokens of the match. A year is never taken after an address word ("at", "lot",
+"suite") or before a street or duration word ("Main Street", "minutes"), nor a color that modifies
+some other noun ("gold coast").
+
+Benchmark: python3 bench_fast_extract.py
+"""
+import re
+import datetime
+
+_TOKEN_RE = re.compile(r"\d+|[a-z]+")
+
+MIN_YEAR = 1950
+MAX_YEAR = datetime.date.today().year + 1  # next year's models are on sale
+VEHICLE_WINDOW = 4  # tokens between a year/color/ambiguous make and the vehicle word or make it describes
+
+_DIGIT_WORDS = {
+    "zero": "0", "oh": "0", "o": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+}
+_REPEAT_WORDS = {"double": 2, "triple": 3}
+
+_ONES = {w: int(d) for w, d in _DIGIT_WORDS.items() if w not in ("zero", "oh", "o")}
+_TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+_CENTURIES = {"nineteen": 19, "twenty": 20}
+
+# words after a number that make it a house number, not a model year
+_STREET_WORDS = {
+    "street", "st", "avenue", "ave", "road", "rd", "drive", "dr", "lane", "ln", "boulevard", "blvd",
+    "way", "court", "ct", "highway", "hwy", "parkway", "pkwy", "place", "pl", "circle", "route",
+}
+# words before a number that make it an address, lot or unit number
+_ADDRESS_WORDS = {
+    "at", "lot", "suite", "ste", "unit", "apt", "apartment", "number", "no", "space", "gate", "exit",
+    "room", "building", "bldg", "block", "box", "mile", "marker", "pier", "dock", "stall", "bay",
+}
+# words after a number that make it an amount, not a year
+_QUANTITY_WORDS = {
+    "minutes", "minute", "mins", "min", "hours", "hour", "hrs", "hr", "seconds", "secs", "days", "weeks",
+    "miles", "mile", "feet", "ft", "yards", "meters", "dollars", "bucks", "percent", "times", "people",
+}
+_VEHICLE_WORDS = {
+    "car", "truck", "vehicle", "van", "minivan", "suv", "pickup", "sedan", "coupe", "hatchback",
+    "wagon", "convertible", "motorcycle",
+}
+_VEHICLE_QUESTION_WORDS = {"year", "make", "model", "color", "colour"}
+
+_COLORS = {
+    "black": "black", "white": "white", "silver": "silver", "gray": "gray", "grey": "gray",
+    "red": "red", "blue": "blue", "green": "green", "yellow": "yellow", "orange": "orange",
+    "brown": "brown", "beige": "beige", "tan": "tan", "gold": "gold", "maroon": "maroon",
+    "burgundy": "burgundy", "purple": "purple", "navy": "navy", "champagne": "champagne",
+}
+_COLOR_SHADES = {"dark", "light", "bright", "pearl", "metallic"}
+# words that may follow a color describing the vehicle ("red and white", "black one", "silver, it's")
+_COLOR_FOLLOWERS = {
+    "and", "or", "with", "but", "color", "colour", "one", "paint", "i", "it", "its", "s", "the", "so",
+    "please", "thanks", "thank", "yeah", "yes", "now", "too", "also", "though", "like", "is", "was",
+}
+
+_MAKES = {
+    "acura": "Acura", "audi": "Audi", "bmw": "BMW", "buick": "Buick", "cadillac": "Cadillac",
+    "chevrolet": "Chevrolet", "chevy": "Chevrolet", "chrysler": "Chrysler", "dodge": "Dodge",
+    "fiat": "Fiat", "ford": "Ford", "gmc": "GMC", "honda": "Honda", "hyundai": "Hyundai",
+    "infiniti": "Infiniti", "jaguar": "Jaguar", "jeep": "Jeep", "kia": "Kia", "lexus": "Lexus",
+    "mazda": "Mazda", "mercedes": "Mercedes-Benz", "benz": "Mercedes-Benz", "mitsubishi": "Mitsubishi",
+    "nissan": "Nissan", "pontiac": "Pontiac", "porsche": "Porsche", "subaru": "Subaru",
+    "tesla": "Tesla", "toyota": "Toyota", "volkswagen": "Volkswagen", "vw": "Volkswagen",
+    "volvo": "Volvo",
+}
+_MAKE_PAIRS = {
+    ("land", "rover"): "Land Rover", ("mercedes", "benz"): "Mercedes-Benz",
+    ("alfa", "romeo"): "Alfa Romeo", ("aston", "martin"): "Aston Martin",
+}
+# makes that are also names, places or ordinary words: vehicle context only
+_AMBIGUOUS_MAKES = {"lincoln": "Lincoln", "ram": "Ram", "mini": "Mini", "genesis": "Genesis", "saturn": "Saturn"}
+# an ambiguous make followed by one of these is part of a vehicle type, not the make ("a mini van")
+_NOT_MAKE_BEFORE = {"mini": {"van", "vans", "bus", "truck", "suv", "car"}}
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _phone_in_run(run: list[str]) -> str | None:
+    """First 10-digit number (optionally with a leading 1) that starts and ends on a token boundary."""
+    for start in range(len(run)):
+        digits = ""
+        for chunk in run[start:]:
+            digits += chunk
+            if len(digits) >= 10:
+                break
+        if len(digits) == 11 and digits[0] == "1":
+            digits = digits[1:]
+        if len(digits) == 10 and digits[0] not in "01":  # NANP area codes start at 2
+            return digits
+    return None
+
+
+def extract_phone(text: str) -> str | None:
+    """A 10-digit phone number, from digits ("(555) 123-4567") or spoken digits ("five five five, double two ...")."""
+    run: list[str] = []
+    repeat = 1
+    for tok in _tokens(text) + [""]:
+        if tok.isdigit():
+            chunk = tok
+        elif tok in _REPEAT_WORDS:
+            repeat = _REPEAT_WORDS[tok]
+            continue
+        elif tok in _DIGIT_WORDS and (tok not in ("oh", "o") or run or repeat > 1):  # a leading "oh" is an interjection
+            chunk = _DIGIT_WORDS[tok]
+        else:
+            phone = _phone_in_run(run)
+            if phone:
+                return phone
+            run, repeat = [], 1
+            continue
+        run.append(chunk * repeat)
+        repeat = 1
+    return None
+
+
+def _two_digits(tokens: list[str], i: int) -> tuple[int, int] | None:
+    """(value, tokens used) for a spoken 10..99 or "oh five" at tokens[i]."""
+    tok = tokens[i] if i < len(tokens) else ""
+    if tok in _TEENS:
+        return _TEENS[tok], 1
+    if tok in _TENS:
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        return (_TENS[tok] + _ONES[nxt], 2) if nxt in _ONES else (_TENS[tok], 1)
+    if tok in ("oh", "o", "zero") and i + 1 < len(tokens) and tokens[i + 1] in _ONES:
+        return _ONES[tokens[i + 1]], 2
+    return None
+
+
+def _next_is_street(tokens: list[str], i: int) -> bool:
+    return any(t in _STREET_WORDS for t in tokens[i:i + 3])
+
+
+def _vehicle_positions(tokens: list[str]) -> list[int]:
+    """Indexes of vehicle words and unambiguous makes."""
+    return [i for i, t in enumerate(tokens) if t in _VEHICLE_WORDS or t in _MAKES or t in ("land", "rover", "alfa", "aston")]
+
+
+def _near(positions: list[int], start: int, end: int) -> bool:
+    """True if a position lies within VEHICLE_WINDOW tokens of tokens[start:end]."""
+    return any(start - VEHICLE_WINDOW <= p < end + VEHICLE_WINDOW for p in positions)
+
+
+def _year_at(tokens: list[str], i: int) -> tuple[int, int] | None:
+    """(year, tokens used) for a digit or spoken year starting at tokens[i]."""
+    tok = tokens[i]
+    if tok.isdigit():
+        if len(tok) != 4:
+            return None
+        # part of a longer number ("call 555 123 2016")
+        if (i > 0 and tokens[i - 1].isdigit()) or (i + 1 < len(tokens) and tokens[i + 1].isdigit()):
+            return None
+        return int(tok), 1
+    if tok in _CENTURIES:
+        rest = _two_digits(tokens, i + 1)
+        if rest:
+            return _CENTURIES[tok] * 100 + rest[0], 1 + rest[1]
+    if tok == "two" and i + 1 < len(tokens) and tokens[i + 1] == "thousand":
+        j = i + 2
+        if j < len(tokens) and tokens[j] == "and":
+            j += 1
+        if j < len(tokens) and tokens[j] in _ONES:
+            return 2000 + _ONES[tokens[j]], j + 1 - i
+        rest = _two_digits(tokens, j)
+        if rest:
+            return 2000 + rest[0], j + rest[1] - i
+        return 2000, 2
+    return None
+
+
+def _year_spans(tokens: list[str]):
+    """(year, start, end) for every plausible model year in `tokens`, skipping address and quantity numbers."""
+    for i in range(len(tokens)):
+        found = _year_at(tokens, i)
+        if not found or not MIN_YEAR <= found[0] <= MAX_YEAR:
+            continue
+        end = i + found[1]
+        if (i and tokens[i - 1] in _ADDRESS_WORDS) or _next_is_street(tokens, end):
+            continue
+        if end < len(tokens) and tokens[end] in _QUANTITY_WORDS:
+            continue
+        yield found[0], i, end
+
+
+def extract_year(text: str, near: list[int] | None = None) -> str | None:
+    """
+    A model year, from "2016" or spoken forms ("twenty eighteen", "nineteen ninety nine", "two thousand and eight").
+    With `near` (token positions of vehicle words), only a year close to one of them.
+    """
+    tokens = _tokens(text)
+    for year, start, end in _year_spans(tokens):
+        if near is None or _near(near, start, end):
+            return str(year)
+    return None
+
+
+def _color_spans(tokens: list[str]):
+    """(color, start, end) for every color word not followed by some other noun ("gold coast")."""
+    makes = set(_MAKES) | set(_AMBIGUOUS_MAKES)
+    for i, tok in enumerate(tokens):
+        if tok not in _COLORS:
+            continue
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if nxt and not (nxt in _COLOR_FOLLOWERS or nxt in _VEHICLE_WORDS or nxt in makes or nxt in _COLORS
+                        or nxt.isdigit() or nxt in _CENTURIES or nxt == "two"):
+            continue
+        shade = i and tokens[i - 1] in _COLOR_SHADES
+        yield (f"{tokens[i - 1]} {_COLORS[tok]}" if shade else _COLORS[tok]), i - shade, i + 1
+
+
+def extract_color(text: str, near: list[int] | None = None) -> str | None:
+    """A vehicle color ("dark blue"); with `near`, only one close to a vehicle word (see extract_year)."""
+    for color, start, end in _color_spans(_tokens(text)):
+        if near is None or _near(near, start, end):
+            return color
+    return None
+
+
+def _make(tokens: list[str], ambiguous: bool, near: list[int] | None = None) -> str | None:
+    for i, tok in enumerate(tokens):
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        pair = _MAKE_PAIRS.get((tok, nxt))
+        if pair:
+            return pair
+        if tok in _MAKES:
+            return _MAKES[tok]
+        if (ambiguous and tok in _AMBIGUOUS_MAKES and nxt not in _NOT_MAKE_BEFORE.get(tok, ())
+                and not _next_is_street(tokens[:i + 2], i + 1)  # not "Lincoln Road"
+                and (near is None or _near(near, i, i + 1))):
+            return _AMBIGUOUS_MAKES[tok]
+    return None
+
+
+def extract_make(text: str, vehicle_context: bool = False) -> str | None:
+    """Vehicle make from the gazetteer; ambiguous makes ("Lincoln", "Ram") only with vehicle_context."""
+    return _make(_tokens(text), vehicle_context)
+
+
+def extract(text: str, asked: str = "") -> dict[str, str]:
+    """Fields found in one caller message. `asked` is the agent message just before it, if any."""
+    tokens = _tokens(text)
+    fields = {}
+    phone = extract_phone(text)
+    if phone:
+        fields["phone"] = phone
+    # Answering a vehicle question: anywhere in the message; otherwise only next to a vehicle word or make
+    near = None if any(t in _VEHICLE_QUESTION_WORDS for t in _tokens(asked)) else _vehicle_positions(tokens)
+    if near == []:
+        return fields
+    make = _make(tokens, ambiguous=True, near=near)
+    year = extract_year(text, near)
+    color = extract_color(text, near)
+    for field, value in (("make", make), ("year", year), ("color", color)):
+        if value:
+            fields[field] = value
+    return fields
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# json_stream.py
+"""
+Incremental parser for the flat JSON object Agent2's extraction streams back.
+
+feed() takes text chunks as they arrive and returns each (key, value) pair as soon as the value is
+complete, so a field can be used before the rest of the response has streamed. Values are strings,
+or null/numbers/booleans (returned as decoded JSON). Text before the opening brace (a ```json fence,
+say) is skipped; nested objects and arrays are not supported (the schema has none).
+"""
+import json
+
+_BEFORE, _KEY_OR_END, _KEY, _COLON, _VALUE, _STRING, _LITERAL, _AFTER_VALUE, _DONE = range(9)
+
+
+class JsonFieldStream:
+    def __init__(self):
+        self._state = _BEFORE
+        self._buf: list[str] = []  # raw text of the key / value being read
+        self._escaped = False
+        self._key: str | None = None
+        self.fields: dict = {}
+
+    @property
+    def done(self) -> bool:
+        """True once the closing brace has been read."""
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        out = []
+        for ch in chunk:
+            state = self._state
+            if state == _STRING or state == _KEY:
+                if self._escaped:
+                    self._escaped = False
+                    self._buf.append(ch)
+                elif ch == "\\":
+                    self._escaped = True
+                    self._buf.append(ch)
+                elif ch == '"':
+                    text = json.loads('"' + "".join(self._buf) + '"')
+                    self._buf = []
+                    if state == _KEY:
+                        self._key = text
+                        self._state = _COLON
+                    else:
+                        out.append(self._commit(text))
+                else:
+                    self._buf.append(ch)
+            elif state == _LITERAL:
+                if ch in ",}" or ch.isspace():
+                    out.append(self._commit(json.loads("".join(self._buf))))
+                    self._buf = []
+                    self._after_value(ch)
+                else:
+                    self._buf.append(ch)
+            elif ch.isspace():
+                continue
+            elif state == _BEFORE:
+                if ch == "{":
+                    self._state = _KEY_OR_END
+            elif state == _KEY_OR_END:
+                if ch == '"':
+                    self._state = _KEY
+                elif ch == "}":
+                    self._state = _DONE
+                else:
+                    raise ValueError(f"Expected a key, got {ch!r}")
+            elif state == _COLON:
+                if ch != ":":
+                    raise ValueError(f"Expected ':', got {ch!r}")
+                self._state = _VALUE
+            elif state == _VALUE:
+                if ch == '"':
+                    self._state = _STRING
+                elif ch in "{[":
+                    raise ValueError("Nested values are not supported")
+                else:
+                    self._buf.append(ch)
+                    self._state = _LITERAL
+            elif state == _AFTER_VALUE:
+                self._after_value(ch)
+            # _DONE: ignore trailing text (closing fence etc.)
+        return out
+
+    def _commit(self, value) -> tuple[str, object]:
+        self.fields[self._key] = value
+        self._state = _AFTER_VALUE
+        return self._key, value
+
+    def _after_value(self, ch: str):
+        if ch == ",":
+            self._state = _KEY_OR_END
+        elif ch == "}":
+            self._state = _DONE
+        elif not ch.isspace():
+            raise ValueError(f"Expected ',' or '}}', got {ch!r}")
+        else:
+            self._state = _AFTER_VALUE
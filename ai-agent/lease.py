@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# lease.py
+"""
+Leader lease in Redis, used by VoiceCoordinator to pick the one process that speaks in a room.
+
+Acquire, renew and release are each a single Lua script, so every operation is one atomic round-trip.
+A lease is a hash {owner, token} with a TTL. Each new acquisition takes the next value of a per-key
+counter as its token, and renew/release check it, so an owner whose lease expired and was taken over
+cannot renew or release the new holder's lease. The counter expires one TTL after the last acquisition,
+so an idle key leaves nothing behind in Redis; tokens may then start over, which is safe because they are
+only ever compared together with the owner. The token is not a fence for anything else: nothing
+outside these scripts checks it, so a holder that stalls past its TTL can still act once before it
+notices (`held` bounds that window with the local clock). Liveness comes only from the TTL, which works
+across hosts (no PID checks).
+"""
+import time
+import logging
+
+logger = logging.getLogger("lease")
+
+# KEYS[1] lease hash, KEYS[2] token counter; ARGV[1] owner, ARGV[2] ttl ms -> token, or 0 if held by someone else
+_ACQUIRE = """
+local owner = redis.call('HGET', KEYS[1], 'owner')
+if owner and owner ~= ARGV[1] then
+  return 0
+end
+if not owner then
+  local token = redis.call('INCR', KEYS[2])
+  redis.call('PEXPIRE', KEYS[2], ARGV[2])
+  redis.call('HSET', KEYS[1], 'owner', ARGV[1], 'token', token)
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  return token
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return tonumber(redis.call('HGET', KEYS[1], 'token'))
+"""
+
+# KEYS[1] lease hash; ARGV[1] owner, ARGV[2] token, ARGV[3] ttl ms -> 1 if renewed
+_RENEW = """
+if redis.call('HGET', KEYS[1], 'owner') == ARGV[1] and redis.call('HGET', KEYS[1], 'token') == ARGV[2] then
+  return redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+return 0
+"""
+
+# KEYS[1] lease hash; ARGV[1] owner, ARGV[2] token -> 1 if released
+_RELEASE = """
+if redis.call('HGET', KEYS[1], 'owner') == ARGV[1] and redis.call('HGET', KEYS[1], 'token') == ARGV[2] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class Lease:
+    """A TTL lease on `key` for `owner`. `token` identifies this acquisition while held, else None."""
+
+    def __init__(self, redis_client, key: str, owner: str, ttl: float):
+        self.redis = redis_client
+        self.key = key
+        self.counter_key = f"{key}:token"
+        self.owner = owner
+        self.ttl = ttl
+        self.token: int | None = None
+        self._valid_until = 0.0  # local monotonic deadline; never later than the Redis TTL
+        self._acquire = redis_client.register_script(_ACQUIRE)
+        self._renew = redis_client.register_script(_RENEW)
+        self._release = redis_client.register_script(_RELEASE)
+
+    @property
+    def held(self) -> bool:
+        """True while the lease is ours without asking Redis (local clock, started before the request)."""
+        return self.token is not None and time.monotonic() < self._valid_until
+
+    def _ttl_ms(self, ttl: float | None) -> int:
+        if ttl is not None:
+            self.ttl = ttl
+        return int(self.ttl * 1000)
+
+    async def acquire(self, ttl: float | None = None) -> bool:
+        started = time.monotonic()
+        token = await self._acquire(keys=[self.key, self.counter_key], args=[self.owner, self._ttl_ms(ttl)])
+        if not token:
+            self.token = None
+            return False
+        self.token = int(token)
+        self._valid_until = started + self.ttl
+        return True
+
+    async def renew(self, ttl: float | None = None) -> bool:
+        if self.token is None:
+            return False
+        started = time.monotonic()
+        if await self._renew(keys=[self.key], args=[self.owner, self.token, self._ttl_ms(ttl)]):
+            self._valid_until = started + self.ttl
+            return True
+        logger.warning(f"[Lease] Lost {self.key} (token {self.token}) before renewal")
+        self.token = None
+        return False
+
+    async def release(self) -> bool:
+        if self.token is None:
+            return False
+        token, self.token = self.token, None
+        return bool(await self._release(keys=[self.key], args=[self.owner, token]))
@@ -0,0 +1,57 @@
+"""
+Token and latency counters for the classifier/extraction LLM calls, per stage.
+
+Stages are "extraction", "emergency", "spam" and "routing" in the per-stage mode and "classifier" in
+the combined mode (see turn_classifier.py), so the two modes can be compared call for call.
+Counters are process-wide, like redis_pool's latency histograms.
+Token counts come from the usage chunk the OpenAI plugin appends to each stream; a stream without
+one still counts its call and latency.
+"""
+import time
+
+# stage -> {"calls", "prompt_tokens", "cached_tokens", "completion_tokens", "seconds"}
+usage: dict[str, dict[str, float]] = {}
+
+
+def record(stage: str, seconds: float, chunk_usage=None):
+    counters = usage.setdefault(stage, dict.fromkeys(("calls", "prompt_tokens", "cached_tokens", "completion_tokens", "seconds"), 0))
+    counters["calls"] += 1
+    counters["seconds"] += seconds
+    if chunk_usage is not None:
+        counters["prompt_tokens"] += getattr(chunk_usage, "prompt_tokens", 0) or 0
+        counters["cached_tokens"] += getattr(chunk_usage, "prompt_cached_tokens", 0) or 0
+        counters["completion_tokens"] += getattr(chunk_usage, "completion_tokens", 0) or 0
+
+
+def reset():
+    usage.clear()
+
+
+def summary() -> str:
+    parts = []
+    for stage, c in sorted(usage.items()):
+        parts.append(
+            f"{stage}: calls={c['calls']} prompt={c['prompt_tokens']} (cached {c['cached_tokens']}) "
+            f"completion={c['completion_tokens']} mean={c['seconds'] / c['calls'] * 1000:.0f}ms"
+        )
+    return "; ".join(parts) or "no LLM calls yet"
+
+
+async def deltas(llm_stream, stage: str):
+    """Yield the text deltas of `llm_stream`, recording its usage and latency under `stage` when it ends."""
+    t0 = time.perf_counter()
+    chunk_usage = None
+    try:
+        async for chunk in llm_stream:
+            if getattr(chunk, "usage", None) is not None:
+                chunk_usage = chunk.usage
+            delta = getattr(chunk, "delta", None)
+            if delta is not None and getattr(delta, "content", None):
+                yield delta.content
+    finally:
+        record(stage, time.perf_counter() - t0, chunk_usage)
+
+
+async def text(llm_stream, stage: str) -> str:
+    """The whole response text of `llm_stream` (see deltas())."""
+    return "".join([d async for d in deltas(llm_stream, stage)])
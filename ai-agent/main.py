@@ -14,7 +14,8 @@ import json
 from datetime import datetime
 import uuid
 import contextlib
-import psutil
+
+_PROCESS_START = time.monotonic()  # before the heavy imports below
 
 from dotenv import load_dotenv
 
@@ -23,14 +24,24 @@ from livekit.agents import (
     JobContext,
     cli,
     WorkerOptions,
+    JobExecutorType,
     ConversationItemAddedEvent,
 )
 from livekit.plugins import silero, openai
 
 from agent1 import Agent1
+from call_dispatcher import CallDispatcher
+from lease import Lease
+from async_transcript_logger import TranscriptLogger
+import sip_client
+import search_rag
+import llm_usage
+import turn_classifier
+from redis_pool import get_redis, aclose as redis_aclose, latency_summary as redis_latency_summary
 
-from search_rag import search_collection
 
+_PREWARMED = {}  # filled by prewarm() in pooled workers
+_on_first_greeting = None  # set by run_for_room(); called with the room name after the greeting
 
 # ─── Logging setup ─────────────────────────────────────────────────
 logging.basicConfig(
@@ -42,64 +53,77 @@ for noisy in ("openai", "httpx", "urllib3", "httpcore"):
     logging.getLogger(noisy).setLevel(logging.WARNING)
 
 # ─── Voice Coordinator (prevents double voice) ─────────────────────
+SPEAKER_LEASE_TTL = 20  # seconds a dead speaker keeps the room before another process may take over
+
 class VoiceCoordinator:
     """Coordinates which process is allowed to speak for a given room"""
     
-    def __init__(self):
-        try:
-            self.redis = redis.Redis(host='15.204.51.230', port=6379, db=0, password='2123tt')
-            self.redis.ping()  # Test connection
-            self.use_redis = True
-            logger.info("Using Redis for voice coordination")
-        except (redis.ConnectionError, redis.RedisError):
-            self.use_redis = False
-            logger.warning("Redis not available, falling back to file-based locks")
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+        self.use_redis = redis_client is not None
+        self._leases = {}  # room -> Lease (see lease.py)
         self.process_id = f"{os.getpid()}-{socket.gethostname()}-{int(time.time())}-{uuid.uuid4()}"
         logger.info(f"[VoiceCoordinator] This process_id: {self.process_id}")
 
-    @contextlib.contextmanager
-    def global_speaker_lock(self, room_name, timeout=10):
-        """Context manager for a Redis-based global lock per room. Only one process can hold it at a time."""
-        lock_key = f"voice_global_lock:{room_name}"
-        lock_val = self.process_id
-        have_lock = False
+    @classmethod
+    async def create(cls, redis_client):
+        """Use the shared Redis pool if it answers, else fall back to file-based locks."""
         try:
-            if self.use_redis:
-                # Try to acquire the lock
-                have_lock = self.redis.set(lock_key, lock_val, nx=True, ex=timeout)
-                if have_lock:
-                    logger.info(f"[VoiceCoordinator] {self.process_id} acquired global speaker lock for {room_name}")
-                else:
-                    logger.warning(f"[VoiceCoordinator] {self.process_id} could NOT acquire global speaker lock for {room_name}")
-                yield have_lock
-                # Only the lock holder should release
-                if have_lock and self.redis.get(lock_key) == lock_val.encode():
-                    self.redis.delete(lock_key)
-                    logger.info(f"[VoiceCoordinator] {self.process_id} released global speaker lock for {room_name}")
+            await redis_client.ping()  # Test connection
+            logger.info("Using Redis for voice coordination")
+            return cls(redis_client)
+        except (redis.ConnectionError, redis.RedisError, OSError):
+            logger.warning("Redis not available, falling back to file-based locks")
+            return cls(None)
+
+    @contextlib.asynccontextmanager
+    async def global_speaker_lock(self, room_name, timeout=10):
+        """
+        Context manager that lets only the room's lease holder speak. Reuses the speaker lease, so a held lease costs no round-trip.
+        `timeout` bounds the acquire round-trip when the lease has to be taken; on expiry the lock is not granted.
+        """
+        if not self.use_redis:
+            # Fallback: always allow
+            yield True
+            return
+        lease = self._lease(room_name, SPEAKER_LEASE_TTL)
+        have_lock = lease.held
+        if not have_lock:
+            try:
+                # No live lease of our own: take it over if nobody else holds it
+                have_lock = await asyncio.wait_for(lease.acquire(), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"[VoiceCoordinator] Speaker lease acquire for {room_name} timed out after {timeout}s")
+                have_lock = False
+            except Exception as e:
+                logger.error(f"[VoiceCoordinator] Error in global_speaker_lock: {e}")
+                have_lock = False
+            if have_lock:
+                logger.info(f"[VoiceCoordinator] {self.process_id} acquired speaker lease for {room_name} (token {lease.token})")
             else:
-                # Fallback: always allow
-                yield True
-        except Exception as e:
-            logger.error(f"[VoiceCoordinator] Error in global_speaker_lock: {e}")
-            yield False
+                logger.warning(f"[VoiceCoordinator] {self.process_id} could NOT acquire speaker lease for {room_name}")
+        yield have_lock
+
+    def _lease(self, room_name, ttl):
+        lease = self._leases.get(room_name)
+        if lease is None:
+            lease = self._leases[room_name] = Lease(self.redis, f"voice_lease:{room_name}", self.process_id, ttl)
+        return lease
+
+    def lease_token(self, room_name):
+        """Token of our lease for the room, or None if we do not hold it."""
+        lease = self._leases.get(room_name)
+        return lease.token if lease and lease.held else None
 
-    def register_as_speaker(self, room_name, ttl=60):
+    async def register_as_speaker(self, room_name, ttl=SPEAKER_LEASE_TTL):
         """Register this process as the designated speaker for the room"""
         if self.use_redis:
-            # First check if anyone else is registered
-            current_speaker = self.redis.get(f"voice_leader:{room_name}")
-            if current_speaker is not None and current_speaker.decode() != self.process_id:
-                logger.warning(f"Room {room_name} already has a speaker: {current_speaker.decode()} (this process: {self.process_id})")
-                return False
-                
-            # Try to register as speaker with TTL
-            success = self.redis.set(f"voice_leader:{room_name}", self.process_id, ex=ttl, nx=True)
-            if success:
-                logger.info(f"Process {self.process_id} registered as speaker for room {room_name}")
+            lease = self._lease(room_name, ttl)
+            if await lease.acquire(ttl):
+                logger.info(f"Process {self.process_id} registered as speaker for room {room_name} (token {lease.token})")
                 return True
-            else:
-                logger.warning(f"Failed to register as speaker for room {room_name} (process_id: {self.process_id})")
-                return False
+            logger.warning(f"Room {room_name} already has a speaker (this process: {self.process_id})")
+            return False
         else:
             # Fall back to file-based lock
             lock_path = os.path.join(tempfile.gettempdir(), f"voice_lock_{room_name.replace('-','_')}")
@@ -118,29 +142,12 @@ class VoiceCoordinator:
                 logger.error(f"Lock error: {e}")
                 return False
     
-    def is_designated_speaker(self, room_name):
-        """Check if this process is the designated speaker for the room, and clean up if the holder is dead."""
+    async def is_designated_speaker(self, room_name):
+        """Check if this process is the designated speaker for the room (no round-trip while our lease is live)."""
         if self.use_redis:
-            try:
-                current = self.redis.get(f"voice_leader:{room_name}")
-                if not current:
-                    return False
-                # Verify process exists
-                pid_part = current.decode().split("-")[0]
-                try:
-                    pid_int = int(pid_part)
-                    if not psutil.pid_exists(pid_int):
-                        self.redis.delete(f"voice_leader:{room_name}")
-                        logger.info(f"[VoiceCoordinator] Cleaned up dead speaker lock for {room_name} (pid {pid_int})")
-                        return False
-                except Exception:
-                    pass
-                is_speaker = current.decode() == self.process_id
-                logger.info(f"[VoiceCoordinator] is_designated_speaker({room_name}): {is_speaker} (current: {current}, this: {self.process_id})")
-                return is_speaker
-            except Exception as e:
-                logger.error(f"[VoiceCoordinator] Redis error in is_designated_speaker: {e}")
-                return False
+            # The lease TTL covers dead holders on any host; a lease we renewed in time is still ours
+            lease = self._leases.get(room_name)
+            return bool(lease and lease.held)
         else:
             # Fall back to checking file
             lock_path = os.path.join(tempfile.gettempdir(), f"voice_lock_{room_name.replace('-','_')}")
@@ -154,59 +161,61 @@ class VoiceCoordinator:
                 logger.error(f"[VoiceCoordinator] File error in is_designated_speaker: {e}")
                 return False
                 
-    def refresh_speaker_status(self, room_name, ttl=60):
+    async def refresh_speaker_status(self, room_name, ttl=SPEAKER_LEASE_TTL):
         """Refresh this process's status as the speaker (extends TTL)"""
-        if self.use_redis and self.is_designated_speaker(room_name):
-            self.redis.expire(f"voice_leader:{room_name}", ttl)
-            return True
+        lease = self._leases.get(room_name)
+        if self.use_redis and lease:
+            return await lease.renew(ttl)
         return False
 
-    def unregister_as_speaker(self, room_name):
+    async def unregister_as_speaker(self, room_name):
         """Unregister as speaker for the room"""
-        if self.use_redis and self.is_designated_speaker(room_name):
-            self.redis.delete(f"voice_leader:{room_name}")
+        lease = self._leases.pop(room_name, None)
+        if self.use_redis and lease and await lease.release():
             logger.info(f"Unregistered as speaker for room {room_name}")
             return True
         return False
 
-# Create global coordinator
-voice_coordinator = VoiceCoordinator()
-
 # ─── Entrypoint ────────────────────────────────────────────────────
 async def entrypoint(ctx: JobContext):
     room_name = ctx.room.name
     logger.info(f"Entrypoint start for room {room_name} (PID {os.getpid()})")
-    # Immediate check with Redis
-    r = redis.Redis(host='15.204.51.230', port=6379, db=0, password='2123tt')
+    # Immediate check with Redis (shared async pool, see redis_pool.py)
+    r = get_redis()
     agent_key = f"active_agent:{room_name}"
-    current_agent = r.get(agent_key)
+    current_agent = await r.get(agent_key)
     logger.info(f"[Agent Entrypoint] Redis slot before set: {current_agent}")
     if current_agent:
         logger.info(f"Another agent {current_agent} active for {room_name}, exiting")
         return
     # Claim the slot (longer expiry)
-    r.set(agent_key, str(os.getpid()), ex=120)
+    await r.set(agent_key, str(os.getpid()), ex=120)
     logger.info(f"[Agent Entrypoint] Claimed Redis slot for {room_name} with PID {os.getpid()}")
     # Periodically renew the slot
     async def renew_agent_slot():
         while True:
             await asyncio.sleep(30)
-            r.set(agent_key, str(os.getpid()), ex=120)
+            await r.set(agent_key, str(os.getpid()), ex=120)
             logger.info(f"[Agent Slot] Renewed Redis slot for {room_name} with PID {os.getpid()}")
+            logger.info(f"[Redis] Command latency: {redis_latency_summary()}")
     asyncio.create_task(renew_agent_slot())
+    # Cold-started agents resolve the SIP trunk in the background (pooled workers did it in prewarm())
+    if sip_client.cached_trunk_id() is None:
+        asyncio.create_task(sip_client.prefetch_trunk(r))
     try:
         await ctx.connect()
 
         # Try to register as speaker for this room
-        is_speaker = voice_coordinator.register_as_speaker(room_name)
+        voice_coordinator = await VoiceCoordinator.create(r)
+        is_speaker = await voice_coordinator.register_as_speaker(room_name)
         logger.info(f"Process {os.getpid()} {'IS' if is_speaker else 'IS NOT'} the designated speaker for room {room_name}")
 
         # Start speaker refresh task if we're the speaker
         if is_speaker:
             async def refresh_speaker_status():
                 while True:
-                    await asyncio.sleep(15)  # Refresh every 15 seconds
-                    voice_coordinator.refresh_speaker_status(room_name, ttl=60)
+                    await asyncio.sleep(SPEAKER_LEASE_TTL / 3)
+                    await voice_coordinator.refresh_speaker_status(room_name)
             refresh_task = asyncio.create_task(refresh_speaker_status())
 
         # Prevent duplicate handler/task registration
@@ -217,7 +226,8 @@ async def entrypoint(ctx: JobContext):
 
         # instantiate your agent core
         agent = Agent1()
-        await agent.setup()
+        agent.set_redis(r)
+        await agent.setup(_PREWARMED.pop("transcript_logger", None))
         agent.room_name = room_name  # Stash the dynamic room name on the agent
         agent.set_session_context(ctx)  # Set session context for transfer/disconnect
 
@@ -233,12 +243,12 @@ async def entrypoint(ctx: JobContext):
                     if agent_name not in user_text.lower():
                         logger.info(f"AI is in strict silent mode. Not speaking unless addressed by name.")
                         return
-            with voice_coordinator.global_speaker_lock(room_name, timeout=10) as have_lock:
+            async with voice_coordinator.global_speaker_lock(room_name, timeout=10) as have_lock:
                 if not have_lock:
                     logger.warning(f"[VoiceCoordinator] {voice_coordinator.process_id} could not get global lock for {room_name}, skipping speech: {text}")
                     return
                 try:
-                    logger.info(f"Process {os.getpid()} speaking as designated speaker for room {room_name} (process_id: {voice_coordinator.process_id}) - Saying: {text}")
+                    logger.info(f"Process {os.getpid()} speaking as designated speaker for room {room_name} (process_id: {voice_coordinator.process_id}, token: {voice_coordinator.lease_token(room_name)}) - Saying: {text}")
                     await session.say(text)
                 except Exception as e:
                     logger.error(f"TTS error: {e} (no fallback available)")
@@ -251,12 +261,12 @@ async def entrypoint(ctx: JobContext):
             await asyncio.sleep(2)
             while True:
                 await asyncio.sleep(2)
-                current_pid = r.get(agent_key)
+                current_pid = await r.get(agent_key)
                 logger.info(f"[Agent Presence] Redis slot: {current_pid}, my PID: {os.getpid()}")
                 if current_pid is None:
                     # Reclaim the slot if missing
                     logger.info(f"[Agent Presence] Redis slot missing, reclaiming for {room_name}")
-                    r.set(agent_key, str(os.getpid()), ex=120)
+                    await r.set(agent_key, str(os.getpid()), ex=120)
                 elif current_pid.decode() != str(os.getpid()):
                     logger.info(f"[Agent Presence] Another agent took over for {room_name}, exiting")
                     await say_goodbye_and_disconnect(agent)
@@ -265,7 +275,7 @@ async def entrypoint(ctx: JobContext):
 
         # load required plugins
         try:
-            vad = silero.VAD.load()
+            vad = _PREWARMED.get("vad") or silero.VAD.load()
             # vad = silero.VAD.load(
             #     sample_rate             = 16000,    # keep full speech bandwidth
             #     activation_threshold    = 0.55,     # more sensitive to soft speech
@@ -302,18 +312,11 @@ async def entrypoint(ctx: JobContext):
 
         # ─── 1) Logging and history capture ─────────────────────────────
         last_logged = {'role': None, 'text': None}
-        silence_count = 0  # Track number of silence prompts
-        silence_intervals = [20, 30, 45, 60]  # Escalating intervals
-        silence_prompts = [
-            "Just checking, are you still there?",
-            "If you need more time, just let me know.",
-            "I'll stay on the line a bit longer if you need more time.",
-            "It seems we've lost connection. I'll end the call now, but please call back if you need further assistance."
-        ]
+        # Stages (extraction, emergency/spam checks, prompts, silence, transfer) react to events
+        dispatcher = CallDispatcher(agent, say_goodbye_and_disconnect)
+        agent.set_state_listener(dispatcher.on_state_changed)
         def on_item(evt: ConversationItemAddedEvent):
-            nonlocal silence_count
             agent.last_speech_time = time.time()  # Reset timer on any speech
-            silence_count = 0  # Reset silence escalation on any speech
             item = evt.item
             role = getattr(item.role, "name", str(item.role))
             content = item.content
@@ -324,32 +327,6 @@ async def entrypoint(ctx: JobContext):
                 if field and getattr(agent.agent2, field, None):
                     agent.waiting_for_field = None
                 agent.last_speech_time = time.time()  # Reset silence timer
-                silence_count = 0
-            
-            # Append varContextAppend to user messages (STT output)
-            if role.lower() == "user":
-                # search rag for the user query (collection name: towing_services, query: user query)
-                # ragResult = search_collection("towing_services", text)
-                # var_context_append = ""
-                # if isinstance(ragResult, list):
-                #     # join list items with spaces (or choose your delimiter)
-                #     var_context_append = " ".join(ragResult)
-                # elif isinstance(ragResult, str):
-                #     # just append to the existing string
-                #     var_context_append = ragResult 
-                # else:
-                #     # for numbers, dicts, etc.—convert to string first
-                #     var_context_append = str(MapResult)
-
-
-                # \n\n**USE THESE RAG RESULTS TO ANSWER THE USER'S QUESTION IF APPLICABLE AND RELEVANT.Consider score of the results and use the most relevant and applicable results.**:\n
-                
-                varContextAppend = f"""
-                \nRAG SEARCH RESULTS:\n**When answering the user's question, draw on the retrieved RAG results only if they directly address the query. Prioritize the highest-scoring, most applicable passages. If none of the retrieved results are relevant, explicitly state that and provide a concise, standalone answer.**:\n
-                QUERY: {text}\n\n
-                ```{search_collection("towing_services", text)}```"""
-                text = text + " " + varContextAppend
-                item.content = [text] if isinstance(item.content, list) else text
             
             # Debounce: only log if not identical to last
             if role == last_logged['role'] and text == last_logged['text']:
@@ -357,6 +334,10 @@ async def entrypoint(ctx: JobContext):
             last_logged['role'] = role
             last_logged['text'] = text
             agent.chat_history.append(item)
+            if role.lower() == "user":
+                dispatcher.on_user_turn()
+            else:
+                dispatcher.on_agent_turn()
 
             # Only respond if allowed (not in silent mode, or addressed by name)
             if role.lower() == "user":
@@ -402,100 +383,20 @@ async def entrypoint(ctx: JobContext):
         # ─── 3) Save transcript on disconnect ───────────────────────────
         async def on_disconnect():
             logger.info("Session disconnected, ensuring final log is saved.")
+            dispatcher.stop()
             if agent and agent.chat_history:
                 await agent.agent2.process_history(agent.chat_history)
+            logger.info(f"[LLM] Usage ({turn_classifier.CLASSIFIER_MODE}): {llm_usage.summary()}")
+            await agent.flush_log()  # final write-behind flush of the transcript
+            await sip_client.aclose()
+            await search_rag.close_session()
         
         session.on("session_disconnected", lambda e: asyncio.create_task(on_disconnect()))
 
-        # ─── 4) Start background extraction loop ────────────────────────
-        if not hasattr(ctx, '_periodic_task'):
-            async def periodic_check():
-                nonlocal silence_count
-                silence_intervals = [20, 30, 45, 60]
-                silence_prompts = [
-                    "Just checking, are you still there?",
-                    "If you need more time, just let me know.",
-                    "I'll stay on the line a bit longer if you need more time.",
-                    "It seems we've lost connection. I'll end the call now, but please call back if you need further assistance."
-                ]
-                while True:
-                    try:
-                        await asyncio.sleep(5)
-                        # Only process LLM if not blocked, or if last user message contains 'hey reception'
-                        if getattr(agent, 'block_llm', False):
-                            last_user = next((item for item in reversed(agent.chat_history) if getattr(item.role, 'name', str(item.role)).lower() == 'user'), None)
-                            if not (last_user and 'hey reception' in (last_user.content[0] if isinstance(last_user.content, list) else last_user.content).lower()):
-                                logger.info("Periodic check: Blocked LLM after transfer (block_llm, no wake word).")
-                                continue  # Skip LLM call
-                        await agent.agent2.process_history(agent.chat_history)
-
-                        # Check for emergency first and foremost
-                        if await agent.check_for_emergency_and_transfer():
-                            logger.info("[Main] Emergency detected and handled, stopping periodic check.")
-                            return
-
-                        # Check for spam after processing history
-                        if await agent.hangup_if_spam():
-                            logger.info("[Main] Spam detected, periodic check is stopping.")
-                            return
-
-                        # --- Prompt for the first missing field in required order ---
-                        required_fields = [
-                            ("name", "May I have your name, please?"),
-                            ("phone", "Could I get a 10-digit callback number?"),
-                            ("service", "What service do you need? (e.g., lockout, jump, tow, tire, fuel)"),
-                            ("location", "Where is your vehicle located?"),
-                            ("year", "What is the year of your vehicle? (e.g., 2018)")
-                        ]
-                        for field, prompt in required_fields:
-                            if not getattr(agent.agent2, field):
-                                if getattr(agent, 'waiting_for_field', None) != field:
-                                    await agent.safe_say(prompt)
-                                    agent.waiting_for_field = field
-                                break
-                        else:
-                            # Special handling for make/model: require at least one
-                            if not agent.agent2.make and not agent.agent2.model:
-                                if getattr(agent, 'waiting_for_field', None) != 'make':
-                                    await agent.safe_say("What is the make of your vehicle? (e.g., Toyota, Ford, BMW)")
-                                    agent.waiting_for_field = 'make'
-                            # Only prompt for color if all else is present and color is missing
-                            elif (agent.agent2.name and agent.agent2.phone and agent.agent2.service and agent.agent2.location and agent.agent2.year and (agent.agent2.make or agent.agent2.model)) and not agent.agent2.color:
-                                if getattr(agent, 'waiting_for_field', None) != 'color':
-                                    await agent.safe_say("What is the color of your vehicle?")
-                                    agent.waiting_for_field = 'color'
-                            else:
-                                agent.waiting_for_field = None
-
-                        # Check for silence and greet if needed
-                        current_time = time.time()
-                        if not getattr(agent, 'waiting_for_field', None):
-                            interval = silence_intervals[min(silence_count, len(silence_intervals)-1)]
-                            if current_time - agent.last_speech_time > interval and not agent.silent_mode:
-                                prompt = silence_prompts[min(silence_count, len(silence_prompts)-1)]
-                                await safe_say(prompt)
-                                agent.last_speech_time = current_time # Reset after speaking
-                                silence_count += 1
-                                # After 3+ silences, end the call politely
-                                if silence_count >= 4:
-                                    await say_goodbye_and_disconnect(agent)
-                                    return
-
-                        # Check if transfer is needed
-                        if not agent.transfer_initiated:
-                            try:
-                                await agent.trigger_transfer_if_ready()
-                                if agent.transfer_initiated:
-                                    return  # Stop the periodic check after transfer
-                            except Exception as e:
-                                logger.error(f"Transfer sequence failed: {e}")
-                                if agent.transfer_initiated:
-                                    return
-                    except Exception as e:
-                        logger.error(f"Periodic check error: {e}")
-                        if agent.transfer_initiated:
-                            return
-            ctx._periodic_task = asyncio.create_task(periodic_check())
+        # ─── 4) Start the event-driven call dispatcher ──────────────────
+        if not hasattr(ctx, '_dispatcher'):
+            ctx._dispatcher = dispatcher
+            dispatcher.start()
 
         # ─── 5) Run the session ─────────────────────────────────────────
         try:
@@ -505,45 +406,94 @@ async def entrypoint(ctx: JobContext):
             # Send initial greeting after session is started
             await safe_say("Hello! Thank you for calling. How may I assist you today?")
             logger.info("Initial greeting sent")
+            if _on_first_greeting is not None:
+                _on_first_greeting(room_name)
+            else:
+                logger.info(f"[Agent Entrypoint] Time to first greeting: {time.monotonic() - _PROCESS_START:.2f}s since process start")
         except Exception as e:
             logger.error(f"Session error: {e}")
             if agent.transfer_initiated:
                 # Only delete slot on intentional shutdown
                 logger.info(f"[Agent Entrypoint] Releasing Redis slot for {room_name} (transfer)")
-                r.delete(agent_key)
+                await r.delete(agent_key)
                 await say_goodbye_and_disconnect(agent)
             raise
         finally:
             if is_speaker:
-                voice_coordinator.unregister_as_speaker(room_name)
+                await voice_coordinator.unregister_as_speaker(room_name)
             if agent.transfer_initiated:
                 # Only delete slot on intentional shutdown
                 logger.info(f"[Agent Entrypoint] Releasing Redis slot for {room_name} (transfer/disconnect)")
-                r.delete(agent_key)
+                await r.delete(agent_key)
                 await say_goodbye_and_disconnect(agent)
     except Exception as e:
         logger.error(f"[Agent Entrypoint] Exception: {e}")
         # Only delete slot on intentional shutdown
         logger.info(f"[Agent Entrypoint] Releasing Redis slot for {room_name} (exception)")
-        r.delete(agent_key)
+        await r.delete(agent_key)
         await say_goodbye_and_disconnect(agent)
         raise
 
 
-# ─── CLI bootstrap ────────────────────────────────────────────────
-if __name__ == "__main__":
-    load_dotenv()
-    if os.getenv("LIVEKIT_ROOM"):
-        sys.argv = [sys.argv[0], "connect", "--room", os.getenv("LIVEKIT_ROOM")]
+async def say_goodbye_and_disconnect(agent):
+    await agent.safe_say("We have your number and will be in contact shortly. Thank you for calling. Goodbye.")
+    await asyncio.sleep(5)
+    if agent.ctx and hasattr(agent.ctx.room, 'disconnect'):
+        await agent.ctx.room.disconnect()
+    else:
+        await agent.flush_log()
+        sys.exit(0)
+
+
+# ─── Warm-start support (used by worker_pool.py) ───────────────────
+def prewarm():
+    """Load what every call needs up front, so a pooled worker only has to join the room."""
+    t0 = time.monotonic()
+    _PREWARMED["vad"] = silero.VAD.load()
+    logger.info(f"[Prewarm] Silero VAD loaded in {time.monotonic() - t0:.2f}s")
+    asyncio.run(_prewarm_connections())
+
+
+async def _prewarm_connections():
+    """
+    On a throwaway loop: resolve the SIP trunk (the ID lands in sip_client's process-wide cache) and
+    connect the transcript logger. Motor runs pymongo's connection pool on its own threads and binds
+    to whichever loop awaits it, so the connected client carries over to the job's loop.
+    redis.asyncio and aiohttp connections belong to the loop that opened them, and the job loop only
+    exists once a room is assigned, so those are closed here; the job opens its own on its first command.
+    """
+    t0 = time.monotonic()
+    try:
+        await asyncio.gather(sip_client.prefetch_trunk(get_redis()), _prewarm_transcript_logger())
+    finally:
+        await sip_client.aclose()
+        await redis_aclose()
+    logger.info(f"[Prewarm] Connections ready in {time.monotonic() - t0:.2f}s")
+
+
+async def _prewarm_transcript_logger():
+    try:
+        _PREWARMED["transcript_logger"] = await TranscriptLogger.create()
+    except Exception as e:
+        logger.warning(f"[Prewarm] TranscriptLogger not prewarmed, the call will connect it: {e!r}")
+
 
-    opts = WorkerOptions(
+def build_worker_options(warm: bool = False) -> WorkerOptions:
+    kwargs = {}
+    if warm:
+        # Run the job in this (already warm) process instead of a freshly spawned one
+        kwargs["job_executor_type"] = JobExecutorType.THREAD
+    return WorkerOptions(
         ws_url=os.getenv("LIVEKIT_URL"),
         api_key=os.getenv("LIVEKIT_API_KEY"),
         api_secret=os.getenv("LIVEKIT_API_SECRET"),
         entrypoint_fnc=entrypoint,
         agent_name="enhanced-telephony-agent",
+        **kwargs,
     )
 
+
+def run_app(opts: WorkerOptions):
     try:
         cli.run_app(opts)
     except KeyboardInterrupt:
@@ -553,10 +503,20 @@ if __name__ == "__main__":
     finally:
         logger.info("Service stopped")
 
-async def say_goodbye_and_disconnect(agent):
-    await agent.safe_say("We have your number and will be in contact shortly. Thank you for calling. Goodbye.")
-    await asyncio.sleep(5)
-    if agent.ctx and hasattr(agent.ctx.room, 'disconnect'):
-        await agent.ctx.room.disconnect()
-    else:
-        sys.exit(0)
\ No newline at end of file
+
+def run_for_room(room_name: str, on_greeting=None):
+    """Join `room_name` from an already-initialised process (see worker_pool.py)."""
+    global _on_first_greeting
+    _on_first_greeting = on_greeting
+    os.environ["LIVEKIT_ROOM"] = room_name
+    sys.argv = [sys.argv[0], "connect", "--room", room_name]
+    run_app(build_worker_options(warm=True))
+
+
+# ─── CLI bootstrap ────────────────────────────────────────────────
+if __name__ == "__main__":
+    load_dotenv()
+    if os.getenv("LIVEKIT_ROOM"):
+        sys.argv = [sys.argv[0], "connect", "--room", os.getenv("LIVEKIT_ROOM")]
+
+    run_app(build_worker_options())
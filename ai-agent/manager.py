@@ -11,6 +11,9 @@ import sys
 import psutil
 import redis
 import uuid
+from aiohttp import web
+
+from worker_pool import WarmWorkerPool
 
 # 1) Server SDK imports
 from livekit import api
@@ -23,21 +26,33 @@ LIVEKIT_URL    = os.getenv("LIVEKIT_URL_HTTP", "http://localhost:7880")
 API_KEY        = os.getenv("LIVEKIT_API_KEY")
 API_SECRET     = os.getenv("LIVEKIT_API_SECRET")
 ROOM_PREFIX    = os.getenv("LIVEKIT_ROOM_PREFIX", "room1-")
-POLL_INTERVAL  = float(os.getenv("POLL_INTERVAL", "4.0"))
+POLL_INTERVAL  = float(os.getenv("POLL_INTERVAL", "4.0"))  # housekeeping tick (and room polling without webhooks)
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "30"))  # list_rooms() safety net while webhooks are on
+WEBHOOK_HOST   = os.getenv("MANAGER_WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT   = int(os.getenv("MANAGER_WEBHOOK_PORT", "8089"))  # 0 = no webhooks, poll every POLL_INTERVAL
+WEBHOOK_PATH   = os.getenv("MANAGER_WEBHOOK_PATH", "/webhook")
 GRACE_PERIOD   = float(os.getenv("GRACE_PERIOD", "8"))
 LAUNCH_LOCK_TIMEOUT = int(os.getenv("LAUNCH_LOCK_TIMEOUT", "15"))
 LOG_FILE       = os.getenv("MANAGER_LOG_FILE", "manager.log")
+POOL_MIN_IDLE  = int(os.getenv("AGENT_POOL_MIN", "2"))   # warm workers kept ready; 0 = cold start every call
+POOL_MAX       = int(os.getenv("AGENT_POOL_MAX", "10"))  # warm workers in total (idle + serving a room)
+AGENT_STOP_TIMEOUT = float(os.getenv("AGENT_STOP_TIMEOUT", "5"))  # SIGTERM -> SIGKILL for a room's old agent
 
 # Get the absolute path to main.py based on this script's location
 BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
 MAIN_SCRIPT = os.getenv("MAIN_SCRIPT", os.path.join(BASE_DIR, "main.py"))
 
-# Track running subprocesses and their removal time
+# Track running subprocesses and their pending terminations
 launched       = {}
-removal_times  = {}
+removal_tasks  = {}   # room -> task terminating its agent after GRACE_PERIOD
+room_locks     = {}   # room -> asyncio.Lock, so a webhook and a reconcile can't launch twice
+background_tasks = set()
+launch_latencies = {}  # "webhook" / "poll" -> seconds from room creation to agent launch
+webhook_receiver = None
+_lkapi           = None
+pool           = WarmWorkerPool(POOL_MIN_IDLE, POOL_MAX) if POOL_MIN_IDLE > 0 else None
 
-ZOMBIE_CLEANUP_INTERVAL = 5  # seconds
-last_zombie_cleanup     = 0.0
+children       = {}   # pid -> (room, proc, exited Event): every agent we started and have not reaped yet
 
 # Add Redis connection for launch locking
 def get_redis():
@@ -56,6 +71,7 @@ def log(msg: str):
     print(line)
 
 def cleanup_zombies():
+    """Startup sweep for main.py orphans left by an earlier manager; agents we start are tracked in `children`."""
     # Only kill main.py processes that were started WITHOUT a LIVEKIT_ROOM env var
     try:
         for proc in psutil.process_iter(['pid', 'cmdline']):
@@ -77,37 +93,37 @@ def cleanup_zombies():
     except Exception as e:
         log(f"[manager] Zombie cleanup error: {e}")
 
-def kill_main_py_for_room(room: str):
-    """Kill any main.py processes tied to a given LIVEKIT_ROOM."""
-    for _ in range(10):  # 10 attempts with 0.5s intervals (5s total)
-        found = False
-        for proc in psutil.process_iter(['pid', 'cmdline', 'environ']):
-            try:
-                cmd = " ".join(proc.info.get('cmdline') or [])
-                if "main.py" in cmd:
-                    env = proc.info.get('environ') or {}
-                    if env.get("LIVEKIT_ROOM") == room or room in cmd:
-                        found = True
-                        log(f"Terminating PID {proc.pid} for {room}")
-                        proc.terminate()
-                        try:
-                            proc.wait(timeout=1)
-                        except Exception:
-                            pass
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        if not found:
-            break
-        time.sleep(0.5)
+def get_lkapi() -> api.LiveKitAPI:
+    """One LiveKitAPI client (and HTTP session) for the manager's lifetime."""
+    global _lkapi
+    if _lkapi is None:
+        _lkapi = api.LiveKitAPI(LIVEKIT_URL, API_KEY, API_SECRET)
+    return _lkapi
 
-async def list_rooms() -> list[str]:
-    """Fetch current rooms via LiveKit Server RPC."""
-    lkapi = api.LiveKitAPI(LIVEKIT_URL, API_KEY, API_SECRET)
-    try:
-        resp = await lkapi.room.list_rooms(ListRoomsRequest())
-        return [r.name for r in resp.rooms]
-    finally:
-        await lkapi.aclose()
+async def reset_lkapi():
+    global _lkapi
+    if _lkapi is not None:
+        try:
+            await _lkapi.aclose()
+        except Exception:
+            pass
+        _lkapi = None
+
+def _created_at(room_info) -> float | None:
+    """Room creation time in unix seconds, if LiveKit reported one."""
+    ms = getattr(room_info, "creation_time_ms", 0)
+    if ms:
+        return ms / 1000
+    secs = getattr(room_info, "creation_time", 0)
+    return float(secs) if secs else None
+
+async def list_rooms() -> dict[str, float | None]:
+    """Fetch current rooms via LiveKit Server RPC: name -> creation time."""
+    resp = await get_lkapi().room.list_rooms(ListRoomsRequest())
+    return {r.name: _created_at(r) for r in resp.rooms}
+
+def wants_agent(room: str) -> bool:
+    return room.startswith(ROOM_PREFIX)
 
 async def renew_lock_periodically(redis, key, val):
     while True:
@@ -115,102 +131,228 @@ async def renew_lock_periodically(redis, key, val):
         redis.set(key, val, ex=LAUNCH_LOCK_TIMEOUT)
         log(f"[manager] Renewed launch lock for {key}")
 
+def record_launch(room: str, source: str, created_at: float | None):
+    latency = max(0.0, time.time() - created_at) if created_at else None
+    if latency is None:
+        return
+    launch_latencies.setdefault(source, []).append(latency)
+    log(f"[manager] Launch latency for {room}: {latency * 1000:.0f} ms after room creation (via {source})")
+
+def launch_latency_summary() -> str:
+    parts = []
+    for source, samples in launch_latencies.items():
+        s = sorted(samples)
+        pct = lambda q: s[min(len(s) - 1, int(q * len(s)))] * 1000
+        parts.append(f"{source}: n={len(s)} p50={pct(0.5):.0f}ms p95={pct(0.95):.0f}ms max={s[-1] * 1000:.0f}ms")
+    return "; ".join(parts) or "no launches yet"
+
+def signal_agent(proc, sig=signal.SIGTERM):
+    try:
+        os.killpg(proc.pid, sig)  # Kill the entire process group
+    except Exception:
+        try:
+            proc.kill() if sig == signal.SIGKILL else proc.terminate()
+        except Exception:
+            pass
+
+def track_agent(room: str, proc):
+    children[proc.pid] = (room, proc, asyncio.Event())
+
+def reap_children():
+    """SIGCHLD handler: collect the exit status of our own agents only, no process-table scan."""
+    for pid, (room, proc, gone) in list(children.items()):
+        code = proc.poll()  # reaps through the Popen/Process object so its own bookkeeping stays right
+        if code is not None:
+            del children[pid]
+            gone.set()
+            log(f"[manager] Agent PID {pid} for room {room} exited (code {code})")
+            if launched.get(room) is proc:
+                del launched[room]
+            forget_room(room)
+
+def forget_room(room: str):
+    """Drop the room's launch lock once no agent of ours runs there and no launch holds the lock."""
+    lock = room_locks.get(room)
+    if lock is None or lock.locked() or room in launched:
+        return
+    if any(r == room for r, _, _ in children.values()):
+        return
+    del room_locks[room]
+
+async def stop_room_agents(room: str):
+    """SIGTERM every agent we started for `room` and wait, without blocking the loop, until they are reaped."""
+    agents = [(pid, proc, gone) for pid, (r, proc, gone) in children.items() if r == room]
+    if not agents:
+        return
+    for pid, proc, _ in agents:
+        log(f"Terminating PID {pid} for {room}")
+        signal_agent(proc)
+    try:
+        await asyncio.wait_for(asyncio.gather(*(gone.wait() for _, _, gone in agents)), AGENT_STOP_TIMEOUT)
+        return
+    except asyncio.TimeoutError:
+        pass
+    for pid, proc, gone in agents:
+        if not gone.is_set():
+            log(f"[manager] PID {pid} for {room} ignored SIGTERM for {AGENT_STOP_TIMEOUT}s, killing it")
+            signal_agent(proc, signal.SIGKILL)
+    try:
+        await asyncio.wait_for(asyncio.gather(*(gone.wait() for _, _, gone in agents)), 1.0)
+    except asyncio.TimeoutError:
+        log(f"[manager] Old agents for {room} still not reaped, launching anyway")
+
+async def launch_room(room: str, source: str, created_at: float | None = None):
+    """Start an agent for `room` unless one is already running. Safe to call repeatedly."""
+    lock = room_locks.setdefault(room, asyncio.Lock())
+    async with lock:
+        cancel_removal(room)
+        proc = launched.get(room)
+        if proc is not None and proc.poll() is None:
+            return
+        # --- Redis launch lock ---
+        launch_lock_key = f"agent_launch_lock:{room}"
+        launch_lock_val = str(uuid.uuid4())
+        have_lock = False
+        if redis_client:
+            have_lock = redis_client.set(launch_lock_key, launch_lock_val, nx=True, ex=LAUNCH_LOCK_TIMEOUT)
+            if not have_lock:
+                log(f"[manager] Skipping launch for {room}: launch lock held")
+                return
+            else:
+                log(f"[manager] Acquired launch lock for {room}")
+        lock_renewal = None
+        try:
+            if have_lock and redis_client:
+                lock_renewal = asyncio.create_task(renew_lock_periodically(redis_client, launch_lock_key, launch_lock_val))
+            await stop_room_agents(room)
+            p = pool.assign(room) if pool else None
+            if p is None:
+                log(f"[manager] ▶ Launching {MAIN_SCRIPT} for room {room} (cold start)")
+                env = os.environ.copy()
+                env["LIVEKIT_ROOM"] = room
+                p = subprocess.Popen(["python3", MAIN_SCRIPT], env=env, preexec_fn=os.setsid)  # Launch in its own process group
+                log(f"[manager] Launched main.py (PID {p.pid}) for room {room}")
+            launched[room] = p
+            track_agent(room, p)
+            record_launch(room, source, created_at)
+        finally:
+            if lock_renewal:
+                lock_renewal.cancel()
+            # Release launch lock
+            if redis_client and have_lock:
+                # Only release if we still hold the lock
+                val = redis_client.get(launch_lock_key)
+                if val and val.decode() == launch_lock_val:
+                    redis_client.delete(launch_lock_key)
+                    log(f"[manager] Released launch lock for {room}")
+
+def terminate_room(room: str):
+    proc = launched.pop(room, None)
+    if proc:
+        log(f"[manager] ■ Terminating main.py for room {room} (PID {proc.pid})")
+        signal_agent(proc)
+    forget_room(room)  # usually a no-op until the agent is reaped
+
+def schedule_removal(room: str, reason: str):
+    if room in launched and room not in removal_tasks:
+        log(f"[manager] Room {room} {reason}, scheduling termination in {GRACE_PERIOD}s")
+        removal_tasks[room] = asyncio.create_task(_terminate_after_grace(room))
+
+def cancel_removal(room: str):
+    task = removal_tasks.pop(room, None)
+    if task:
+        task.cancel()
+        log(f"[manager] Room {room} is active again, termination cancelled")
+
+async def _terminate_after_grace(room: str):
+    await asyncio.sleep(GRACE_PERIOD)
+    removal_tasks.pop(room, None)
+    terminate_room(room)
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+# ─── Webhooks: launches and teardowns as soon as LiveKit reports them ───
+async def handle_webhook(request: web.Request) -> web.Response:
+    body = await request.text()
+    try:
+        event = webhook_receiver.receive(body, request.headers.get("Authorization", ""))
+    except Exception as e:
+        log(f"[manager] Rejected webhook: {e}")
+        return web.Response(status=401, text="invalid webhook")
+    room = event.room.name
+    if not room or not wants_agent(room):
+        return web.Response(text="ignored")
+    log(f"[manager] Webhook {event.event} for room {room}")
+    if event.event in ("room_started", "participant_joined"):
+        # participant_joined also covers a missed/late room_started; launch_room is idempotent
+        spawn(launch_room(room, "webhook", _created_at(event.room)))
+    elif event.event == "room_finished":
+        schedule_removal(room, "finished")
+    return web.Response(text="ok")
+
+async def start_webhook_server() -> web.AppRunner:
+    global webhook_receiver
+    webhook_receiver = api.WebhookReceiver(api.TokenVerifier(API_KEY, API_SECRET))
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle_webhook)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    log(f"[manager] Listening for LiveKit webhooks on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    return runner
+
+# ─── Reconciliation: catches anything the webhooks missed ───────────
+async def reconcile():
+    try:
+        rooms = await list_rooms()
+    except Exception as e:
+        # Don't tear agents down just because LiveKit could not be reached
+        log(f"[manager] Error listing rooms: {e}")
+        await reset_lkapi()
+        return
+    active = {name: created for name, created in rooms.items() if wants_agent(name)}
+
+    # launch or restart agents
+    for room, created in active.items():
+        proc = launched.get(room)
+        if proc is None or proc.poll() is not None:
+            await launch_room(room, "poll", created)
+        else:
+            cancel_removal(room)
+
+    # schedule removals
+    for room in list(launched):
+        if room not in active:
+            schedule_removal(room, "disappeared")
+
 async def manager():
-    global last_zombie_cleanup
+    asyncio.get_running_loop().add_signal_handler(signal.SIGCHLD, reap_children)
+    runner = None
+    if WEBHOOK_PORT:
+        try:
+            runner = await start_webhook_server()
+        except Exception as e:
+            log(f"[manager] Webhook server failed to start ({e}), falling back to polling every {POLL_INTERVAL}s")
+    reconcile_interval = RECONCILE_INTERVAL if runner else POLL_INTERVAL
+    last_reconcile = 0.0
 
     while True:
         try:
             now = time.time()
-            log("[manager] Polling")
+            reap_children()  # in case a SIGCHLD was coalesced with another
+            if pool:
+                pool.maintain()
 
-            # periodic zombie cleanup
-            if now - last_zombie_cleanup > ZOMBIE_CLEANUP_INTERVAL:
-                cleanup_zombies()
-                last_zombie_cleanup = now
-
-            # list and filter rooms
-            try:
-                rooms = await list_rooms()
-                active = [r for r in rooms if r.startswith(ROOM_PREFIX)]
-            except Exception as e:
-                log(f"[manager] Error listing rooms: {e}")
-                active = []
-
-            # launch or restart agents
-            for room in active:
-                proc = launched.get(room)
-                if proc is None or proc.poll() is not None:
-                    # --- Redis launch lock ---
-                    launch_lock_key = f"agent_launch_lock:{room}"
-                    launch_lock_val = str(uuid.uuid4())
-                    have_lock = False
-                    if redis_client:
-                        have_lock = redis_client.set(launch_lock_key, launch_lock_val, nx=True, ex=LAUNCH_LOCK_TIMEOUT)
-                        if not have_lock:
-                            log(f"[manager] Skipping launch for {room}: launch lock held")
-                            continue
-                        else:
-                            log(f"[manager] Acquired launch lock for {room}")
-                    lock_renewal = None
-                    try:
-                        if have_lock and redis_client:
-                            lock_renewal = asyncio.create_task(renew_lock_periodically(redis_client, launch_lock_key, launch_lock_val))
-                        kill_main_py_for_room(room)
-                        # Wait for all main.py processes for this room to terminate
-                        for _ in range(20):  # wait up to 2 seconds
-                            still_running = False
-                            for p in psutil.process_iter(['pid', 'cmdline', 'environ']):
-                                try:
-                                    cmd = " ".join(p.info.get('cmdline') or [])
-                                    if "main.py" in cmd:
-                                        env = {}
-                                        try:
-                                            env = p.environ()
-                                        except Exception:
-                                            pass
-                                        if env.get("LIVEKIT_ROOM") == room or room in cmd:
-                                            still_running = True
-                                            break
-                                except Exception:
-                                    continue
-                            if not still_running:
-                                break
-                            time.sleep(0.1)
-                        log(f"[manager] ▶ Launching {MAIN_SCRIPT} for room {room}")
-                        env = os.environ.copy()
-                        env["LIVEKIT_ROOM"] = room
-                        p = subprocess.Popen(["python3", MAIN_SCRIPT], env=env, preexec_fn=os.setsid)  # Launch in its own process group
-                        log(f"[manager] Launched main.py (PID {p.pid}) for room {room}")
-                        launched[room] = p
-                    finally:
-                        if lock_renewal:
-                            lock_renewal.cancel()
-                        # Release launch lock
-                        if redis_client and have_lock:
-                            # Only release if we still hold the lock
-                            val = redis_client.get(launch_lock_key)
-                            if val and val.decode() == launch_lock_val:
-                                redis_client.delete(launch_lock_key)
-                                log(f"[manager] Released launch lock for {room}")
-                    removal_times.pop(room, None)
-
-            # schedule removals
-            for room in list(launched):
-                if room not in active and room not in removal_times:
-                    log(f"[manager] Room {room} disappeared, scheduling termination in {GRACE_PERIOD}s")
-                    removal_times[room] = now
-
-            # terminate after grace period
-            for room, t0 in list(removal_times.items()):
-                if now - t0 > GRACE_PERIOD:
-                    proc = launched.pop(room, None)
-                    if proc:
-                        log(f"[manager] ■ Terminating main.py for room {room} (PID {proc.pid})")
-                        try:
-                            os.killpg(proc.pid, signal.SIGTERM)  # Kill the entire process group
-                        except Exception:
-                            proc.terminate()
-                    removal_times.pop(room, None)
+            if now - last_reconcile >= reconcile_interval:
+                last_reconcile = now
+                log("[manager] Reconciling")
+                await reconcile()
+                log(f"[manager] Launch latency: {launch_latency_summary()}")
+                if pool:
+                    log(f"[manager] Pool: {pool.stats()}")
 
             # warn if too many
             if len(launched) > 10:
@@ -225,10 +367,9 @@ def shutdown(signum, frame):
     log("[manager] Shutting down, terminating all agents...")
     for room, proc in launched.items():
         log(f"[manager] Killing PID {proc.pid} for room {room}")
-        try:
-            os.killpg(proc.pid, signal.SIGTERM)  # Kill the entire process group
-        except Exception:
-            proc.terminate()
+        signal_agent(proc)
+    if pool:
+        pool.shutdown()
     sys.exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# redis_pool.py
+"""
+One shared redis.asyncio connection pool per agent process, for main.py, VoiceCoordinator and Agent1.
+
+Every command goes through the event loop instead of a blocking socket round-trip, and its latency
+is recorded in a per-command histogram (see latency_summary()).
+redis.asyncio connections belong to the loop that opened them, so a process that runs jobs on
+more than one loop (the THREAD executor in pooled workers) gets one pool per loop.
+"""
+import os
+import time
+import asyncio
+import logging
+import weakref
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger("redis-pool")
+
+REDIS_HOST     = os.getenv("REDIS_HOST", "15.204.51.230")
+REDIS_PORT     = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB       = int(os.getenv("REDIS_DB", "0"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "2123tt")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "16"))
+
+# upper bounds in ms; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimedRedis]" = weakref.WeakKeyDictionary()
+latency_histograms: dict[str, list[int]] = {}  # command -> counts per LATENCY_BUCKETS_MS bucket
+
+
+def record_latency(command: str, seconds: float):
+    ms = seconds * 1000
+    counts = latency_histograms.setdefault(command, [0] * len(LATENCY_BUCKETS_MS))
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if ms <= bound:
+            counts[i] += 1
+            break
+
+
+def _bucket_quantile(counts: list[int], q: float) -> float:
+    """Upper bound (ms) of the bucket holding the q-quantile."""
+    target = q * sum(counts)
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS_MS, counts):
+        seen += n
+        if n and seen >= target:
+            return bound
+    return LATENCY_BUCKETS_MS[-1]
+
+
+def latency_summary() -> str:
+    parts = []
+    for command, counts in sorted(latency_histograms.items()):
+        fmt = lambda b: f"<={b:g}ms" if b != float("inf") else f">{LATENCY_BUCKETS_MS[-2]:g}ms"
+        parts.append(f"{command}: n={sum(counts)} p50{fmt(_bucket_quantile(counts, 0.5))} p99{fmt(_bucket_quantile(counts, 0.99))}")
+    return "; ".join(parts) or "no commands yet"
+
+
+class TimedRedis(aioredis.Redis):
+    """redis.asyncio client that records every command's round-trip time by command name."""
+
+    async def execute_command(self, *args, **options):
+        t0 = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_latency(str(args[0]).upper(), time.perf_counter() - t0)
+
+
+def get_redis() -> TimedRedis:
+    """The shared client for the running event loop (created on first use)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        pool = aioredis.ConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            max_connections=REDIS_MAX_CONNECTIONS,
+        )
+        client = TimedRedis(connection_pool=pool)
+        _clients[loop] = client
+        logger.info(f"[Redis] Connection pool to {REDIS_HOST}:{REDIS_PORT} (max {REDIS_MAX_CONNECTIONS}) created")
+    return client
+
+
+async def aclose():
+    """Close the running loop's pool (for short-lived loops such as a boot-time prefetch)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose(close_connection_pool=True)
@@ -1,5 +1,6 @@
 import json
 import os
+import re
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,19 +8,310 @@ logger = logging.getLogger(__name__)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 RULES_PATH = os.path.join(BASE_DIR, "rules.json")
 
-def load_rules():
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def load_rules(path: str = RULES_PATH):
     """Loads transfer rules from the JSON file."""
-    if not os.path.exists(RULES_PATH):
-        logger.warning(f"Transfer rules file not found at {RULES_PATH}. Using default behavior (transfer all).")
+    if not os.path.exists(path):
+        logger.warning(f"Transfer rules file not found at {path}. Using default behavior (transfer all).")
         return {"rules": [], "default_action": "transfer"}
     try:
-        with open(RULES_PATH, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except (json.JSONDecodeError, IOError) as e:
-        logger.error(f"Error reading or parsing transfer rules file at {RULES_PATH}: {e}")
+        logger.error(f"Error reading or parsing transfer rules file at {path}: {e}")
         return {"rules": [], "default_action": "transfer"}
 
 
+def _keywords(values) -> tuple[str, ...]:
+    return tuple(str(v).lower() for v in values)
+
+
+def _to_number(text: str):
+    try:
+        return float(text)
+    except ValueError:
+        m = _NUMBER_RE.search(text)
+        return float(m.group()) if m else None
+
+
+class CompiledRule:
+    """One rule from rules.json with its operator turned into a ready-to-run predicate."""
+
+    def __init__(self, rule: dict, index: int):
+        self.rule = rule
+        self.index = index
+        self.field = rule.get("field")
+        self.operator = rule.get("operator")
+        self.value = rule.get("value")
+        self.action = rule.get("action")
+        self.keywords: tuple[str, ...] = ()  # lowercased values of contains_any / not_contains
+        self.pattern = None  # compiled regex for the 'regex' operator
+        self._check = None
+
+        op, value = self.operator, self.value
+        if op == "contains_any":
+            if not isinstance(value, list):
+                raise ValueError("'contains_any' expects a list value")
+            self.keywords = _keywords(value)
+            # Normally answered by the stage's incremental scan; this is the standalone fallback
+            self._check = lambda text: self.first_keyword(text.lower()) is not None
+        elif op == "not_contains":
+            self.keywords = _keywords(value if isinstance(value, list) else [value])
+            self._check = lambda text: self.first_keyword(text.lower()) is None
+        elif op == "equals":
+            if not isinstance(value, str):
+                raise ValueError("'equals' expects a string value")
+            expected = value.lower()
+            self._check = lambda text: text.lower() == expected
+        elif op == "regex":
+            if not isinstance(value, str):
+                raise ValueError("'regex' expects a pattern string")
+            self.pattern = re.compile(value, re.IGNORECASE)
+            self._check = lambda text: self.pattern.search(text) is not None
+        elif op == "in_range":
+            if not (isinstance(value, list) and len(value) == 2):
+                raise ValueError("'in_range' expects [min, max] (either may be null)")
+            lo, hi = value
+            self._check = lambda text: self._in_range(text, lo, hi)
+        elif op == "greater_than":
+            self._check = lambda text: self._in_range(text, value, None, inclusive=False)
+        elif op == "less_than":
+            self._check = lambda text: self._in_range(text, None, value, inclusive=False)
+        else:
+            raise ValueError(f"Unsupported operator '{op}'")
+
+    @staticmethod
+    def _in_range(text: str, lo, hi, inclusive=True) -> bool:
+        num = _to_number(text)
+        if num is None:
+            return False
+        if lo is not None and (num < lo if inclusive else num <= lo):
+            return False
+        if hi is not None and (num > hi if inclusive else num >= hi):
+            return False
+        return True
+
+    def first_keyword(self, lowered: str) -> str | None:
+        for kw in self.keywords:
+            if kw in lowered:
+                return kw
+        return None
+
+    def matches(self, text: str) -> bool:
+        return self._check(text)
+
+
+class _FieldScan:
+    """What the contains_any rules of one field have matched in the text seen so far."""
+    __slots__ = ("text", "hits")
+
+    def __init__(self):
+        self.text = ""
+        self.hits: set[int] = set()
+
+
+class CompiledStage:
+    """
+    All rules of one stage, in file order.
+
+    Transcripts only ever grow, so contains_any results are kept per field: when the new
+    text extends the previously seen text, only the appended part (plus an overlap of the
+    longest keyword, for matches straddling the boundary) is lowercased and scanned.
+    """
+
+    def __init__(self, rules: list[CompiledRule]):
+        self.rules = rules
+        self._contains: dict[str, list[CompiledRule]] = {}
+        for rule in rules:
+            if rule.operator == "contains_any":
+                self._contains.setdefault(rule.field, []).append(rule)
+        self._overlap = {
+            field: max((len(kw) for r in field_rules for kw in r.keywords), default=1) - 1
+            for field, field_rules in self._contains.items()
+        }
+        self._scans: dict[str, _FieldScan] = {}
+
+    def contains_rules(self, field: str) -> list[CompiledRule]:
+        return self._contains.get(field, [])
+
+    def overlap(self, field: str) -> int:
+        """Characters a streaming scan must carry over so no keyword is split across chunks."""
+        return self._overlap.get(field, 0)
+
+    def contains_hits(self, field: str, text: str) -> set[int]:
+        """Indices of the contains_any rules on `field` that match `text`."""
+        field_rules = self._contains.get(field)
+        if not field_rules:
+            return set()
+        scan = self._scans.setdefault(field, _FieldScan())
+        if text is scan.text or text == scan.text:
+            return scan.hits
+        if scan.text and text.startswith(scan.text):
+            start = max(0, len(scan.text) - self._overlap[field])
+        else:
+            start = 0
+            scan.hits = set()
+        lowered = text[start:].lower()
+        for rule in field_rules:
+            if rule.index not in scan.hits and rule.first_keyword(lowered) is not None:
+                scan.hits.add(rule.index)
+        scan.text = text
+        return scan.hits
+
+    def first_match(self, collected_data: dict, fields=None) -> CompiledRule | None:
+        texts: dict[str, str] = {}
+        contains: dict[str, set[int]] = {}
+        for rule in self.rules:
+            if fields is not None and rule.field not in fields:
+                return None  # left to the caller (see RuleEngine.match_rule)
+            if rule.field not in texts:
+                texts[rule.field] = str(collected_data.get(rule.field, "") or "")
+            text = texts[rule.field]
+            if not text:
+                continue
+            if rule.operator == "contains_any":
+                if rule.field not in contains:
+                    contains[rule.field] = self.contains_hits(rule.field, text)
+                if rule.index in contains[rule.field]:
+                    return rule
+            elif rule.matches(text):
+                return rule
+        return None
+
+
+class RuleEngine:
+    """
+    Compiled view of rules.json. Rules are compiled once per stage and recompiled only
+    when the file's mtime changes, so evaluating a stage costs a stat() plus a scan of
+    whatever text is new since the last evaluation.
+    """
+
+    def __init__(self, path: str = RULES_PATH):
+        self.path = path
+        self._mtime = None
+        self._loaded = False
+        self._stages: dict[str, CompiledStage] = {}
+        self.default_action = "transfer"
+        self.raw_rules: list[dict] = []
+
+    def _maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+        self._mtime = mtime
+        self._loaded = True
+        self._compile(load_rules(self.path))
+        logger.info(f"Compiled rules from {self.path} ({len(self.raw_rules)} rules, stages: {sorted(self._stages)})")
+
+    def _compile(self, rules_config: dict):
+        self.raw_rules = rules_config.get("rules", [])
+        self.default_action = rules_config.get("default_action", "transfer")
+        per_stage: dict[str, list[CompiledRule]] = {}
+        for idx, rule in enumerate(self.raw_rules):
+            if not all([rule.get("field"), rule.get("operator"), rule.get("value") is not None, rule.get("action")]):
+                logger.warning(f"Skipping malformed rule: {rule}")
+                continue
+            try:
+                per_stage.setdefault(rule.get("stage"), []).append(CompiledRule(rule, idx))
+            except (ValueError, re.error) as e:
+                logger.warning(f"{e}. Skipping rule: {rule}")
+        self._stages = {stage: CompiledStage(rules) for stage, rules in per_stage.items()}
+
+    def stage(self, stage: str) -> CompiledStage | None:
+        self._maybe_reload()
+        return self._stages.get(stage)
+
+    def stage_rules(self, stage: str) -> list[dict]:
+        """The raw (JSON) rules of a stage, in file order."""
+        self._maybe_reload()
+        return [r for r in self.raw_rules if r.get("stage") == stage]
+
+    def match_rule(self, collected_data: dict, stage: str, fields=None) -> dict | None:
+        """
+        The first rule of `stage` that matches, or None (the default action is not applied).
+        With `fields`, evaluation also stops with None at the first rule on any other field, so a
+        caller can decide the rules on structured fields itself and leave the rest (and what follows
+        them, to keep file order) to a judgement such as the LLM.
+        """
+        compiled = self.stage(stage)
+        if compiled is None:
+            return None
+        rule = compiled.first_match(collected_data, fields)
+        return rule.rule if rule else None
+
+
+class KeywordHit:
+    """One occurrence of a contains_any keyword in a stream of text."""
+    __slots__ = ("rule", "keyword", "offset", "context")
+
+    def __init__(self, rule: dict, keyword: str, offset: int, context: str):
+        self.rule = rule
+        self.keyword = keyword
+        self.offset = offset      # absolute position in everything fed so far
+        self.context = context    # the chunk the keyword was found in
+
+    @property
+    def action(self):
+        return self.rule.get("action")
+
+    def __repr__(self):
+        return f"KeywordHit({self.keyword!r} @ {self.offset} -> {self.action})"
+
+
+class StreamingMatcher:
+    """
+    Incremental contains_any matcher for one stage over an append-only text stream
+    (e.g. the caller's utterances). Each feed() scans only the new chunk plus a carried-over
+    tail of the previous one, so keywords split across chunks are still found, and every
+    occurrence is reported exactly once. Only contains_any rules on `field` take part.
+    """
+
+    def __init__(self, stage: str, field: str = "full_transcript", engine: "RuleEngine | None" = None):
+        self.stage = stage
+        self.field = field
+        self._engine = engine
+        self._tail = ""        # lowercased end of the text fed so far
+        self._tail_start = 0   # absolute offset of _tail
+        self._reported: set[tuple[int, str]] = set()  # (offset, keyword) already returned
+
+    def feed(self, chunk: str) -> list[KeywordHit]:
+        compiled = (self._engine or _ENGINE).stage(self.stage)
+        if not chunk:
+            return []
+        window = self._tail + chunk.lower()
+        base = self._tail_start
+        hits = []
+        if compiled is not None:
+            for rule in compiled.contains_rules(self.field):
+                for kw in rule.keywords:
+                    i = window.find(kw)
+                    while i != -1:
+                        key = (base + i, kw)
+                        if key not in self._reported:
+                            self._reported.add(key)
+                            hits.append(KeywordHit(rule.rule, kw, base + i, chunk))
+                        i = window.find(kw, i + 1)
+        keep = compiled.overlap(self.field) if compiled is not None else 0
+        end = base + len(window)
+        self._tail = window[-keep:] if keep else ""
+        self._tail_start = end - len(self._tail)
+        # Occurrences starting before the tail can never be seen again
+        self._reported = {k for k in self._reported if k[0] >= self._tail_start}
+        return sorted(hits, key=lambda h: h.offset)
+
+
+_ENGINE = RuleEngine()
+
+
+def get_engine() -> RuleEngine:
+    return _ENGINE
+
+
 def evaluate_rules(collected_data: dict, stage: str) -> str | None:
     """
     Evaluates rules for a specific stage against the collected data.
@@ -32,54 +324,18 @@ def evaluate_rules(collected_data: dict, stage: str) -> str | None:
     Returns:
         str | None: The action to take, or None if no rule matched for the stage.
     """
-    rules_config = load_rules()
-    rules = rules_config.get("rules", [])
-    default_action = rules_config.get("default_action", "transfer")
-
-    for rule in rules:
-        # Filter by stage
-        if rule.get("stage") != stage:
-            continue
-
-        field = rule.get("field")
-        operator = rule.get("operator")
-        value = rule.get("value")
+    rule = _ENGINE.match_rule(collected_data, stage)
+    if rule is not None:
         action = rule.get("action")
-
-        if not all([field, operator, value, action]):
-            logger.warning(f"Skipping malformed rule: {rule}")
-            continue
-
-        data_to_check = str(collected_data.get(field, "") or "").lower()
-        if not data_to_check:
-            continue
-
-        match = False
-        if operator == "contains_any":
-            if isinstance(value, list):
-                if any(str(v).lower() in data_to_check for v in value):
-                    match = True
-            else:
-                logger.warning(f"'contains_any' expects a list value. Skipping rule: {rule}")
-        elif operator == "equals":
-            if isinstance(value, str):
-                if data_to_check == value.lower():
-                    match = True
-            else:
-                logger.warning(f"'equals' expects a string value. Skipping rule: {rule}")
-        else:
-            logger.warning(f"Unsupported operator '{operator}'. Skipping rule: {rule}")
-            continue
-
-        if match:
-            logger.info(f"Rule matched for stage '{stage}': {rule}. Returning action: {action}")
-            return action
+        logger.info(f"Rule matched for stage '{stage}': {rule}. Returning action: {action}")
+        return action
 
     # Only apply default action for the 'routing' stage
     if stage == "routing":
+        default_action = _ENGINE.default_action
         logger.info(f"No rules matched for stage '{stage}'. Returning default action: {default_action}")
         return default_action
 
     # For other stages like 'spam_check', return None if no rule matches
     logger.debug(f"No rules matched for stage '{stage}'. No action taken.")
-    return None 
\ No newline at end of file
+    return None
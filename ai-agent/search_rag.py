@@ -1,28 +1,89 @@
+import os
+import asyncio
+import logging
+
+import aiohttp
 import requests
 
-def search_collection(collection_name, query_string, top_k=3, server_url="http://localhost:8000"):
-    payload = {
+logger = logging.getLogger("search_rag")
+
+RAG_SERVER_URL = os.getenv("RAG_SERVER_URL", "http://localhost:8000")
+RAG_TIMEOUT = float(os.getenv("RAG_TIMEOUT", "1.5"))  # seconds, per call
+NO_CONTEXT = "No relevant context found."
+
+_session: aiohttp.ClientSession | None = None
+
+
+def _payload(collection_name, query_string, top_k):
+    return {
         "collection_name": collection_name,
         "query_string": query_string,
         "top_k": top_k,
         "qdrant_api_key": "2123tt"
     }
+
+
+def _join_results(data: dict) -> str:
+    results = data.get("result", [])
+    if not isinstance(results, list):
+        # e.g. "No relevant context found."
+        return ""
+    # Extract text from each result and join with spaces
+    return " ".join(res.get("text", "") for res in results)
+
+
+def search_collection(collection_name, query_string, top_k=3, server_url=RAG_SERVER_URL):
+    payload = _payload(collection_name, query_string, top_k)
     print(f"Searching '{collection_name}' for: {query_string}")
     resp = requests.post(f"{server_url}/search", json=payload)
     print("Status:", resp.status_code)
     try:
-        data = resp.json()
-        results = data.get("result", [])
-        # Extract text from each result and join with spaces
-        text_results = [res.get("text", "") for res in results]
-        return " ".join(text_results)
+        return _join_results(resp.json())
     except Exception:
         print("Raw response:", resp.text)
         return ""
 
+
+def _get_session() -> aiohttp.ClientSession:
+    """One keep-alive session per process, created lazily on the running loop."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60)
+        )
+    return _session
+
+
+async def asearch_collection(collection_name, query_string, top_k=3, server_url=RAG_SERVER_URL, timeout=RAG_TIMEOUT) -> str:
+    """
+    Non-blocking version of search_collection.
+    Returns "" if the RAG server is slow or unavailable, so callers never stall on it.
+    """
+    payload = _payload(collection_name, query_string, top_k)
+    try:
+        async with _get_session().post(
+            f"{server_url}/search",
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as resp:
+            data = await resp.json(content_type=None)
+            return _join_results(data)
+    except asyncio.TimeoutError:
+        logger.warning(f"[RAG] Search timed out after {timeout}s for: {query_string}")
+    except Exception as e:
+        logger.warning(f"[RAG] Search failed for '{query_string}': {e}")
+    return ""
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
 # if __name__ == "__main__":
 #     # Example usage
 #     results = search_collection("towing_services_doc", "jump start")
 #     for idx, res in enumerate(results, 1):
 #         print(f"\nResult {idx}:")
-#         print(res.get("text", res)) 
\ No newline at end of file
+#         print(res.get("text", res))
@@ -1,6 +1,7 @@
 import sys
-import socket
-import random
+import asyncio
+
+from sip_message import SipMessageSender, SipMessageError
 
 # Set default SIP server and port here
 DEFAULT_SIP_SERVER = "15.204.51.230"
@@ -21,35 +22,25 @@ else:
     SIP_SERVER = DEFAULT_SIP_SERVER
     SIP_PORT = DEFAULT_SIP_PORT
 
-# Sender details (change as needed)
-from_ext = "1000"
-from_domain = SIP_SERVER
-
-call_id = str(random.randint(100000, 999999))
-cseq = random.randint(1, 10000)
 
-sip_msg = f"""MESSAGE sip:{to_ext}@{SIP_SERVER}:{SIP_PORT} SIP/2.0
-Via: SIP/2.0/UDP {from_domain}:5060;branch=z9hG4bK{random.randint(10000,99999)}
-Max-Forwards: 70
-To: <sip:{to_ext}@{SIP_SERVER}>
-From: <sip:{from_ext}@{SIP_SERVER}:{SIP_PORT}>;tag={random.randint(10000,99999)}
-Call-ID: {call_id}@{from_domain}
-CSeq: {cseq} MESSAGE
-Content-Type: text/plain
-Content-Length: {len(msg)}
+async def main():
+    # Sender details (change as needed)
+    sender = await SipMessageSender.create(from_ext="1000")
+    try:
+        status = await sender.send(to_ext, msg, SIP_SERVER, SIP_PORT)
+    finally:
+        sender.close()
+    print(f"Sent SIP MESSAGE to {to_ext}@{SIP_SERVER}:{SIP_PORT} ({status}): {msg}")
 
-{msg}
-"""
 
-# Send SIP MESSAGE via UDP
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.sendto(sip_msg.encode(), (SIP_SERVER, SIP_PORT))
-sock.close()
-
-print(f"Sent SIP MESSAGE to {to_ext}@{SIP_SERVER}:{SIP_PORT}: {msg}")
+try:
+    asyncio.run(main())
+except SipMessageError as e:
+    print(f"Failed to send SIP MESSAGE to {to_ext}@{SIP_SERVER}:{SIP_PORT}: {e}")
+    sys.exit(1)
 
 
 # this works
 # python3 sendSipMsg.py 2002 "Hello from remote!" 65.19.173.80 5080
 # this works
-# python3 sendSipMsg.py 1002 "Hello from remote!" 15.204.51.230 5070
\ No newline at end of file
+# python3 sendSipMsg.py 1002 "Hello from remote!" 15.204.51.230 5070
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# send_webhook.py
+"""
+Stand-in for the LiveKit server's webhook sender, for exercising manager.py locally.
+
+Posts signed room_started (and optionally room_finished) events for synthetic rooms,
+exactly as LiveKit does: JSON body, Authorization header = JWT carrying the body's sha256.
+The manager logs the launch latency of every room and a p50/p95 summary each reconcile.
+
+Note: the manager's reconciliation treats rooms the LiveKit server does not know about as
+gone, so raise RECONCILE_INTERVAL while testing with made-up rooms.
+
+Usage: python3 send_webhook.py [--rooms N] [--interval SECS] [--finish-after SECS] [--url URL]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import time
+import uuid
+
+import aiohttp
+from dotenv import load_dotenv
+from google.protobuf.json_format import MessageToJson
+from livekit import api
+from livekit.protocol.models import Room
+from livekit.protocol.webhook import WebhookEvent
+
+load_dotenv()
+
+
+def build_event(event: str, room_name: str) -> WebhookEvent:
+    now = time.time()
+    room = Room(sid=f"RM_{uuid.uuid4().hex[:12]}", name=room_name, creation_time=int(now))
+    if "creation_time_ms" in Room.DESCRIPTOR.fields_by_name:
+        room.creation_time_ms = int(now * 1000)
+    return WebhookEvent(event=event, room=room, id=f"EV_{uuid.uuid4().hex[:12]}", created_at=int(now))
+
+
+def sign(body: str, api_key: str, api_secret: str) -> str:
+    digest = base64.b64encode(hashlib.sha256(body.encode()).digest()).decode()
+    return api.AccessToken(api_key, api_secret).with_sha256(digest).to_jwt()
+
+
+async def send(session, url, event: WebhookEvent, api_key, api_secret):
+    body = MessageToJson(event)
+    t0 = time.perf_counter()
+    async with session.post(url, data=body, headers={
+        "Authorization": sign(body, api_key, api_secret),
+        "Content-Type": "application/webhook+json",
+    }) as resp:
+        text = await resp.text()
+    print(f"{event.event:<14} {event.room.name:<28} -> {resp.status} {text} ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.getenv('MANAGER_WEBHOOK_PORT', '8089')}/webhook")
+    parser.add_argument("--prefix", default=os.getenv("LIVEKIT_ROOM_PREFIX", "room1-"))
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between room_started events")
+    parser.add_argument("--finish-after", type=float, default=None, help="send room_finished this many seconds after each start")
+    args = parser.parse_args()
+
+    api_key, api_secret = os.getenv("LIVEKIT_API_KEY"), os.getenv("LIVEKIT_API_SECRET")
+    if not api_key or not api_secret:
+        raise SystemExit("LIVEKIT_API_KEY / LIVEKIT_API_SECRET must match the manager's")
+
+    async with aiohttp.ClientSession() as session:
+        finishes = []
+        for i in range(args.rooms):
+            room = f"{args.prefix}webhook-test-{uuid.uuid4().hex[:6]}"
+            await send(session, args.url, build_event("room_started", room), api_key, api_secret)
+            if args.finish_after is not None:
+                finishes.append(asyncio.create_task(
+                    _finish_later(session, args, room, api_key, api_secret)))
+            if i < args.rooms - 1:
+                await asyncio.sleep(args.interval)
+        if finishes:
+            await asyncio.gather(*finishes)
+
+
+async def _finish_later(session, args, room, api_key, api_secret):
+    await asyncio.sleep(args.finish_after)
+    await send(session, args.url, build_event("room_finished", room), api_key, api_secret)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
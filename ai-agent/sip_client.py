@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# sip_client.py
+"""
+Async LiveKit SIP (Twirp) client for the transfer path, the non-blocking counterpart of agentCaller.py.
+
+Requests share one keep-alive aiohttp session per event loop and the signed-token cache in agentCaller.
+Each request has a timeout and is retried with jittered backoff. Calls that create something
+(CreateSIPOutboundTrunk, CreateSIPParticipant) are retried only when the connection could not be
+made, so a slow answer never turns into a second trunk or a second dial-out.
+The trunk ID is prefetched when the worker boots, cached process-wide for TRUNK_CACHE_TTL and shared
+between nodes through Redis, so a transfer normally makes one call and nodes don't create duplicate trunks.
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+import weakref
+
+import aiohttp
+from redis.exceptions import RedisError
+
+import agentCaller
+from lease import Lease
+
+logger = logging.getLogger("sip-client")
+
+SIP_HTTP_TIMEOUT = float(os.getenv("SIP_HTTP_TIMEOUT", "5"))    # seconds per attempt
+SIP_HTTP_RETRIES = int(os.getenv("SIP_HTTP_RETRIES", "3"))      # attempts per request
+SIP_RETRY_BACKOFF = float(os.getenv("SIP_RETRY_BACKOFF", "0.2"))  # base delay, doubled per attempt, full jitter
+TRUNK_CACHE_TTL  = float(os.getenv("TRUNK_CACHE_TTL", "600"))   # seconds, in this process
+TRUNK_REDIS_TTL  = int(os.getenv("TRUNK_REDIS_TTL", "3600"))    # seconds, shared by every node
+TRUNK_LOCK_WAIT  = float(os.getenv("TRUNK_LOCK_WAIT", "10"))    # seconds to wait for another node's resolution
+
+_RETRY_STATUSES = {502, 503, 504}
+
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+_trunk_cache = {}  # trunk address -> (trunk_id, expires_at)
+_resolving: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+
+
+class SipApiError(Exception):
+    """A Twirp call failed for good (after retries, or with a non-retryable status)."""
+
+
+def _session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=SIP_HTTP_TIMEOUT),
+            connector=aiohttp.TCPConnector(keepalive_timeout=60),
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def aclose():
+    """Close this loop's session (end of the job)."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def _twirp(method: str, body: dict, idempotent: bool = True, sip_grants=None) -> dict:
+    url = f"{agentCaller.LIVEKIT_REST_URL}/twirp/livekit.SIP/{method}"
+    last_error = None
+    for attempt in range(SIP_HTTP_RETRIES):
+        if attempt:
+            await asyncio.sleep(random.uniform(0, SIP_RETRY_BACKOFF * 2 ** (attempt - 1)))
+        t0 = time.perf_counter()
+        try:
+            async with _session().post(url, headers=agentCaller.headers(sip_grants), json=body) as resp:
+                text = await resp.text()
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                if resp.status == 200:
+                    logger.info(f"[SIP] {method} ok in {elapsed_ms:.0f} ms")
+                    return await resp.json(content_type=None)
+                last_error = SipApiError(f"{method} failed: {resp.status} {text}")
+                if resp.status not in _RETRY_STATUSES or not idempotent:
+                    raise last_error
+        except aiohttp.ClientConnectorError as e:
+            last_error = e  # nothing was sent, always safe to retry
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_error = e
+            if not idempotent:
+                break
+        logger.warning(f"[SIP] {method} attempt {attempt + 1}/{SIP_HTTP_RETRIES} failed: {last_error!r}")
+    raise SipApiError(f"{method} failed: {last_error!r}")
+
+
+async def list_trunks() -> list[dict]:
+    """List all SIP outbound trunks."""
+    data = await _twirp("ListSIPOutboundTrunk", {})
+    return data.get("items") or data.get("sip_trunks", [])
+
+
+async def create_trunk() -> str:
+    name = "AsteriskTrunk-" + str(uuid.uuid4())[:8]
+    body = {
+        "trunk": {
+            "name":         name,
+            "address":      agentCaller.SIP_TRUNK_ADDRESS,
+            "auth_username":agentCaller.SIP_TRUNK_USER,
+            "auth_password":agentCaller.SIP_TRUNK_PASS,
+            "numbers":      [ agentCaller.SIP_EXTENSION ],
+        }
+    }
+    data = await _twirp("CreateSIPOutboundTrunk", body, idempotent=False)
+    logger.info(f"[SIP] Created trunk {data['sip_trunk_id']} ({name})")
+    return data["sip_trunk_id"]
+
+
+def cached_trunk_id() -> str | None:
+    entry = _trunk_cache.get(agentCaller.SIP_TRUNK_ADDRESS)
+    if entry and time.monotonic() < entry[1]:
+        return entry[0]
+    return None
+
+
+def remember_trunk_id(trunk_id: str):
+    _trunk_cache[agentCaller.SIP_TRUNK_ADDRESS] = (trunk_id, time.monotonic() + TRUNK_CACHE_TTL)
+
+
+def _trunk_key() -> str:
+    return f"sip_trunk_id:{agentCaller.SIP_TRUNK_ADDRESS}"
+
+
+# KEYS[1] shared trunk ID; ARGV[1] trunk ID -> 1 if deleted (only if no node has stored a newer one)
+_FORGET_TRUNK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def forget_trunk(trunk_id: str, redis_client=None):
+    """Drop a trunk ID that failed in use from this process's cache and from Redis, so the next call lists/creates again."""
+    entry = _trunk_cache.get(agentCaller.SIP_TRUNK_ADDRESS)
+    if entry and entry[0] == trunk_id:
+        del _trunk_cache[agentCaller.SIP_TRUNK_ADDRESS]
+    if redis_client is None:
+        return
+    try:
+        if await redis_client.register_script(_FORGET_TRUNK)(keys=[_trunk_key()], args=[trunk_id]):
+            logger.info(f"[SIP] Dropped shared trunk ID {trunk_id}")
+    except RedisError as e:
+        logger.warning(f"[SIP] Could not drop trunk {trunk_id} from Redis: {e!r}")
+
+
+async def _lookup_or_create_trunk() -> str:
+    for trunk in await list_trunks():
+        if trunk.get("address") == agentCaller.SIP_TRUNK_ADDRESS:
+            logger.info(f"[SIP] Found existing trunk: {trunk['sip_trunk_id']}")
+            return trunk["sip_trunk_id"]
+    return await create_trunk()
+
+
+async def _resolve_trunk(redis_client) -> str:
+    if redis_client is None:
+        return await _lookup_or_create_trunk()
+    try:
+        return await _resolve_trunk_shared(redis_client)
+    except RedisError as e:
+        logger.warning(f"[SIP] Redis unavailable for the shared trunk ID ({e!r}), resolving here")
+        return await _lookup_or_create_trunk()
+
+
+async def _resolve_trunk_shared(redis_client) -> str:
+    key = _trunk_key()
+    # Released only by its owner (see lease.py), so a holder that outlived the TTL can't drop another node's lock
+    lock = Lease(redis_client, f"sip_trunk_lock:{agentCaller.SIP_TRUNK_ADDRESS}", str(uuid.uuid4()), TRUNK_LOCK_WAIT + 5)
+    deadline = time.monotonic() + TRUNK_LOCK_WAIT
+    while True:
+        val = await redis_client.get(key)
+        if val:
+            return val.decode()
+        # One node per address lists/creates; the others wait for its answer instead of creating their own trunk
+        if await lock.acquire():
+            try:
+                trunk_id = await _lookup_or_create_trunk()
+                await redis_client.set(key, trunk_id, ex=TRUNK_REDIS_TTL)
+                return trunk_id
+            finally:
+                await lock.release()
+        if time.monotonic() > deadline:
+            logger.warning("[SIP] Timed out waiting for another node to resolve the trunk, resolving here")
+            return await _lookup_or_create_trunk()
+        await asyncio.sleep(0.2)
+
+
+async def get_or_create_trunk(redis_client=None) -> str:
+    """Trunk ID for SIP_TRUNK_ADDRESS: process cache, then Redis (shared by all nodes), then list/create.
+
+    Concurrent callers on the same loop share one resolution (the boot prefetch and a transfer, say).
+    """
+    trunk_id = cached_trunk_id()
+    if trunk_id:
+        return trunk_id
+    loop = asyncio.get_running_loop()
+    task = _resolving.get(loop)
+    if task is None or task.done():
+        task = _resolving[loop] = loop.create_task(_resolve_trunk(redis_client))
+    trunk_id = await asyncio.shield(task)
+    remember_trunk_id(trunk_id)
+    return trunk_id
+
+
+async def prefetch_trunk(redis_client=None):
+    """Resolve the trunk ahead of any transfer; failures are only logged, the transfer path retries."""
+    t0 = time.perf_counter()
+    try:
+        trunk_id = await get_or_create_trunk(redis_client)
+        logger.info(f"[SIP] Trunk {trunk_id} ready in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    except Exception as e:
+        logger.warning(f"[SIP] Trunk prefetch failed: {e!r}")
+
+
+async def join_sip_participant(trunk_id, extension, room_name, identity=None, redis_client=None) -> bool:
+    """Dial `extension` into the room. A failure forgets the trunk ID (forget_trunk), in case the trunk is gone."""
+    logger.info(f"[SIP] Joining extension {extension} to room {room_name} using trunk {trunk_id}")
+    payload = {
+        "sip_trunk_id": trunk_id,
+        "sip_call_to": extension,
+        "room_name": room_name,
+        "participant_identity": identity or f"sip-{extension}-{uuid.uuid4().hex[:6]}",
+        "headers": {
+            "X-Room-Name": room_name
+            }
+    }
+    try:
+        await _twirp("CreateSIPParticipant", payload, idempotent=False)
+        return True
+    except SipApiError as e:
+        logger.error(f"[SIP] Failed to join SIP participant {extension} to room {room_name}: {e}")
+        await forget_trunk(trunk_id, redis_client)
+        return False
+
+
+async def remove_sip_participant(room_name, participant_identity) -> bool:
+    payload = {
+        "room_name": room_name,
+        "participant_identity": participant_identity,
+    }
+    try:
+        await _twirp("DeleteSIPParticipant", payload)
+        logger.info(f"[SIP] Removed SIP participant {participant_identity} from room {room_name}")
+        return True
+    except SipApiError as e:
+        logger.error(f"[SIP] Failed to remove SIP participant: {e}")
+        return False
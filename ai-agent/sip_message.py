@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# sip_message.py
+"""
+In-process SIP MESSAGE sender (RFC 3428) over UDP, used by Agent3 and sendSipMsg.py.
+
+One asyncio datagram endpoint per event loop carries every request; responses are matched to their
+client transaction by the Via branch. Each send is a non-INVITE client transaction per RFC 3261 17.1.2:
+retransmit on Timer E (T1, doubling up to T2, then every T2 once a 1xx arrives) until a final response
+or Timer F (64*T1). 2xx is success; any other final response raises SipMessageError.
+Requests larger than MAX_UDP_REQUEST are refused (RFC 3261 18.1.1 requires a congestion-controlled
+transport for them); split_body() cuts a long body into numbered parts that fit.
+"""
+import uuid
+import random
+import socket
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger("sip-message")
+
+T1 = 0.5  # RTT estimate (s)
+T2 = 4.0  # maximum retransmit interval for non-INVITE requests (s)
+MAX_UDP_REQUEST = 1300  # bytes; RFC 3261 18.1.1 limit for UDP when the path MTU is unknown
+MAX_BODY = 800  # bytes of body that fit in MAX_UDP_REQUEST next to our headers
+PART_PREFIX = 12  # bytes reserved in each part for its "[i/n] " number
+
+_senders: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SipMessageSender]" = weakref.WeakKeyDictionary()
+
+
+class SipMessageError(Exception):
+    """A MESSAGE got a non-2xx final response, or none before Timer F."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+def split_body(message: str, limit: int = MAX_BODY) -> list[str]:
+    """`message` as parts of at most `limit` UTF-8 bytes, numbered "[i/n] " when there are several.
+
+    Parts break after a newline where possible, otherwise on a character boundary; nothing is dropped.
+    """
+    if len(message.encode()) <= limit:
+        return [message]
+    budget = limit - PART_PREFIX
+    parts, current = [], b""
+    for line in message.encode().splitlines(keepends=True):
+        if current and len(current) + len(line) > budget:
+            parts.append(current)
+            current = b""
+        while len(line) > budget:
+            cut = budget
+            while cut and (line[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+                cut -= 1
+            parts.append(line[:cut])
+            line = line[cut:]
+        current += line
+    if current:
+        parts.append(current)
+    return [f"[{i}/{len(parts)}] {part.decode()}" for i, part in enumerate(parts, 1)]
+
+
+def _parse_response(data: bytes):
+    """(status, reason, branch) of a SIP response, or None for anything else."""
+    try:
+        head = data.split(b"\r\n\r\n", 1)[0].decode("utf-8", "replace")
+    except Exception:
+        return None
+    lines = head.split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or parts[0] != "SIP/2.0" or not parts[1].isdigit():
+        return None
+    branch = None
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() in ("via", "v"):
+            for param in value.split(";")[1:]:
+                key, _, val = param.strip().partition("=")
+                if key.lower() == "branch":
+                    branch = val.split(",")[0].strip()
+            break  # only the top Via is ours
+    return int(parts[1]), parts[2] if len(parts) > 2 else "", branch
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    sender: "SipMessageSender | None" = None  # set once the endpoint is bound
+
+    def datagram_received(self, data, addr):
+        parsed = _parse_response(data)
+        if parsed is None or self.sender is None:
+            return
+        status, reason, branch = parsed
+        txn = self.sender._transactions.get(branch)
+        if txn is not None:
+            txn.put_nowait((status, reason))
+
+    def error_received(self, exc):
+        logger.warning(f"[SIP MESSAGE] Socket error: {exc}")
+
+
+class SipMessageSender:
+    def __init__(self, transport, from_ext: str = "1000", t1: float = T1, t2: float = T2):
+        self.transport = transport
+        self.from_ext = from_ext
+        self.t1 = t1
+        self.t2 = t2
+        self.local_port = transport.get_extra_info("sockname")[1]
+        self._transactions: dict[str, asyncio.Queue] = {}  # Via branch -> responses
+        self._local_ips: dict[str, str] = {}
+        self._cseq = random.randint(1, 10000)
+
+    @classmethod
+    async def create(cls, bind_host: str = "0.0.0.0", bind_port: int = 0, **kwargs):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(_Protocol, local_addr=(bind_host, bind_port))
+        protocol.sender = cls(transport, **kwargs)
+        return protocol.sender
+
+    def close(self):
+        self.transport.close()
+
+    def _local_ip(self, host: str) -> str:
+        """Source address the kernel would use towards `host` (for Via/Call-ID); no packet is sent."""
+        ip = self._local_ips.get(host)
+        if ip is None:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect((host, 9))
+                ip = s.getsockname()[0]
+            self._local_ips[host] = ip
+        return ip
+
+    def _build(self, to_ext: str, body: bytes, host: str, port: int, branch: str) -> bytes:
+        local_ip = self._local_ip(host)
+        self._cseq += 1
+        head = (
+            f"MESSAGE sip:{to_ext}@{host}:{port} SIP/2.0\r\n"
+            f"Via: SIP/2.0/UDP {local_ip}:{self.local_port};rport;branch={branch}\r\n"
+            f"Max-Forwards: 70\r\n"
+            f"To: <sip:{to_ext}@{host}>\r\n"
+            f"From: <sip:{self.from_ext}@{host}:{port}>;tag={uuid.uuid4().hex[:10]}\r\n"
+            f"Call-ID: {uuid.uuid4().hex}@{local_ip}\r\n"
+            f"CSeq: {self._cseq} MESSAGE\r\n"
+            f"Content-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"\r\n"
+        )
+        return head.encode() + body
+
+    async def send(self, to_ext, message: str, host: str, port: int) -> int:
+        """Send one MESSAGE and wait for its final response; returns the 2xx status."""
+        port = int(port)
+        branch = "z9hG4bK" + uuid.uuid4().hex
+        packet = self._build(str(to_ext), message.encode(), host, port, branch)
+        if len(packet) > MAX_UDP_REQUEST:
+            raise SipMessageError(f"MESSAGE to {to_ext}@{host}:{port} is {len(packet)} bytes, over the {MAX_UDP_REQUEST}-byte UDP limit")
+        responses = self._transactions[branch] = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        timer_f = loop.time() + 64 * self.t1
+        interval = self.t1
+        try:
+            self.transport.sendto(packet, (host, port))
+            while True:
+                remaining = timer_f - loop.time()
+                if remaining <= 0:
+                    raise SipMessageError(f"No final response from {to_ext}@{host}:{port} (Timer F)")
+                try:
+                    status, reason = await asyncio.wait_for(responses.get(), min(interval, remaining))
+                except asyncio.TimeoutError:
+                    # Timer E: retransmit
+                    self.transport.sendto(packet, (host, port))
+                    interval = min(interval * 2, self.t2)
+                    continue
+                if status < 200:
+                    interval = self.t2  # Proceeding: keep retransmitting every T2
+                    continue
+                if status < 300:
+                    return status
+                raise SipMessageError(f"MESSAGE to {to_ext}@{host}:{port} rejected: {status} {reason}", status)
+        finally:
+            del self._transactions[branch]
+
+    async def send_many(self, to_ext, messages: list[str], host: str, port: int) -> list:
+        """Send several MESSAGEs concurrently; one status or SipMessageError per message, in order."""
+        return await asyncio.gather(*(self.send(to_ext, m, host, port) for m in messages), return_exceptions=True)
+
+
+async def get_sender() -> SipMessageSender:
+    """The shared sender for the running event loop (socket opened on first use)."""
+    loop = asyncio.get_running_loop()
+    sender = _senders.get(loop)
+    if sender is None:
+        sender = await SipMessageSender.create()
+        if loop in _senders:  # another caller won the race while we were binding
+            sender.close()
+        else:
+            _senders[loop] = sender
+    return _senders[loop]
@@ -0,0 +1,109 @@
+"""
+CallDispatcher.on_user_turn with stub Agent1/Agent2 objects: the turn's stages run concurrently,
+a terminal verdict cancels the stages still running, and reaction_latencies records the turn.
+
+Usage: python3 -m pytest test_call_dispatcher.py
+"""
+import asyncio
+import types
+
+import call_dispatcher
+import turn_classifier
+
+STAGE_DELAY = 0.2
+
+
+class StubAgent2:
+    def __init__(self, extraction_delay):
+        self.extraction_delay = extraction_delay
+        self.extraction = None  # "done" or "cancelled"
+        # Every required field is known, so no prompt is spoken after the turn
+        for field in ("name", "phone", "service", "location", "year", "make", "model", "color"):
+            setattr(self, field, "x")
+
+    async def process_history(self, history):
+        try:
+            await asyncio.sleep(self.extraction_delay)
+            self.extraction = "done"
+        except asyncio.CancelledError:
+            self.extraction = "cancelled"
+            raise
+
+    def has_all_required_info(self):
+        return False
+
+    def get_collected_data(self):
+        return {}
+
+
+class StubAgent1:
+    def __init__(self, verdict=None, emergency_delay=STAGE_DELAY, extraction_delay=STAGE_DELAY):
+        self.agent2 = StubAgent2(extraction_delay)
+        self.verdict = verdict
+        self.emergency_delay = emergency_delay
+        self.chat_history = [types.SimpleNamespace(role=types.SimpleNamespace(name="user"), content=["hello"])]
+        self.spam_detected = False
+        self.transfer_initiated = False
+        self.block_llm = False
+        self.waiting_for_field = None
+        self.transferred_for = None
+
+    async def classify_emergency(self):
+        await asyncio.sleep(self.emergency_delay)
+        return self.verdict
+
+    async def transfer_for_emergency(self, verdict):
+        self.transferred_for = verdict
+        self.transfer_initiated = True
+
+    async def hangup_if_spam(self):
+        return True
+
+    async def trigger_transfer_if_ready(self):
+        pass
+
+    async def safe_say(self, text):
+        pass
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+async def _run_turn(agent, settle):
+    dispatcher = call_dispatcher.CallDispatcher(agent, _noop)
+    dispatcher.start()
+    try:
+        dispatcher.on_user_turn()
+        await asyncio.sleep(settle)
+    finally:
+        dispatcher.stop()
+    return dispatcher
+
+
+def test_turn_stages_run_concurrently(monkeypatch):
+    monkeypatch.setattr(turn_classifier, "CLASSIFIER_MODE", "per_stage")
+    agent = StubAgent1()
+    dispatcher = asyncio.run(_run_turn(agent, settle=STAGE_DELAY * 2.5))
+
+    assert agent.agent2.extraction == "done"
+    assert agent.transferred_for is None
+    [latency] = dispatcher.reaction_latencies[call_dispatcher.USER_TURN]
+    # Both stages take STAGE_DELAY; back to back the turn would take twice as long
+    assert STAGE_DELAY <= latency < STAGE_DELAY * 1.75
+    [turn] = dispatcher.turn_latencies
+    assert set(turn) == {"extraction", "emergency", "critical_path"}
+
+
+def test_emergency_verdict_cancels_extraction(monkeypatch):
+    monkeypatch.setattr(turn_classifier, "CLASSIFIER_MODE", "per_stage")
+    agent = StubAgent1(verdict="car accident", emergency_delay=0.05, extraction_delay=STAGE_DELAY * 5)
+    dispatcher = asyncio.run(_run_turn(agent, settle=STAGE_DELAY))
+
+    assert agent.transferred_for == "car accident"
+    assert agent.agent2.extraction == "cancelled"
+    assert not dispatcher.running  # the handoff ends dispatching
+    [latency] = dispatcher.reaction_latencies[call_dispatcher.USER_TURN]
+    assert latency < STAGE_DELAY
+    [turn] = dispatcher.turn_latencies
+    assert "extraction" not in turn and "emergency" in turn
@@ -0,0 +1,112 @@
+"""
+sip_client against a local aiohttp Twirp stub: a retried 503 on list, a cached trunk, a create
+that is not retried after a 503, a failed dial-out that forgets its trunk, and delete.
+
+Usage: python3 -m pytest test_sip_client.py
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import agentCaller
+import sip_client
+
+
+class TwirpStub:
+    """Answers /twirp/livekit.SIP/<method> from per-method lists of (status, body), last one repeating."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []  # (method, request body)
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.calls.append((method, await request.json()))
+        answers = self.answers[method]
+        status, body = answers.pop(0) if len(answers) > 1 else answers[0]
+        return web.json_response(body, status=status)
+
+    def count(self, method):
+        return sum(m == method for m, _ in self.calls)
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(agentCaller, "LIVEKIT_API_KEY", "key")
+    monkeypatch.setattr(agentCaller, "LIVEKIT_API_SECRET", "test-secret-long-enough-for-hs256!")
+    monkeypatch.setattr(sip_client, "SIP_RETRY_BACKOFF", 0.0)
+    sip_client._trunk_cache.clear()
+    yield
+    sip_client._trunk_cache.clear()
+
+
+def _run(answers, scenario, monkeypatch):
+    stub = TwirpStub(answers)
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/twirp/livekit.SIP/{method}", stub.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(agentCaller, "LIVEKIT_REST_URL", f"http://127.0.0.1:{port}")
+        try:
+            return await scenario()
+        finally:
+            await sip_client.aclose()
+            await runner.cleanup()
+
+    return stub, asyncio.run(main())
+
+
+def _trunk(trunk_id):
+    return {"sip_trunk_id": trunk_id, "address": agentCaller.SIP_TRUNK_ADDRESS}
+
+
+def test_list_retries_503(monkeypatch):
+    answers = {"ListSIPOutboundTrunk": [(503, {}), (200, {"items": [_trunk("ST_1")]})]}
+    stub, trunks = _run(answers, sip_client.list_trunks, monkeypatch)
+    assert [t["sip_trunk_id"] for t in trunks] == ["ST_1"]
+    assert stub.count("ListSIPOutboundTrunk") == 2
+
+
+def test_trunk_is_cached(monkeypatch):
+    async def scenario():
+        return [await sip_client.get_or_create_trunk(), await sip_client.get_or_create_trunk()]
+
+    answers = {"ListSIPOutboundTrunk": [(200, {"items": [_trunk("ST_1")]})]}
+    stub, ids = _run(answers, scenario, monkeypatch)
+    assert ids == ["ST_1", "ST_1"]
+    assert stub.count("ListSIPOutboundTrunk") == 1
+
+
+def test_create_is_not_retried_after_503(monkeypatch):
+    async def scenario():
+        with pytest.raises(sip_client.SipApiError):
+            await sip_client.create_trunk()
+
+    answers = {"CreateSIPOutboundTrunk": [(503, {}), (200, {"sip_trunk_id": "ST_2"})]}
+    stub, _ = _run(answers, scenario, monkeypatch)
+    assert stub.count("CreateSIPOutboundTrunk") == 1
+
+
+def test_failed_join_forgets_trunk(monkeypatch):
+    async def scenario():
+        sip_client.remember_trunk_id("ST_1")
+        joined = await sip_client.join_sip_participant("ST_1", "4000", "room-1")
+        return joined, sip_client.cached_trunk_id()
+
+    answers = {"CreateSIPParticipant": [(404, {"msg": "trunk not found"})]}
+    stub, (joined, cached) = _run(answers, scenario, monkeypatch)
+    assert joined is False and cached is None
+    assert stub.count("CreateSIPParticipant") == 1
+
+
+def test_delete(monkeypatch):
+    answers = {"DeleteSIPParticipant": [(200, {})]}
+    stub, removed = _run(answers, lambda: sip_client.remove_sip_participant("room-1", "sip-4000"), monkeypatch)
+    assert removed is True
+    assert stub.calls == [("DeleteSIPParticipant", {"room_name": "room-1", "participant_identity": "sip-4000"})]
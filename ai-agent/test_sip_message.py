@@ -0,0 +1,95 @@
+"""
+SipMessageSender against a local UDP stub: a 200 answer, a late answer after Timer E
+retransmissions, no answer at all (Timer F), the UDP size limit, and splitting a long body.
+
+Usage: python3 -m pytest test_sip_message.py
+"""
+import asyncio
+
+import pytest
+
+from sip_message import MAX_BODY, MAX_UDP_REQUEST, SipMessageError, SipMessageSender, split_body
+
+T1 = 0.02
+T2 = 0.08
+
+
+class StubServer(asyncio.DatagramProtocol):
+    """Answers each MESSAGE with `status` once it has seen it `answer_after` times; never if None."""
+
+    def __init__(self, status=200, answer_after=1):
+        self.status = status
+        self.answer_after = answer_after
+        self.received = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.received.append(data)
+        if self.answer_after is None or len(self.received) < self.answer_after:
+            return
+        head = data.split(b"\r\n\r\n", 1)[0].decode()
+        via = next(line for line in head.split("\r\n") if line.startswith("Via:"))
+        self.transport.sendto(f"SIP/2.0 {self.status} Reason\r\n{via}\r\nContent-Length: 0\r\n\r\n".encode(), addr)
+
+
+async def _send(server, message="hello"):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+    port = transport.get_extra_info("sockname")[1]
+    sender = await SipMessageSender.create(bind_host="127.0.0.1", t1=T1, t2=T2)
+    t0 = loop.time()
+    try:
+        return await sender.send("2002", message, "127.0.0.1", port), loop.time() - t0
+    finally:
+        sender.close()
+        transport.close()
+
+
+def test_answered():
+    server = StubServer()
+    status, _ = asyncio.run(_send(server))
+    assert status == 200
+    assert len(server.received) == 1
+
+
+def test_late_answer_after_retransmissions():
+    server = StubServer(answer_after=3)
+    status, elapsed = asyncio.run(_send(server))
+    assert status == 200
+    assert len(server.received) == 3
+    assert elapsed >= T1 + 2 * T1  # Timer E: T1, then doubled
+
+
+def test_no_answer_times_out_on_timer_f():
+    server = StubServer(answer_after=None)
+    with pytest.raises(SipMessageError, match="Timer F"):
+        asyncio.run(_send(server))
+    assert len(server.received) > 3
+
+
+def test_rejected():
+    with pytest.raises(SipMessageError) as exc:
+        asyncio.run(_send(StubServer(status=486)))
+    assert exc.value.status == 486
+
+
+def test_oversized_request_is_refused():
+    server = StubServer()
+    with pytest.raises(SipMessageError, match="UDP limit"):
+        asyncio.run(_send(server, "x" * MAX_UDP_REQUEST))
+    assert server.received == []
+
+
+def test_split_body():
+    transcript = "Caller: Ann\n\nTranscript:\n" + "User: é\n" * 500 + "ü" * 2000
+    parts = split_body(transcript)
+    assert len(parts) > 1
+    assert all(len(p.encode()) <= MAX_BODY for p in parts)
+    assert parts[0].startswith(f"[1/{len(parts)}] Caller: Ann")
+    assert "".join(p.split("] ", 1)[1] for p in parts) == transcript
+    assert split_body("short") == ["short"]
+    for part in parts:
+        status, _ = asyncio.run(_send(StubServer(), part))
+        assert status == 200
@@ -0,0 +1,108 @@
+"""
+Combined per-turn classifier: one LLM call returns the spam, emergency and routing verdicts together
+with the caller fields, instead of the separate extraction, emergency, spam and routing prompts.
+
+Opt-in with LLM_CLASSIFIER_MODE=combined (default "per_stage", the separate calls). The system
+prompt (instructions, routing rules, default action) is the same for every call in a process and
+everything that changes per turn comes after it, so providers that cache prompt prefixes (OpenAI:
+from 1024 tokens) can reuse it. Calls are counted under the "classifier" stage in llm_usage, next to
+the per-stage "extraction"/"emergency"/"spam"/"routing" counters.
+Compare the modes on recorded transcripts with bench_classifier.py.
+"""
+import os
+import json
+import logging
+
+from livekit.agents.llm import ChatMessage
+from livekit.agents.llm.chat_context import ChatContext
+
+import llm_usage
+from agent2 import CALLER_FIELDS, extraction_instructions
+from rules import get_engine
+
+logger = logging.getLogger("turn-classifier")
+
+CLASSIFIER_MODE = os.getenv("LLM_CLASSIFIER_MODE", "per_stage")  # "per_stage" or "combined"
+CLASSIFIER_MAX_DELTA = int(os.getenv("CLASSIFIER_MAX_DELTA", "32000"))  # chars of new conversation sent
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "turn_classification",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "spam": {"type": "boolean"},
+                "emergency": {"type": "boolean"},
+                "routing": {"type": "string", "enum": ["transfer", "end_call"]},
+                **{field: {"type": "string"} for field in CALLER_FIELDS},
+            },
+            "required": ["spam", "emergency", "routing", *CALLER_FIELDS],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_system_prompts: dict[str, str] = {}  # routing rules JSON -> system prompt, so the prefix is byte-identical
+
+
+def combined_enabled() -> bool:
+    return CLASSIFIER_MODE == "combined"
+
+
+def system_prompt() -> str:
+    engine = get_engine()
+    rules_json = json.dumps(engine.stage_rules("routing"), indent=2)
+    key = f"{engine.default_action}\n{rules_json}"
+    prompt = _system_prompts.get(key)
+    if prompt is None:
+        prompt = _system_prompts[key] = (
+            "You classify and extract from a caller's conversation with a towing company's AI agent. "
+            "Return JSON with spam, emergency, routing and the keys name, phone, location, service, make, model, color, year.\n\n"
+            "spam: true if the caller is trying to sell something (like marketing, business loans) or it's clearly an unwanted call. "
+            "Asking for towing services, asking about payment methods or any legitimate-sounding query is NOT spam.\n\n"
+            "emergency: true only if the FLAGGED messages describe a situation requiring immediate human intervention for safety "
+            "(car accidents, injuries, fire, being in a dangerous location). A simple breakdown is NOT an emergency. "
+            "false when FLAGGED is empty.\n\n"
+            "routing: 'transfer' or 'end_call', following these routing rules:\n"
+            f"{rules_json}\n"
+            f"The default action if no rule matches is: '{engine.default_action}'\n\n"
+            "Caller fields (all strings): " + extraction_instructions()
+        )
+    return prompt
+
+
+async def classify(llm, known: dict, delta: str, flagged: str = "") -> dict | None:
+    """
+    Verdicts and fields for the new part of the call: {"spam", "emergency", "routing", "fields"}.
+    `flagged` holds the caller messages with new emergency keyword hits. None if the call failed.
+    """
+    prompt = [
+        ChatMessage(role="system", content=[system_prompt()]),
+        ChatMessage(role="user", content=[
+            f"KNOWN: {json.dumps(known)}\n\nFLAGGED:\n{flagged}\n\nNEW:\n{delta[-CLASSIFIER_MAX_DELTA:]}"
+        ]),
+    ]
+    chat_ctx = ChatContext(items=prompt)
+    try:
+        try:
+            llm_stream = llm.chat(chat_ctx=chat_ctx, response_format=RESPONSE_FORMAT)
+        except TypeError:
+            llm_stream = llm.chat(chat_ctx=chat_ctx)  # plugin without structured output support
+        data = json.loads(await llm_usage.text(llm_stream, "classifier"))
+    except Exception as e:
+        logger.error(f"[Classifier] Combined classification failed: {e}")
+        return None
+    if not isinstance(data, dict):
+        logger.error(f"[Classifier] Unexpected response: {data!r}")
+        return None
+    routing = data.get("routing")
+    result = {
+        "spam": data.get("spam") is True,
+        "emergency": data.get("emergency") is True,
+        "routing": routing if routing in ("transfer", "end_call") else "transfer",
+        "fields": {field: data.get(field) for field in CALLER_FIELDS},
+    }
+    logger.info(f"[Classifier] spam={result['spam']} emergency={result['emergency']} routing={result['routing']}")
+    return result
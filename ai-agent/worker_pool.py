@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# worker_pool.py
+"""
+Pre-spawned, warm agent workers for manager.py.
+
+Each worker imports main.py (livekit, openai, silero, Redis connect) and loads the Silero VAD
+before any call arrives, then blocks on a pipe until the manager assigns it a room.
+A worker serves exactly one room and exits when that session ends; the pool spawns
+replacements to keep `min_idle` warm workers ready, never exceeding `max_workers` in total.
+"""
+import os
+import time
+import signal
+import multiprocessing as mp
+from datetime import datetime
+
+# spawn (not fork): the manager's asyncio loop and Redis sockets must not leak into workers
+_ctx = mp.get_context("spawn")
+
+
+def log(msg: str):
+    line = f"{datetime.now().isoformat()} {msg}"
+    print(line)
+
+
+def _worker_main(conn):
+    """Entry point of a pooled worker process."""
+    os.setsid()  # own process group, so the manager can killpg() it like a Popen child
+    t0 = time.monotonic()
+    import main  # heavy imports happen here, before any call
+    main.load_dotenv()
+    main.prewarm()
+    conn.send(("ready", os.getpid(), time.monotonic() - t0))
+
+    msg = conn.recv()
+    if not msg or msg[0] != "assign":
+        return
+    _, room, assigned_at = msg
+
+    def on_greeting(room_name):
+        # wall clock, so it is comparable with the manager's assignment timestamp
+        try:
+            conn.send(("greeted", room_name, time.time() - assigned_at))
+        except Exception:
+            pass
+
+    main.run_for_room(room, on_greeting=on_greeting)
+
+
+class WarmWorker:
+    """A pooled worker process. Quacks like the subprocess.Popen objects manager.py tracks."""
+
+    def __init__(self):
+        self.conn, child_conn = _ctx.Pipe()
+        self.process = _ctx.Process(target=_worker_main, args=(child_conn,), daemon=False)
+        self.process.start()
+        child_conn.close()
+        self.spawned_at = time.monotonic()
+        self.ready = False
+        self.room = None
+        self.assigned_at = None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def poll(self):
+        """None while running, else the exit code (Popen semantics)."""
+        return None if self.process.is_alive() else self.process.exitcode
+
+    def terminate(self):
+        self.process.terminate()
+
+    def assign(self, room: str):
+        self.room = room
+        self.assigned_at = time.time()
+        self.conn.send(("assign", room, self.assigned_at))
+
+    def messages(self):
+        """Drain whatever the worker has reported, without blocking."""
+        out = []
+        try:
+            while self.conn.poll():
+                out.append(self.conn.recv())
+        except (EOFError, OSError):
+            pass
+        return out
+
+
+class WarmWorkerPool:
+    def __init__(self, min_idle: int = 2, max_workers: int = 10):
+        self.min_idle = min_idle
+        self.max_workers = max_workers
+        self.idle: list[WarmWorker] = []
+        self.busy: list[WarmWorker] = []
+        self.greeting_latencies: list[float] = []  # seconds from assignment to first greeting
+
+    def maintain(self):
+        """Collect worker reports, drop dead workers and top the idle set back up."""
+        for w in list(self.idle):
+            for msg in w.messages():
+                if msg[0] == "ready":
+                    w.ready = True
+                    log(f"[pool] Worker PID {w.pid} warm in {msg[2]:.2f}s")
+            if w.poll() is not None:
+                log(f"[pool] Idle worker PID {w.pid} exited (code {w.poll()}), replacing")
+                self.idle.remove(w)
+        for w in list(self.busy):
+            for msg in w.messages():
+                if msg[0] == "greeted":
+                    self.greeting_latencies.append(msg[2])
+                    log(f"[pool] Room {msg[1]}: first greeting {msg[2]:.2f}s after assignment (PID {w.pid})")
+            if w.poll() is not None:
+                self.busy.remove(w)
+        while len(self.idle) < self.min_idle and len(self.idle) + len(self.busy) < self.max_workers:
+            w = WarmWorker()
+            log(f"[pool] Spawned warm worker PID {w.pid}")
+            self.idle.append(w)
+
+    def assign(self, room: str) -> WarmWorker | None:
+        """Hand `room` to a warm worker; None if none is ready (the caller cold-starts instead)."""
+        self.maintain()
+        for w in self.idle:
+            if w.ready and w.poll() is None:
+                self.idle.remove(w)
+                w.assign(room)
+                self.busy.append(w)
+                log(f"[pool] Assigned room {room} to warm worker PID {w.pid}")
+                self.maintain()  # start warming a replacement right away
+                return w
+        return None
+
+    def stats(self) -> dict:
+        lat = sorted(self.greeting_latencies)
+        return {
+            "idle": len(self.idle),
+            "ready": sum(1 for w in self.idle if w.ready),
+            "busy": len(self.busy),
+            "greetings": len(lat),
+            "greeting_p50": lat[len(lat) // 2] if lat else None,
+            "greeting_max": lat[-1] if lat else None,
+        }
+
+    def shutdown(self):
+        for w in self.idle + self.busy:
+            try:
+                os.killpg(w.pid, signal.SIGTERM)
+            except Exception:
+                w.terminate()
+        self.idle.clear()
+        self.busy.clear()
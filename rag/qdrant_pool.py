@@ -0,0 +1,200 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from qdrant_client import QdrantClient
+
+logger = logging.getLogger("qdrant-pool")
+
+PoolKey = Tuple[str, int, Optional[str]]
+
+
+class _PoolEntry:
+    __slots__ = ("client", "created", "last_used", "last_checked", "in_use", "retired")
+
+    def __init__(self, client: QdrantClient, now: float):
+        self.client = client
+        self.created = now
+        self.last_used = now
+        self.last_checked = now
+        self.in_use = 0  # callers currently holding the client (see QdrantClientPool.checkout)
+        self.retired = False  # no longer pooled; closed once in_use drops to 0
+
+
+def _default_factory(host: str, port: int, api_key: Optional[str]) -> QdrantClient:
+    return QdrantClient(host=host, port=port, api_key=api_key, https=False)
+
+
+class QdrantClientPool:
+    """
+    Long-lived QdrantClient instances keyed by (host, port, api_key).
+
+    Clients keep their HTTP connections alive between requests, so the hot
+    /search path no longer pays connection setup on every call.
+      - at most `max_size` keys are kept; the least recently used is dropped first
+      - clients unused for `idle_timeout` seconds are dropped on the next access
+      - a client idle for longer than `health_check_interval` is probed before
+        it is handed out, and replaced if the probe fails
+    Clients are borrowed with `checkout()`. A client dropped from the pool while
+    borrowed is closed when its last borrower returns it, never under a request.
+    A `max_size` of 0 disables pooling: each checkout gets a fresh client, closed after use.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 8,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 30.0,
+        factory: Callable[[str, int, Optional[str]], QdrantClient] = _default_factory,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._factory = factory
+        self._entries: "OrderedDict[PoolKey, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.health_failures = 0
+
+    @contextmanager
+    def checkout(self, host: str, port: int, api_key: Optional[str]) -> Iterator[QdrantClient]:
+        entry = self._acquire(host, port, api_key)
+        try:
+            yield entry.client
+        finally:
+            self._release(entry)
+
+    def _acquire(self, host: str, port: int, api_key: Optional[str]) -> _PoolEntry:
+        now = time.monotonic()
+        if self.max_size <= 0:
+            entry = _PoolEntry(self._factory(host, port, api_key), now)
+            entry.in_use, entry.retired = 1, True
+            return entry
+
+        key = (host, port, api_key)
+        to_close: List[_PoolEntry] = []
+        with self._lock:
+            self._evict_idle(now, to_close)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                needs_check = now - entry.last_checked > self.health_check_interval
+                entry.last_used = now
+                entry.in_use += 1
+                if needs_check:
+                    # Claim the probe so concurrent callers don't all run it
+                    entry.last_checked = now
+                else:
+                    self.hits += 1
+        self._close_all(to_close)
+
+        if entry is not None:
+            if not needs_check:
+                return entry
+            if self._is_healthy(entry.client):
+                with self._lock:
+                    self.hits += 1
+                return entry
+            logger.warning(f"[QdrantPool] Health check failed for {host}:{port}, reconnecting")
+            with self._lock:
+                self.health_failures += 1
+            self.discard(host, port, api_key)
+            self._release(entry)
+
+        client = self._factory(host, port, api_key)
+        with self._lock:
+            self.misses += 1
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Another thread created one in the meantime; keep theirs
+                existing.last_used = now
+                existing.in_use += 1
+                entry = existing
+                to_close.append(_PoolEntry(client, now))
+            else:
+                entry = _PoolEntry(client, now)
+                entry.in_use = 1
+                self._entries[key] = entry
+                while len(self._entries) > self.max_size:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.evictions += 1
+                    self._retire(evicted, to_close)
+        self._close_all(to_close)
+        return entry
+
+    def _release(self, entry: _PoolEntry):
+        with self._lock:
+            entry.in_use -= 1
+            close = entry.retired and entry.in_use == 0
+        if close:
+            self._close(entry.client)
+
+    def discard(self, host: str, port: int, api_key: Optional[str]):
+        """Drop the pooled client for a key, e.g. after a connection error (closed once no request holds it)."""
+        to_close: List[_PoolEntry] = []
+        with self._lock:
+            entry = self._entries.pop((host, port, api_key), None)
+            if entry is not None:
+                self._retire(entry, to_close)
+        self._close_all(to_close)
+
+    def close_all(self):
+        to_close: List[_PoolEntry] = []
+        with self._lock:
+            for entry in self._entries.values():
+                self._retire(entry, to_close)
+            self._entries.clear()
+        self._close_all(to_close)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "checked_out": sum(e.in_use for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "health_failures": self.health_failures,
+            }
+
+    def _evict_idle(self, now: float, to_close: List[_PoolEntry]):
+        # Caller holds the lock. Entries are in LRU order, so stop at the first fresh one.
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.idle_timeout:
+                break
+            del self._entries[key]
+            self.evictions += 1
+            self._retire(entry, to_close)
+
+    @staticmethod
+    def _retire(entry: _PoolEntry, to_close: List[_PoolEntry]):
+        # Caller holds the lock; a borrowed client is closed by its last _release instead
+        entry.retired = True
+        if entry.in_use == 0:
+            to_close.append(entry)
+
+    def _close_all(self, entries: List[_PoolEntry]):
+        for entry in entries:
+            self._close(entry.client)
+
+    @staticmethod
+    def _is_healthy(client: QdrantClient) -> bool:
+        try:
+            client.get_collections()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(client: QdrantClient):
+        try:
+            client.close()
+        except Exception as e:
+            logger.debug(f"[QdrantPool] Error closing client: {e}")
@@ -1,10 +1,18 @@
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import asyncio
+import json
 import os
+import threading
+import uuid
 from rag import sanitize_collection_name
+from qdrant_pool import QdrantClientPool
+from ttl_cache import TTLCache
 from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException
 from qdrant_client.http.models import Distance, VectorParams, Filter, FieldCondition, MatchValue
 from sentence_transformers import SentenceTransformer
 
@@ -12,8 +20,86 @@ app = FastAPI()
 
 QDRANT_HOST = os.getenv('QDRANT_HOST', 'localhost')
 QDRANT_PORT = int(os.getenv('QDRANT_PORT', '6333'))
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))     # texts per MODEL.encode forward pass
+UPSERT_CHUNK_SIZE = int(os.getenv('UPSERT_CHUNK_SIZE', '256'))  # points per Qdrant upsert request
 MODEL = SentenceTransformer('all-MiniLM-L6-v2')
 
+# Shared Qdrant clients, reused across requests (QDRANT_POOL_SIZE=0 disables pooling)
+QDRANT_POOL = QdrantClientPool(
+    max_size=int(os.getenv('QDRANT_POOL_SIZE', '8')),
+    idle_timeout=float(os.getenv('QDRANT_POOL_IDLE_TIMEOUT', '300')),
+    health_check_interval=float(os.getenv('QDRANT_POOL_HEALTH_INTERVAL', '30')),
+)
+
+# Query string -> embedding, and (collection, query, top_k, filter) -> /search response
+QUERY_EMBED_CACHE = TTLCache(
+    max_size=int(os.getenv('QUERY_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('QUERY_CACHE_TTL', '3600')),
+)
+RESULT_CACHE = TTLCache(
+    max_size=int(os.getenv('RESULT_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('RESULT_CACHE_TTL', '300')),
+)
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def embed_query(query: str) -> List[float]:
+    key = normalize_query(query)
+    vec = QUERY_EMBED_CACHE.get(key)
+    if vec is None:
+        vec = MODEL.encode(key).tolist()
+        QUERY_EMBED_CACHE.put(key, vec)
+    return vec
+
+# collection -> write generation; part of the /search cache key, so a response computed before a write
+# (stored after the write's invalidation) is never served
+_RESULT_GENERATIONS: Dict[str, int] = {}
+_RESULT_GENERATIONS_LOCK = threading.Lock()
+
+def result_generation(collection: str) -> int:
+    with _RESULT_GENERATIONS_LOCK:
+        return _RESULT_GENERATIONS.get(collection, 0)
+
+def invalidate_results(collection: str):
+    """Forget cached /search responses for a collection after its points change."""
+    with _RESULT_GENERATIONS_LOCK:
+        _RESULT_GENERATIONS[collection] = _RESULT_GENERATIONS.get(collection, 0) + 1
+    RESULT_CACHE.invalidate(lambda key: key[0] == collection)
+
+def get_client(api_key: str):
+    """Borrow the pooled client for `api_key`: `with get_client(api_key) as client: ...`"""
+    return QDRANT_POOL.checkout(QDRANT_HOST, QDRANT_PORT, api_key)
+
+def ensure_collection(client: QdrantClient, collection: str):
+    """Create the collection if it doesn't exist yet."""
+    try:
+        client.get_collection(collection_name=collection)
+    except Exception:
+        dim = MODEL.get_sentence_embedding_dimension()
+        client.recreate_collection(
+            collection_name=collection,
+            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+        )
+
+def build_points(texts: List[str], batch_size: int = EMBED_BATCH_SIZE, payloads: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Embed `texts` with batched SentenceTransformer calls and wrap them as Qdrant points."""
+    vectors = MODEL.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    points = []
+    for i, (text, vector) in enumerate(zip(texts, vectors)):
+        payload = dict(payloads[i]) if payloads else {}
+        payload["text"] = text
+        points.append({
+            "id": str(uuid.uuid4()),
+            "vector": vector.tolist(),
+            "payload": payload
+        })
+    return points
+
+@app.on_event("shutdown")
+def close_clients():
+    QDRANT_POOL.close_all()
+
 class RagRequest(BaseModel):
     collection_name: str
     query_string: str
@@ -30,6 +116,7 @@ class BatchAddRequest(BaseModel):
     collection_name: str
     texts: List[str]
     qdrant_api_key: str
+    batch_size: Optional[int] = None
 
 class DeleteRequest(BaseModel):
     collection_name: str
@@ -37,119 +124,188 @@ class DeleteRequest(BaseModel):
 
 @app.post("/search")
 def rag_search(req: RagRequest):
-    client = QdrantClient(
-        host=QDRANT_HOST,
-        port=QDRANT_PORT,
-        api_key=req.qdrant_api_key,
-        https=False
-    )
     collection = sanitize_collection_name(req.collection_name)
-    vec = MODEL.encode(req.query_string).tolist()
+    filter_key = tuple(sorted((k, json.dumps(v, sort_keys=True)) for k, v in (req.filter or {}).items()))
+    # The API key is part of the key so a cached response is never served to a different tenant
+    # Taken before the query: if the collection is written meanwhile, the response is stored under a dead key
+    cache_key = (collection, result_generation(collection), normalize_query(req.query_string), req.top_k, filter_key, req.qdrant_api_key)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    vec = embed_query(req.query_string)
     qdrant_filter = None
     if req.filter:
         conditions = [FieldCondition(key=k, match=MatchValue(value=v)) for k, v in req.filter.items()]
         qdrant_filter = Filter(must=conditions)
-    resp = client.query_points(
-        collection_name=collection,
-        query=vec,
-        limit=req.top_k,
-        with_payload=True,
-        query_filter=qdrant_filter
-    )
+    try:
+        with get_client(req.qdrant_api_key) as client:
+            resp = client.query_points(
+                collection_name=collection,
+                query=vec,
+                limit=req.top_k,
+                with_payload=True,
+                query_filter=qdrant_filter
+            )
+    except ResponseHandlingException:
+        # Connection-level failure: don't hand this client out again
+        QDRANT_POOL.discard(QDRANT_HOST, QDRANT_PORT, req.qdrant_api_key)
+        raise
     hits = resp.points
     if not hits:
-        return {"result": "No relevant context found."}
-    results = []
-    for pt in hits:
-        results.append(pt.payload)
-    return {"result": results}
+        response = {"result": "No relevant context found."}
+    else:
+        results = []
+        for pt in hits:
+            results.append(pt.payload)
+        response = {"result": results}
+    RESULT_CACHE.put(cache_key, response)
+    return response
 
 @app.post("/add")
 def add_to_collection(req: AddRequest):
-    client = QdrantClient(
-        host=QDRANT_HOST,
-        port=QDRANT_PORT,
-        api_key=req.qdrant_api_key,
-        https=False
-    )
     collection = sanitize_collection_name(req.collection_name)
-    # Check if collection exists
-    try:
-        exists = client.get_collection(collection_name=collection)
-    except Exception:
-        # Create collection if not exists
-        dim = MODEL.get_sentence_embedding_dimension()
-        client.recreate_collection(
+    with get_client(req.qdrant_api_key) as client:
+        ensure_collection(client, collection)
+        # Upsert the text as a new point
+        point = build_points([req.text])[0]
+        client.upsert(
             collection_name=collection,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+            points=[point]
         )
-    # Upsert the text as a new point
-    import uuid
-    point_id = str(uuid.uuid4())
-    vector = MODEL.encode(req.text).tolist()
-    payload = {"text": req.text}
-    client.upsert(
-        collection_name=collection,
-        points=[
-            {
-                "id": point_id,
-                "vector": vector,
-                "payload": payload
-            }
-        ]
-    )
-    return {"result": f"Text added to collection '{collection}' with id {point_id}"}
+        point_id = point["id"]
+        invalidate_results(collection)
+        return {"result": f"Text added to collection '{collection}' with id {point_id}"}
 
 @app.post("/batch_add")
 def batch_add_to_collection(req: BatchAddRequest):
-    client = QdrantClient(
-        host=QDRANT_HOST,
-        port=QDRANT_PORT,
-        api_key=req.qdrant_api_key,
-        https=False
-    )
     collection = sanitize_collection_name(req.collection_name)
+    with get_client(req.qdrant_api_key) as client:
+        ensure_collection(client, collection)
+        batch_size = req.batch_size or EMBED_BATCH_SIZE
+        ids = []
+        # Embed and upsert in chunks so neither the model call nor the upsert request grows with the corpus
+        for start in range(0, len(req.texts), UPSERT_CHUNK_SIZE):
+            chunk = req.texts[start:start + UPSERT_CHUNK_SIZE]
+            points = build_points(chunk, batch_size)
+            client.upsert(
+                collection_name=collection,
+                points=points
+            )
+            ids.extend(p["id"] for p in points)
+        invalidate_results(collection)
+        return {"result": f"Batch added {len(ids)} texts to collection '{collection}'", "ids": ids}
+
+def _parse_ndjson_line(line: bytes) -> Optional[Dict[str, Any]]:
+    """A line is either a JSON object with a 'text' key (other keys go into the payload) or a JSON string."""
+    line = line.strip()
+    if not line:
+        return None
+    obj = json.loads(line)
+    if isinstance(obj, str):
+        obj = {"text": obj}
+    if not isinstance(obj, dict) or not isinstance(obj.get("text"), str):
+        raise ValueError("each line must be a JSON string or an object with a 'text' field")
+    return obj
+
+def _positive_int_param(params, name: str, default: int) -> int:
+    """Query parameter `name` as an int >= 1, else 400."""
+    raw = params.get(name)
+    if raw is None:
+        return default
     try:
-        exists = client.get_collection(collection_name=collection)
-    except Exception:
-        dim = MODEL.get_sentence_embedding_dimension()
-        client.recreate_collection(
-            collection_name=collection,
-            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
-        )
-    import uuid
-    ids = []
-    points = []
-    for text in req.texts:
-        point_id = str(uuid.uuid4())
-        ids.append(point_id)
-        vector = MODEL.encode(text).tolist()
-        payload = {"text": text}
-        points.append({
-            "id": point_id,
-            "vector": vector,
-            "payload": payload
-        })
-    client.upsert(
-        collection_name=collection,
-        points=points
-    )
-    return {"result": f"Batch added {len(ids)} texts to collection '{collection}'", "ids": ids}
+        value = int(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer, got {raw!r}")
+    if value < 1:
+        raise HTTPException(status_code=400, detail=f"{name} must be at least 1, got {value}")
+    return value
+
+@app.post("/stream_add")
+async def stream_add_to_collection(request: Request):
+    """
+    Bulk ingest from an NDJSON request body.
+    Lines are embedded and upserted in chunks of `chunk_size`; the upsert of one chunk
+    overlaps with embedding the next, and at most two chunks are held in memory.
+    """
+    params = request.query_params
+    api_key = params.get('qdrant_api_key') or request.headers.get('X-Qdrant-Api-Key')
+    if not api_key:
+        raise HTTPException(status_code=401, detail="Missing qdrant_api_key")
+    if not params.get('collection_name'):
+        raise HTTPException(status_code=400, detail="Missing collection_name")
+    collection = sanitize_collection_name(params['collection_name'])
+    chunk_size = _positive_int_param(params, 'chunk_size', UPSERT_CHUNK_SIZE)
+    batch_size = _positive_int_param(params, 'batch_size', EMBED_BATCH_SIZE)
+
+    with get_client(api_key) as client:
+        await run_in_threadpool(ensure_collection, client, collection)
+
+        total = 0
+        pending_upsert: Optional[asyncio.Future] = None
+
+        async def flush(docs: List[Dict[str, Any]]):
+            nonlocal pending_upsert, total
+            texts = [d.pop("text") for d in docs]
+            points = await run_in_threadpool(build_points, texts, batch_size, docs)
+            if pending_upsert is not None:
+                await pending_upsert
+            pending_upsert = asyncio.ensure_future(
+                run_in_threadpool(client.upsert, collection_name=collection, points=points)
+            )
+            total += len(points)
+
+        docs: List[Dict[str, Any]] = []
+        buffer = b""
+        line_no = 0
+        try:
+            async for data in request.stream():
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    line_no += 1
+                    doc = _parse_ndjson_line(line)
+                    if doc is None:
+                        continue
+                    docs.append(doc)
+                    if len(docs) >= chunk_size:
+                        await flush(docs)
+                        docs = []
+            line_no += 1
+            doc = _parse_ndjson_line(buffer)
+            if doc is not None:
+                docs.append(doc)
+            if docs:
+                await flush(docs)
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            raise HTTPException(status_code=400, detail=f"Invalid NDJSON on line {line_no}: {e}")
+        finally:
+            try:
+                if pending_upsert is not None:
+                    await pending_upsert
+            finally:
+                invalidate_results(collection)
+        return {"result": f"Stream added {total} texts to collection '{collection}'", "count": total}
 
 @app.post("/delete")
 def delete_collection(req: DeleteRequest):
-    client = QdrantClient(
-        host=QDRANT_HOST,
-        port=QDRANT_PORT,
-        api_key=req.qdrant_api_key,
-        https=False
-    )
     collection = sanitize_collection_name(req.collection_name)
-    try:
-        client.delete_collection(collection_name=collection)
-        return {"result": f"Collection '{collection}' deleted."}
-    except Exception as e:
-        return {"error": str(e)}
+    with get_client(req.qdrant_api_key) as client:
+        try:
+            client.delete_collection(collection_name=collection)
+            return {"result": f"Collection '{collection}' deleted."}
+        except Exception as e:
+            return {"error": str(e)}
+        finally:
+            invalidate_results(collection)
+
+@app.get("/stats")
+def cache_stats():
+    return {
+        "query_embedding_cache": QUERY_EMBED_CACHE.stats(),
+        "result_cache": RESULT_CACHE.stats(),
+        "qdrant_pool": QDRANT_POOL.stats(),
+    }
 
 @app.get("/list")
 def list_collections(request: Request):
@@ -157,14 +313,9 @@ def list_collections(request: Request):
     api_key = request.query_params.get('qdrant_api_key') or request.headers.get('X-Qdrant-Api-Key')
     if not api_key:
         raise HTTPException(status_code=401, detail="Missing qdrant_api_key")
-    client = QdrantClient(
-        host=QDRANT_HOST,
-        port=QDRANT_PORT,
-        api_key=api_key,
-        https=False
-    )
     try:
-        resp = client.get_collections()
+        with get_client(api_key) as client:
+            resp = client.get_collections()
         names = [c.name for c in resp.collections]
         return {"collections": names}
     except Exception as e:
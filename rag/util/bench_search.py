@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for /search latency with and without the Qdrant client pool.
+
+A tiny local HTTP server stands in for Qdrant (it answers the handful of REST
+calls QdrantClient makes), and the embedding model is replaced by a constant
+vector so the numbers only reflect client/connection overhead.
+
+Usage: python3 util/bench_search.py [requests]   (run from the rag/ directory)
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+N_REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+class FakeQdrantHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like real Qdrant
+
+    def _reply(self, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/":
+            self._reply({"title": "qdrant - vector search engine", "version": "1.12.0"})
+        else:
+            self._reply({"result": {"collections": [{"name": "towing_services"}]}, "status": "ok", "time": 0.0})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        points = [{"id": 1, "version": 0, "score": 0.9, "payload": {"text": "Jump start service"}}]
+        self._reply({"result": {"points": points}, "status": "ok", "time": 0.0})
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeModel:
+    def encode(self, text, **kwargs):
+        if isinstance(text, list):
+            return np.zeros((len(text), 384), dtype=np.float32)
+        return np.zeros(384, dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 384
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run(client, label):
+    payload = {
+        "collection_name": "towing_services",
+        "query_string": "jump start",
+        "top_k": 3,
+        "qdrant_api_key": "bench",
+    }
+    # warm-up
+    for _ in range(10):
+        client.post("/search", json=payload)
+    samples = []
+    for _ in range(N_REQUESTS):
+        t0 = time.perf_counter()
+        resp = client.post("/search", json=payload)
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert resp.status_code == 200, resp.text
+    print(f"{label:<22} p50={percentile(samples, 50):7.3f} ms  p99={percentile(samples, 99):7.3f} ms  (n={N_REQUESTS})")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeQdrantHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["QDRANT_HOST"] = "127.0.0.1"
+    os.environ["QDRANT_PORT"] = str(server.server_address[1])
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from fastapi.testclient import TestClient
+    import rag_server
+    from qdrant_pool import QdrantClientPool
+    from ttl_cache import TTLCache
+
+    rag_server.MODEL = FakeModel()
+    # Caches would short-circuit Qdrant entirely; measure the client path only
+    rag_server.QUERY_EMBED_CACHE = TTLCache(max_size=0)
+    rag_server.RESULT_CACHE = TTLCache(max_size=0)
+    client = TestClient(rag_server.app)
+
+    rag_server.QDRANT_POOL = QdrantClientPool(max_size=0)
+    run(client, "client per request")
+
+    rag_server.QDRANT_POOL = QdrantClientPool(max_size=8)
+    run(client, "pooled client")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
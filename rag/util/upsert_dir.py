@@ -1,4 +1,5 @@
 import os
+import json
 import requests
 
 RAG_SERVER = "http://localhost:8000"
@@ -6,14 +7,15 @@ BASE_DIR = "/root/livekit.ecommcube.com/rag_knowledge_docs/towing_services_doc"
 COLLECTION_NAME = os.path.basename(BASE_DIR)
 QDRANT_API_KEY = "2123tt"  # Set your API key here
 
-# 1. Read all .txt files
-texts = []
-for fname in os.listdir(BASE_DIR):
-    if fname.endswith(".txt"):
+# 1. Stream all .txt files as NDJSON (one document per line), never holding the corpus in memory
+fnames = sorted(f for f in os.listdir(BASE_DIR) if f.endswith(".txt"))
+
+def iter_ndjson():
+    for fname in fnames:
         with open(os.path.join(BASE_DIR, fname), "r") as f:
-            texts.append(f.read())
+            yield (json.dumps({"text": f.read(), "source": fname}) + "\n").encode()
 
-print(f"Found {len(texts)} documents in {BASE_DIR}")
+print(f"Found {len(fnames)} documents in {BASE_DIR}")
 
 # 2. Delete the collection
 print(f"Deleting collection '{COLLECTION_NAME}'...")
@@ -27,18 +29,18 @@ try:
 except Exception:
     print("Delete raw response:", resp.text)
 
-# 3. Upsert all docs
-if texts:
-    print(f"Upserting {len(texts)} documents to '{COLLECTION_NAME}'...")
-    batch_payload = {
-        "collection_name": COLLECTION_NAME,
-        "texts": texts,
-        "qdrant_api_key": QDRANT_API_KEY
-    }
-    resp = requests.post(f"{RAG_SERVER}/batch_add", json=batch_payload)
+# 3. Upsert all docs (chunked transfer; the server embeds and upserts in pipelined chunks)
+if fnames:
+    print(f"Upserting {len(fnames)} documents to '{COLLECTION_NAME}'...")
+    resp = requests.post(
+        f"{RAG_SERVER}/stream_add",
+        params={"collection_name": COLLECTION_NAME},
+        headers={"X-Qdrant-Api-Key": QDRANT_API_KEY, "Content-Type": "application/x-ndjson"},
+        data=iter_ndjson(),
+    )
     try:
-        print("Batch add response:", resp.json())
+        print("Stream add response:", resp.json())
     except Exception:
-        print("Batch add raw response:", resp.text)
+        print("Stream add raw response:", resp.text)
 else:
-    print("No documents to upsert.") 
\ No newline at end of file
+    print("No documents to upsert.")